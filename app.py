@@ -5,10 +5,10 @@ Interfaz Streamlit mejorada con análisis táctico completo
 
 import streamlit as st
 from pathlib import Path
-from src.models.load_model import load_roboflow_model
+from src.models.load_model import load_roboflow_model, load_model_with_backend
+from src.models.model_pool import get_model_pool
 from src.controllers.process_video import process_video
 from src.utils.config import INPUTS_DIR, OUTPUTS_DIR
-from ultralytics import YOLO
 import json
 import pandas as pd
 import plotly.express as px
@@ -42,7 +42,7 @@ else:
         p_path.parent.mkdir(exist_ok=True)
         with open(p_path, "wb") as f:
             f.write(uploaded_player.read())
-        player_model = YOLO(p_path)
+        player_model = load_model_with_backend(str(p_path))
         st.sidebar.success(f"Cargado: {uploaded_player.name}")
 
 # 2. BALL MODEL
@@ -61,9 +61,25 @@ if ball_source == "Subir Modelo Custom (.pt)":
         b_path.parent.mkdir(exist_ok=True)
         with open(b_path, "wb") as f:
             f.write(uploaded_ball.read())
-        ball_model = YOLO(b_path)
+        ball_model = load_model_with_backend(str(b_path))
         st.sidebar.success(f"Cargado: {uploaded_ball.name}")
 
+ball_search = "full"
+if ball_model is not None:
+    ball_search_label = st.sidebar.selectbox(
+        "Búsqueda de pelota", ["Frame completo", "Región alrededor de la pelota", "Mosaicos (pelota pequeña)"],
+        index=0,
+        help="La región corre el modelo de pelota sólo sobre un recorte de 640px a resolución "
+             "nativa alrededor de su posición predicha (más rápido y mejor con pelotas pequeñas); "
+             "tras varios fallos vuelve a buscar en el frame completo. Los mosaicos cubren todo "
+             "el frame a resolución nativa (más lento, máxima sensibilidad)."
+    )
+    ball_search = {
+        "Frame completo": "full",
+        "Región alrededor de la pelota": "roi",
+        "Mosaicos (pelota pequeña)": "tiled",
+    }[ball_search_label]
+
 # 3. RADAR / PITCH
 st.sidebar.subheader("3. Radar View")
 enable_radar = st.sidebar.checkbox("Habilitar Radar", value=True)
@@ -89,7 +105,7 @@ if enable_radar:
         homography_path = Path("models/homography.pt")
         if homography_path.exists():
             with st.spinner("Cargando modelo Homography (32 keypoints)..."):
-                pitch_model = YOLO(str(homography_path))
+                pitch_model = load_model_with_backend(str(homography_path))
             st.sidebar.success("✅ Modelo Homography cargado (100% tasa éxito)")
         else:
             st.sidebar.error(f"❌ Modelo no encontrado: {homography_path}")
@@ -99,7 +115,7 @@ if enable_radar:
         soccana_path = Path("models/soccana_keypoint/Model/weights/best.pt")
         if soccana_path.exists():
             with st.spinner("Cargando modelo Soccana_Keypoint (29 keypoints)..."):
-                pitch_model = YOLO(str(soccana_path))
+                pitch_model = load_model_with_backend(str(soccana_path))
             st.sidebar.success("✅ Modelo Soccana cargado (~65% tasa éxito)")
         else:
             st.sidebar.error(f"❌ Modelo no encontrado")
@@ -108,6 +124,91 @@ if enable_radar:
     else:
         full_field_approx = True
 
+pitch_motion_threshold = 0.0
+if pitch_model is not None:
+    reuse_homography = st.sidebar.checkbox(
+        "Reutilizar homografía con cámara quieta", value=False,
+        help="Estima el movimiento de cámara (correlación de fase) y sólo vuelve a detectar los "
+             "keypoints del campo cuando la cámara se movió o cada 30 frames."
+    )
+    if reuse_homography:
+        pitch_motion_threshold = 0.01
+
+# 4. RENDIMIENTO
+st.sidebar.subheader("4. Rendimiento")
+batch_size = st.sidebar.slider(
+    "Frames por lote (batch)", 1, 16, 4,
+    help="Frames enviados juntos a cada modelo en una sola inferencia. "
+         "Valores mayores reducen el overhead por llamada a costa de más memoria."
+)
+backend_label = st.sidebar.selectbox(
+    "Backend de inferencia", ["PyTorch", "ONNX Runtime"], index=0,
+    help="ONNX Runtime exporta los modelos una vez (cache en models/onnx_cache) y "
+         "suele ser bastante más rápido en equipos sólo CPU."
+)
+precision_label = st.sidebar.selectbox(
+    "Precisión", ["FP32", "INT8 (CPU)"], index=0,
+    help="INT8 cuantiza los modelos (calibrados con los videos de inputs/) y los "
+         "ejecuta con ONNX Runtime. Más rápido en CPU con una pérdida leve de precisión; "
+         "comparar con scripts/compare_quantized_models.py."
+)
+if precision_label == "INT8 (CPU)":
+    with st.spinner("Preparando modelos INT8 (la primera vez se cuantizan)..."):
+        player_model, ball_model, pitch_model = (
+            load_model_with_backend(str(m.ckpt_path), "onnx", precision="int8") if m is not None else None
+            for m in (player_model, ball_model, pitch_model)
+        )
+elif backend_label == "ONNX Runtime":
+    with st.spinner("Preparando modelos ONNX..."):
+        player_model, ball_model, pitch_model = (
+            load_model_with_backend(str(m.ckpt_path), "onnx") if m is not None else None
+            for m in (player_model, ball_model, pitch_model)
+        )
+if precision_label == "INT8 (CPU)" or backend_label == "ONNX Runtime":
+    # Si falta onnxruntime/onnx o la exportación falla, el modelo se carga con PyTorch
+    pytorch_fallbacks = [
+        m for m in (player_model, ball_model, pitch_model)
+        if m is not None and getattr(m, 'onnx_path', None) is None
+    ]
+    if pytorch_fallbacks:
+        st.sidebar.warning(
+            f"⚠️ ONNX Runtime no disponible para {len(pytorch_fallbacks)} modelo(s): se usa PyTorch "
+            "(ver la consola; instalar onnx y onnxruntime)"
+        )
+    if precision_label == "INT8 (CPU)":
+        # La cuantización también puede fallar y dejar el modelo ONNX en FP32
+        fp32_fallbacks = [
+            m for m in (player_model, ball_model, pitch_model)
+            if m is not None and getattr(m, 'onnx_path', None) is not None
+            and not str(m.onnx_path).endswith("_int8.onnx")
+        ]
+        if fp32_fallbacks:
+            st.sidebar.warning(
+                f"⚠️ No se pudieron cuantizar {len(fp32_fallbacks)} modelo(s) a INT8: se usa FP32 (ver la consola)"
+            )
+target_fps = st.sidebar.slider(
+    "FPS objetivo de detección (0 = resolución fija)", 0, 60, 0,
+    help="Si es mayor que 0, la resolución de cada modelo se ajusta durante el análisis "
+         "(entre 320 y 960 px) para sostener estos frames por segundo. Las resoluciones "
+         "usadas por tramo quedan en el JSON de estadísticas."
+)
+render_video = st.sidebar.checkbox(
+    "Generar video anotado", value=True,
+    help="Desactivar para calcular sólo las estadísticas (sin dibujar ni codificar video; mucho más rápido)"
+)
+cache_detections = st.sidebar.checkbox(
+    "Reutilizar detecciones (caché en disco)", value=False,
+    help="Guarda las detecciones de los modelos por video y configuración; al volver a analizar "
+         "el mismo partido (p.ej. tras cambiar parámetros tácticos) no se vuelven a correr los modelos."
+)
+pool_report = get_model_pool().get_report()
+st.sidebar.caption(
+    f"Modelos en memoria: {len(pool_report['models'])} (~{pool_report['memory_mb']:.0f}/"
+    f"{pool_report['budget_mb']:.0f} MB) | cargas: {pool_report['misses']} "
+    f"({pool_report['load_time_s']:.1f}s) | reutilizados: {pool_report['hits']} | "
+    f"desalojados: {pool_report['evictions']}"
+)
+
 # === MAIN AREA ===
 # Initialize session state for stats
 if 'stats' not in st.session_state:
@@ -149,6 +250,8 @@ if uploaded_video:
                             file_name=output_filename,
                             mime="video/mp4"
                         )
+                else:
+                    st.info("📊 Procesado en modo sólo estadísticas: no se generó video")
             else:
                 st.info("👉 Haz clic en 'Procesar Video' para iniciar")
 
@@ -178,7 +281,13 @@ if uploaded_video:
                         pitch_model=pitch_model,
                         conf=0.3,
                         detection_mode="players_and_ball",
-                        full_field_approx=full_field_approx
+                        full_field_approx=full_field_approx,
+                        batch_size=batch_size,
+                        render=render_video,
+                        ball_search=ball_search,
+                        pitch_motion_threshold=pitch_motion_threshold,
+                        target_fps=float(target_fps),
+                        cache_detections=cache_detections
                     )
 
                     progress_bar.progress(90)
@@ -0,0 +1,228 @@
+"""
+Compara las variantes de precisión de los modelos: PyTorch FP32 vs ONNX FP32 vs ONNX INT8
+Mide frames/s, recall de detecciones respecto de FP32 y, para el modelo de campo,
+keypoints detectados y tasa de homografía viable.
+
+Uso: python scripts/compare_quantized_models.py [pesos.pt ...]
+(sin argumentos compara yolov8m, models/ball.pt y models/homography.pt si existen)
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from ultralytics import YOLO
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.models.inference_backend import load_inference_model
+from src.models.quantization import (
+    CALIBRATION_FRAMES,
+    calibration_frame_indices,
+    find_calibration_videos,
+    read_video_frames,
+    video_frame_count,
+)
+from src.utils.motion_prediction import box_iou_matrix
+
+VARIANTS = [
+    ('PyTorch FP32', {'backend': 'pytorch', 'precision': 'fp32'}),
+    ('ONNX FP32', {'backend': 'onnx', 'precision': 'fp32'}),
+    ('ONNX INT8', {'backend': 'onnx', 'precision': 'int8'}),
+]
+
+
+def sample_evaluation_frames(videos, num_frames=20):
+    """
+    Frames de evaluación que no se usaron para calibrar el modelo INT8.
+
+    Por cada video se toman los índices fuera de los de calibración
+    (quantize_model_int8 con CALIBRATION_FRAMES) y se reparten uniformemente.
+    """
+    per_video = max(1, num_frames // len(videos))
+    calibration_per_video = max(1, CALIBRATION_FRAMES // len(videos))
+    frames = []
+    for video_path in videos:
+        total = video_frame_count(video_path)
+        if total <= 0:
+            continue
+        calibration = calibration_frame_indices(total, calibration_per_video)
+        candidates = np.setdiff1d(np.arange(total), calibration)
+        if len(candidates) == 0:
+            continue
+        indices = candidates[np.linspace(0, len(candidates) - 1, min(per_video, len(candidates)), dtype=int)]
+        assert not set(indices.tolist()) & set(calibration.tolist()), "frames de evaluación usados en la calibración"
+        frames.extend(read_video_frames(video_path, indices))
+    return frames
+
+
+def match_recall(reference, candidate, iou_threshold=0.5):
+    """Detecciones de referencia (cajas, clases) recuperadas por el candidato (misma clase, IoU >= umbral)"""
+    ref_boxes, ref_cls = reference
+    cand_boxes, cand_cls = candidate
+    if len(ref_boxes) == 0:
+        return 0, 0
+    if len(cand_boxes) == 0:
+        return 0, len(ref_boxes)
+
+    iou = box_iou_matrix(ref_boxes, cand_boxes)
+    iou[ref_cls[:, None] != cand_cls[None, :]] = 0
+    used_ref, used_cand = set(), set()
+    # Emparejamiento greedy por IoU descendente
+    for i, j in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+        if iou[i, j] < iou_threshold:
+            break
+        if i in used_ref or j in used_cand:
+            continue
+        used_ref.add(i)
+        used_cand.add(j)
+    return len(used_ref), len(ref_boxes)
+
+
+def homography_viable(keypoints, frame_width, conf_threshold=0.05):
+    """>= 4 keypoints con distribución mínima (30% del frame), como en compare_pitch_models"""
+    visible = keypoints[:, 2] > conf_threshold
+    if visible.sum() < 4:
+        return int(visible.sum()), False
+    xy = keypoints[visible, :2]
+    spread = max(xy[:, 0].max() - xy[:, 0].min(), xy[:, 1].max() - xy[:, 1].min())
+    return int(visible.sum()), spread > frame_width * 0.3
+
+
+def run_variant(model, frames, conf):
+    """Inferencia frame a frame; devuelve frames/s y salidas (cajas, clases, keypoints)"""
+    model(frames[0], conf=conf, verbose=False)  # warmup
+
+    outputs = []
+    start = time.perf_counter()
+    for frame in frames:
+        result = model(frame, conf=conf, verbose=False)[0]
+        boxes = result.boxes.xyxy.cpu().numpy()
+        classes = result.boxes.cls.cpu().numpy().astype(int)
+        keypoints = None
+        if result.keypoints is not None and len(result.keypoints.data) > 0:
+            keypoints = result.keypoints.data[0].cpu().numpy()
+        outputs.append((boxes, classes, keypoints))
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, outputs
+
+
+def compare_model(weights_path, model_name, frames):
+    """Prueba las variantes de un modelo sobre los mismos frames"""
+    print(f"\n{'='*60}")
+    print(f"Probando: {model_name}")
+    print(f"Modelo: {weights_path}")
+    print(f"{'='*60}")
+
+    is_pose = YOLO(str(weights_path)).task == 'pose'
+    conf = 0.05 if is_pose else 0.3
+
+    results = []
+    reference = None
+    for variant_name, options in VARIANTS:
+        print(f"\n⏱️ {variant_name}...")
+        model = load_inference_model(weights_path, **options)
+        fps, outputs = run_variant(model, frames, conf)
+        row = {'variant': variant_name, 'fps': fps}
+        if reference is None:
+            reference = outputs
+
+        matched = total = 0
+        for (ref_boxes, ref_cls, _), (boxes, cls, _) in zip(reference, outputs):
+            m, t = match_recall((ref_boxes, ref_cls), (boxes, cls))
+            matched += m
+            total += t
+        row['recall'] = (matched / total) * 100 if total > 0 else 0
+        row['detections'] = np.mean([len(o[0]) for o in outputs])
+
+        if is_pose:
+            viable = 0
+            kp_counts = []
+            for frame, (_, _, keypoints) in zip(frames, outputs):
+                if keypoints is None:
+                    kp_counts.append(0)
+                    continue
+                count, ok = homography_viable(keypoints, frame.shape[1])
+                kp_counts.append(count)
+                viable += int(ok)
+            row['keypoints'] = np.mean(kp_counts)
+            row['homography_rate'] = (viable / len(frames)) * 100
+
+        print(f"   {fps:.1f} frames/s, recall vs FP32: {row['recall']:.1f}%")
+        results.append(row)
+
+    return {'model_name': model_name, 'is_pose': is_pose, 'variants': results}
+
+
+def print_summary(report):
+    """Tabla final de un modelo"""
+    print(f"\n📊 {report['model_name']}")
+    header = f"{'Variante':<16} {'frames/s':>10} {'speedup':>9} {'det/frame':>10} {'recall':>9}"
+    if report['is_pose']:
+        header += f" {'kps':>6} {'homografía':>11}"
+    print(header)
+    print("-" * len(header))
+
+    base_fps = report['variants'][0]['fps']
+    for row in report['variants']:
+        line = (f"{row['variant']:<16} {row['fps']:>10.1f} {row['fps'] / base_fps:>8.2f}x "
+                f"{row['detections']:>10.1f} {row['recall']:>8.1f}%")
+        if report['is_pose']:
+            line += f" {row['keypoints']:>6.1f} {row['homography_rate']:>10.1f}%"
+        print(line)
+
+
+def main():
+    print("🔍 COMPARACIÓN DE PRECISIÓN: FP32 vs INT8")
+    print("="*60)
+
+    videos = find_calibration_videos()
+    if not videos:
+        print("❌ No se encontraron videos en 'inputs/'")
+        return
+
+    # Frames de evaluación distintos de los de calibración
+    frames = sample_evaluation_frames(videos)
+    if not frames:
+        print("❌ Los videos no tienen frames fuera de los de calibración")
+        return
+    print(f"📹 {len(frames)} frames de {len(videos)} video(s)")
+
+    if len(sys.argv) > 1:
+        models = [{'path': p, 'name': Path(p).name} for p in sys.argv[1:]]
+    else:
+        models = [
+            {'path': 'yolov8m.pt', 'name': 'Jugadores (yolov8m)'},
+            {'path': 'models/ball.pt', 'name': 'Pelota (custom)'},
+            {'path': 'models/homography.pt', 'name': 'Homography.pt (32 keypoints)'},
+        ]
+
+    reports = []
+    for model_info in models:
+        model_path = Path(model_info['path'])
+        # Los modelos de ultralytics (yolov8m.pt) se descargan si no existen
+        if model_path.exists() or model_path.parent == Path('.'):
+            reports.append(compare_model(model_info['path'], model_info['name'], frames))
+        else:
+            print(f"\n❌ Modelo no encontrado: {model_path}")
+
+    print(f"\n{'='*60}")
+    print("🏆 COMPARACIÓN FINAL")
+    print(f"{'='*60}")
+    for report in reports:
+        print_summary(report)
+
+    print(f"\n💡 RECOMENDACIÓN:")
+    for report in reports:
+        int8 = report['variants'][-1]
+        base = report['variants'][0]
+        ok = int8['recall'] >= 95 and (not report['is_pose'] or int8['homography_rate'] >= base['homography_rate'] - 5)
+        if ok and int8['fps'] > base['fps']:
+            print(f"   {report['model_name']}: usar INT8 ({int8['fps'] / base['fps']:.2f}x, recall {int8['recall']:.1f}%)")
+        else:
+            print(f"   {report['model_name']}: mantener FP32 (INT8 recall {int8['recall']:.1f}%, {int8['fps'] / base['fps']:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -52,7 +52,8 @@ def main():
     pitch_model = YOLO(str(homography_path))
     print("   ✅ Modelos cargados correctamente")
 
-    # Configurar salida
+    # Configurar salida (--stats-only: sólo estadísticas, sin video anotado)
+    stats_only = "--stats-only" in sys.argv
     output_video = OUTPUTS_DIR / f"optimal_test_{input_video.name}"
     OUTPUTS_DIR.mkdir(exist_ok=True)
 
@@ -71,7 +72,8 @@ def main():
             pitch_model=pitch_model,
             conf=0.3,
             detection_mode="players_and_ball",
-            full_field_approx=False
+            full_field_approx=False,
+            render=not stats_only
         )
 
         print("\n" + "="*70)
@@ -1,9 +1,167 @@
+import os
+import re
+import subprocess
+import tempfile
+from typing import List, Optional
+
 import cv2
 
+from src.utils.video_io import ffmpeg_available, open_video_reader, open_video_writer
+
+# Modos de recorte: 'reencode' (decodifica todo, por defecto), 'smart' (copia +
+# recodifica sólo el GOP inicial, verificado) y 'copy' (copia pura, arranca en el keyframe previo)
+CUT_MODES = ("reencode", "smart", "copy")
+
+
+def _run_ffmpeg(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(["ffmpeg", "-y", "-v", "error", "-nostdin"] + args,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def _probe_video(source_path: str) -> Optional[dict]:
+    """Códec y fps del primer stream de video (parseando `ffmpeg -i`)."""
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-nostdin", "-i", str(source_path)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    info = result.stderr.decode(errors="replace")
+    match = re.search(r"Stream #\d+:\d+.*?: Video: (\w+)", info)
+    if not match:
+        return None
+    fps_match = re.search(r"([\d.]+) fps", info)
+    return {"codec": match.group(1), "fps": float(fps_match.group(1)) if fps_match else 30.0}
+
+
+def _decoded_frame_count(video_path: str) -> Optional[int]:
+    """
+    Frames que se pueden decodificar del video, o None si el decodificador
+    reporta errores (p. ej. slices que no corresponden a los SPS/PPS del stream).
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-nostdin", "-i", str(video_path), "-map", "0:v:0",
+         "-f", "null", "-progress", "pipe:1", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0 or result.stderr.strip():
+        return None
+    frames = re.findall(r"^frame=(\d+)", result.stdout.decode(errors="replace"), flags=re.MULTILINE)
+    return int(frames[-1]) if frames else None
 
-def clip_video_simple(source_path: str, target_path: str, start_s: float, duration_s: float):
-    """Extrae un segmento de video y lo guarda como MP4 sin audio."""
-    cap = cv2.VideoCapture(str(source_path))
+
+def _first_keyframe_after(source_path: str, start_s: float, duration_s: float) -> Optional[float]:
+    """
+    Tiempo del primer keyframe en [start_s, start_s + duration_s).
+
+    Sólo decodifica keyframes (-skip_frame nokey), así que es casi instantáneo
+    aunque el video sea una mitad completa.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostdin", "-ss", f"{start_s:.6f}", "-copyts", "-skip_frame", "nokey",
+         "-i", str(source_path), "-t", f"{duration_s:.6f}", "-map", "0:v:0", "-an",
+         "-vf", "showinfo", "-f", "null", "-"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    times = [float(t) for t in re.findall(r"pts_time:([\d.]+)", result.stderr.decode(errors="replace"))]
+    times = [t for t in times if start_s <= t < start_s + duration_s]
+    return min(times) if times else None
+
+
+def _clip_stream_copy(source_path: str, target_path: str, start_s: float, duration_s: float) -> bool:
+    """
+    Remux sin recodificar. El stream arranca en el keyframe anterior a start_s;
+    los frames previos quedan ocultos por la lista de edición del MP4.
+    """
+    result = _run_ffmpeg([
+        "-ss", f"{start_s:.6f}", "-i", str(source_path), "-t", f"{duration_s:.6f}",
+        "-map", "0:v:0", "-an", "-c", "copy", "-movflags", "+faststart", str(target_path)
+    ])
+    return result.returncode == 0
+
+
+def _clip_smart(source_path: str, target_path: str, start_s: float, duration_s: float) -> bool:
+    """
+    Recorte exacto recodificando sólo desde start_s hasta el primer keyframe
+    (el GOP inicial) y copiando el resto del stream sin recodificar.
+
+    La cabeza (libx264) y la cola (encoder original) tienen parámetros de
+    stream distintos y el concat conserva los de la primera parte; según el
+    encoder original, la cola puede quedar mal decodificada aunque ffmpeg
+    termine sin error. Por eso el resultado se decodifica completo y sólo se
+    acepta si no hay errores y tiene todos los frames del tramo.
+    """
+    probe = _probe_video(source_path)
+    if probe is None or probe["codec"] != "h264":
+        # La unión cabeza + cola sólo es segura si ambas partes son H.264
+        return False
+    fps = probe["fps"]
+    # Mismo redondeo a frames que el recorte recodificado
+    start_s = int(start_s * fps) / fps
+    total_frames = int(duration_s * fps)
+
+    keyframe_s = _first_keyframe_after(source_path, start_s, duration_s)
+    head_frames = total_frames if keyframe_s is None else int(round((keyframe_s - start_s) * fps))
+    head_frames = min(head_frames, total_frames)
+
+    if head_frames == total_frames:
+        # No hay keyframe en el tramo: se recodifica completo con ffmpeg
+        result = _run_ffmpeg([
+            "-ss", f"{start_s:.6f}", "-i", str(source_path), "-frames:v", str(total_frames),
+            "-map", "0:v:0", "-an", "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart", str(target_path)
+        ])
+        return result.returncode == 0
+
+    # La búsqueda en la entrada con copia cae en un keyframe anterior (según el
+    # índice del contenedor); se busca un margen antes y se descartan los
+    # paquetes previos al keyframe con -ss de salida. Ese corte compara DTS, que
+    # con B-frames va unos frames por detrás del PTS: se corta un poco antes y
+    # ffmpeg descarta igual todo lo que no empiece en keyframe.
+    margin_s = min(keyframe_s, 5.0)
+    tail_args = ["-ss", f"{keyframe_s - margin_s:.6f}", "-i", str(source_path)]
+    if margin_s > 0.25:
+        tail_args += ["-ss", f"{margin_s - 0.25:.6f}"]
+    tail_args += [
+        "-frames:v", str(total_frames - head_frames), "-map", "0:v:0", "-an", "-c", "copy",
+        "-avoid_negative_ts", "make_zero", "-video_track_timescale", "90000",
+    ]
+
+    if head_frames == 0:
+        # El tramo ya empieza en un keyframe: copia pura
+        result = _run_ffmpeg(tail_args + ["-movflags", "+faststart", str(target_path)])
+        return result.returncode == 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        head = os.path.join(tmp_dir, "head.mp4")
+        tail = os.path.join(tmp_dir, "tail.mp4")
+        list_path = os.path.join(tmp_dir, "list.txt")
+
+        head_result = _run_ffmpeg([
+            "-ss", f"{start_s:.6f}", "-i", str(source_path), "-frames:v", str(head_frames),
+            "-map", "0:v:0", "-an", "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+            "-pix_fmt", "yuv420p", "-r", f"{fps}", "-video_track_timescale", "90000", head
+        ])
+        tail_result = _run_ffmpeg(tail_args + [tail])
+        if head_result.returncode != 0 or tail_result.returncode != 0:
+            return False
+
+        with open(list_path, "w") as f:
+            f.write(f"file '{head}'\nfile '{tail}'\n")
+        result = _run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy",
+            "-movflags", "+faststart", str(target_path)
+        ])
+        if result.returncode != 0:
+            return False
+
+    decoded = _decoded_frame_count(target_path)
+    if decoded != total_frames:
+        print(f"⚠️ Recorte smart inválido ({decoded if decoded is not None else 'errores de decodificación'} "
+              f"de {total_frames} frames)")
+        return False
+    return True
+
+
+def _clip_reencode(source_path: str, target_path: str, start_s: float, duration_s: float, video_backend: str):
+    """Recorte decodificando y recodificando cada frame."""
+    cap = open_video_reader(source_path, backend=video_backend)
     if not cap.isOpened():
         raise RuntimeError(f"No se puede abrir el video fuente: {source_path}")
 
@@ -11,8 +169,7 @@ def clip_video_simple(source_path: str, target_path: str, start_s: float, durati
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(str(target_path), fourcc, fps, (width, height))
+    out = open_video_writer(target_path, fps, (width, height), backend=video_backend)
 
     start_frame = max(0, int(start_s * fps))
     total_frames = int(duration_s * fps)
@@ -29,4 +186,37 @@ def clip_video_simple(source_path: str, target_path: str, start_s: float, durati
             written += 1
     finally:
         cap.release()
-        out.release()
\ No newline at end of file
+        out.release()
+
+
+def clip_video_simple(
+    source_path: str,
+    target_path: str,
+    start_s: float,
+    duration_s: float,
+    video_backend: str = "opencv",
+    cut_mode: str = "reencode"
+):
+    """Extrae un segmento de video y lo guarda como MP4 sin audio.
+
+    cut_mode: 'reencode' (decodifica y recodifica todo; por defecto), 'smart'
+    (exacto; copia el stream y recodifica sólo el GOP inicial, y verifica el
+    resultado decodificándolo) o 'copy' (remux sin recodificar, lo más rápido;
+    el stream arranca en el keyframe anterior a start_s y el corte puede variar
+    en uno o dos frames). Si ffmpeg no está disponible, el contenedor/códec no
+    permite copiar o la verificación falla, se usa 'reencode'.
+    video_backend: 'opencv' (cv2, mp4v) o 'ffmpeg' (pipes rawvideo, salida H.264) para 'reencode'.
+    """
+    if cut_mode not in CUT_MODES:
+        raise ValueError(f"Modo de recorte desconocido: {cut_mode} (opciones: {', '.join(CUT_MODES)})")
+
+    if cut_mode != "reencode" and ffmpeg_available():
+        if cut_mode == "smart":
+            done = _clip_smart(source_path, target_path, start_s, duration_s)
+        else:
+            done = _clip_stream_copy(source_path, target_path, start_s, duration_s)
+        if done:
+            return
+        print(f"⚠️ No se pudo recortar sin recodificar ({cut_mode}), recodificando el segmento")
+
+    _clip_reencode(source_path, target_path, start_s, duration_s, video_backend)
@@ -25,9 +25,11 @@ def download_game(
     recortar: bool = False,
     start_s: float = 0.0,
     duration_s: float = 10.0,
+    cut_mode: str = "reencode",
 ) -> Dict[str, List[Path]]:
     """Descarga un juego de SoccerNet y opcionalmente recorta clips de los halves descargados.
 
+    cut_mode: modo de recorte de los clips ('smart', 'copy' o 'reencode', ver clip_video_simple).
     Retorna un dict con claves: files (archivos descargados), clips (clips generados), game_dir.
     """
     videos_dir = Path(local_dir)
@@ -53,7 +55,7 @@ def download_game(
             base = src.stem
             clip_name = f"{base}_clip_{int(start_s)}-{int(duration_s)}.mp4"
             dst = game_dir / clip_name
-            clip_video_simple(str(src), str(dst), float(start_s), float(duration_s))
+            clip_video_simple(str(src), str(dst), float(start_s), float(duration_s), cut_mode=cut_mode)
             clips.append(dst)
 
     return {"files": downloaded_paths, "clips": clips, "game_dir": game_dir}
\ No newline at end of file
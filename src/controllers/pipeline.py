@@ -0,0 +1,259 @@
+"""
+Motor de pipeline por etapas para el procesamiento de video.
+
+Cada etapa corre en su propio hilo y se comunica con la siguiente mediante una
+cola acotada (backpressure): si una etapa se atrasa, las anteriores se bloquean
+en lugar de acumular frames en memoria. El orden de los elementos se conserva
+(cada etapa es FIFO y tiene un único hilo), por lo que las etapas con estado
+(trackers, historiales) ven los frames en el mismo orden que el bucle serial.
+
+Las etapas que liberan el GIL (inferencia de PyTorch, OpenCV, NumPy) pueden así
+ejecutarse en paralelo: p.ej. la clasificación del frame N mientras se infiere
+el frame N+1.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Centinela de fin de stream entre etapas
+_END = object()
+
+
+class PipelineStage:
+    """
+    Etapa del pipeline: aplica `fn` a lotes de elementos.
+
+    `fn` recibe una lista de elementos (de hasta `batch_size`) y retorna la
+    lista de elementos que pasan a la siguiente etapa, en orden.
+    """
+
+    def __init__(self, name: str, fn: Callable[[List], List], batch_size: int = 1):
+        """
+        Args:
+            name: Nombre de la etapa (para el reporte)
+            fn: Función que procesa un lote y retorna los elementos resultantes
+            batch_size: Máximo de elementos por llamada a `fn`
+        """
+        self.name = name
+        self.fn = fn
+        self.batch_size = max(1, int(batch_size))
+
+        # Estadísticas
+        self.busy_time = 0.0
+        self.input_wait_time = 0.0
+        self.output_wait_time = 0.0
+        self.items_processed = 0
+        self.batches_processed = 0
+
+    def process(self, batch: List) -> List:
+        """Ejecuta `fn` sobre un lote contabilizando el tiempo ocupado."""
+        start = time.perf_counter()
+        results = self.fn(batch)
+        self.busy_time += time.perf_counter() - start
+        self.items_processed += len(batch)
+        self.batches_processed += 1
+        return results if results is not None else []
+
+
+class StagedPipeline:
+    """
+    Ejecuta una secuencia de etapas sobre un iterable de elementos.
+
+    En modo paralelo, la lectura de la fuente y cada etapa corren en hilos
+    separados unidos por colas de tamaño `queue_size`. En modo serial
+    (`parallel=False`) todas las etapas se ejecutan en el hilo llamador, lo que
+    resulta útil para depurar y produce exactamente el mismo resultado.
+    """
+
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        queue_size: int = 4,
+        parallel: bool = True,
+        source_name: str = "decode"
+    ):
+        """
+        Args:
+            stages: Etapas en orden de ejecución
+            queue_size: Capacidad de cada cola entre etapas
+            parallel: Si True, cada etapa corre en su propio hilo
+            source_name: Nombre con el que se reporta la lectura de la fuente
+        """
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.parallel = parallel
+        self.source_name = source_name
+
+        self.source_time = 0.0
+        self.source_items = 0
+        self.wall_time = 0.0
+
+        self._abort = threading.Event()
+        self._errors = []
+
+    # ------------------------------------------------------------------ #
+    # Ejecución
+    # ------------------------------------------------------------------ #
+    def run(self, source: Iterable):
+        """Procesa todos los elementos de `source` a través de las etapas."""
+        start = time.perf_counter()
+        try:
+            if self.parallel:
+                self._run_parallel(source)
+            else:
+                self._run_serial(source)
+        finally:
+            self.wall_time = time.perf_counter() - start
+
+    def _timed_source(self, source: Iterable) -> Iterator:
+        """Itera la fuente contabilizando el tiempo de lectura."""
+        iterator = iter(source)
+        while True:
+            read_start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.source_time += time.perf_counter() - read_start
+                return
+            self.source_time += time.perf_counter() - read_start
+            self.source_items += 1
+            yield item
+
+    def _run_serial(self, source: Iterable):
+        stream = self._timed_source(source)
+        for stage in self.stages:
+            stream = self._iter_stage(stage, stream)
+        for _ in stream:
+            pass
+
+    @staticmethod
+    def _iter_stage(stage: PipelineStage, upstream: Iterator) -> Iterator:
+        """Aplica una etapa a un iterador agrupando en lotes de `batch_size`."""
+        batch = []
+        for item in upstream:
+            batch.append(item)
+            if len(batch) >= stage.batch_size:
+                yield from stage.process(batch)
+                batch = []
+        if batch:
+            yield from stage.process(batch)
+
+    def _run_parallel(self, source: Iterable):
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+
+        threads = [threading.Thread(
+            target=self._guard, args=(self._feed, source, queues[0]),
+            name=f"pipeline-{self.source_name}", daemon=True
+        )]
+        for i, stage in enumerate(self.stages):
+            out_queue = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(threading.Thread(
+                target=self._guard, args=(self._stage_loop, stage, queues[i], out_queue),
+                name=f"pipeline-{stage.name}", daemon=True
+            ))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+    def _guard(self, target, *args):
+        """Ejecuta el cuerpo de un hilo; ante un error aborta todo el pipeline."""
+        try:
+            target(*args)
+        except BaseException as e:
+            self._errors.append(e)
+            self._abort.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Encola respetando la señal de aborto. Retorna False si se abortó."""
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        """Desencola respetando la señal de aborto (retorna _END si se abortó)."""
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _feed(self, source: Iterable, out_queue: queue.Queue):
+        for item in self._timed_source(source):
+            if not self._put(out_queue, item):
+                return
+        self._put(out_queue, _END)
+
+    def _stage_loop(self, stage: PipelineStage, in_queue: queue.Queue, out_queue: Optional[queue.Queue]):
+        finished = False
+        while not finished:
+            # Primer elemento del lote (bloqueante)
+            wait_start = time.perf_counter()
+            item = self._get(in_queue)
+            stage.input_wait_time += time.perf_counter() - wait_start
+            if item is _END:
+                break
+
+            batch = [item]
+            while len(batch) < stage.batch_size:
+                wait_start = time.perf_counter()
+                item = self._get(in_queue)
+                stage.input_wait_time += time.perf_counter() - wait_start
+                if item is _END:
+                    finished = True
+                    break
+                batch.append(item)
+
+            results = stage.process(batch)
+
+            if out_queue is not None:
+                wait_start = time.perf_counter()
+                for result in results:
+                    if not self._put(out_queue, result):
+                        return
+                stage.output_wait_time += time.perf_counter() - wait_start
+
+        if out_queue is not None:
+            self._put(out_queue, _END)
+
+    # ------------------------------------------------------------------ #
+    # Reporte
+    # ------------------------------------------------------------------ #
+    def get_report(self) -> Dict:
+        """
+        Retorna utilización por etapa: fracción del tiempo total de la
+        ejecución en que cada etapa estuvo ocupada procesando.
+        """
+        wall = self.wall_time if self.wall_time > 0 else 1e-9
+        stages = {
+            self.source_name: {
+                'items': self.source_items,
+                'busy_time_s': self.source_time,
+                'utilization': self.source_time / wall,
+            }
+        }
+        for stage in self.stages:
+            stages[stage.name] = {
+                'items': stage.items_processed,
+                'batches': stage.batches_processed,
+                'busy_time_s': stage.busy_time,
+                'input_wait_time_s': stage.input_wait_time,
+                'output_wait_time_s': stage.output_wait_time,
+                'utilization': stage.busy_time / wall,
+            }
+        return {
+            'parallel': self.parallel,
+            'wall_time_s': self.wall_time,
+            'stages': stages,
+        }
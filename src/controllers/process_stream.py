@@ -0,0 +1,342 @@
+"""
+Procesamiento de un partido en vivo (stream) con presupuesto de latencia.
+
+A diferencia de process_video, que recorre un archivo completo, aquí los
+frames llegan de una fuente en vivo (URL rtsp/http, cámara, o un archivo
+local reproducido a su fps nativo como sustituto de un stream de red) y cada
+resultado se publica apenas se produce: métricas tácticas del frame, puntos
+y frame del radar (y opcionalmente el frame anotado) mediante `on_frame`.
+
+Para sostener el presupuesto de latencia (captura → publicación) el
+LatencyController decide en la admisión de cada frame:
+
+- 'drop': descarta los frames que ya no llegarían a tiempo.
+- 'stride': sube el salto de detección (1 de cada N frames con detección, el
+  resto por predicción de movimiento) mientras haya atraso, lo baja cuando
+  sobra margen, y sólo descarta frames si ya está en el salto máximo.
+
+Al final se reportan los percentiles de latencia de punta a punta y la tasa
+de descarte.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from src.controllers.pipeline import PipelineStage, StagedPipeline
+from src.controllers.process_video import FrameContext, MatchAnalyzer, convert_to_native_types
+from src.utils.radar import draw_radar_view
+from src.utils.video_io import LiveFrameSource
+
+# Políticas ante atraso: descartar frames o saltar detecciones
+DROP_POLICIES = ("drop", "stride")
+
+
+class LatencyController:
+    """
+    Admisión de frames según el presupuesto de latencia.
+
+    La latencia prevista de un frame es su antigüedad al admitirlo más la
+    latencia reciente del pipeline (admisión → publicación, media exponencial).
+    Siempre se admite un frame si no hay ninguno en proceso, para que el
+    pipeline trabaje sobre el frame más reciente disponible.
+    """
+
+    def __init__(
+        self,
+        latency_budget_s: float,
+        policy: str = "drop",
+        max_stride: int = 4,
+        adjust_interval: int = 10,
+        smoothing: float = 0.2
+    ):
+        """
+        Args:
+            latency_budget_s: Latencia máxima captura → publicación (segundos)
+            policy: 'drop' o 'stride'
+            max_stride: Con 'stride', salto de detección máximo
+            adjust_interval: Con 'stride', frames admitidos mínimos entre dos cambios de salto
+            smoothing: Peso de la última medición en la media de latencia del pipeline
+        """
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Política no soportada: {policy} (opciones: {DROP_POLICIES})")
+        self.latency_budget_s = latency_budget_s
+        self.policy = policy
+        self.max_stride = max(1, int(max_stride))
+        self.adjust_interval = max(1, int(adjust_interval))
+        self.smoothing = smoothing
+
+        self.stride = 1
+        self._since_detection = None
+        self._since_adjust = 0
+        self._pipeline_latency = 0.0
+        self._admitted: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+        # Estadísticas
+        self.frames_admitted = 0
+        self.frames_dropped = 0
+        self.frames_detected = 0
+        self.stride_changes = 0
+        self.latencies: List[float] = []
+
+    def admit(self, ctx: FrameContext, now: float) -> bool:
+        """
+        Decide si el frame entra al pipeline y, si entra, si se detecta
+        (fija `ctx.detected`; `ctx.audit` queda en False).
+
+        Returns:
+            False si el frame se descarta
+        """
+        with self._lock:
+            in_flight = len(self._admitted)
+            predicted = (now - ctx.capture_time) + self._pipeline_latency
+            late = predicted > self.latency_budget_s
+
+            if self.policy == "stride":
+                self._since_adjust += 1
+                if self._since_adjust >= self.adjust_interval:
+                    if late and self.stride < self.max_stride:
+                        self.stride += 1
+                        self._since_adjust = 0
+                        self.stride_changes += 1
+                    elif predicted < self.latency_budget_s * 0.5 and self.stride > 1:
+                        self.stride -= 1
+                        self._since_adjust = 0
+                        self.stride_changes += 1
+                # Con el salto al máximo y aún con atraso, queda descartar
+                late = late and self.stride >= self.max_stride
+
+            if late and in_flight > 0:
+                self.frames_dropped += 1
+                return False
+
+            ctx.detected = self._since_detection is None or self._since_detection + 1 >= self.stride
+            ctx.audit = False
+            self._since_detection = 0 if ctx.detected else self._since_detection + 1
+            self.frames_detected += int(ctx.detected)
+            self.frames_admitted += 1
+            self._admitted[ctx.index] = now
+            return True
+
+    def published(self, ctx: FrameContext, now: float):
+        """Registra la publicación del frame: latencia de punta a punta y del pipeline."""
+        with self._lock:
+            admitted_at = self._admitted.pop(ctx.index, now)
+            self.latencies.append(now - ctx.capture_time)
+            self._pipeline_latency = (
+                self.smoothing * (now - admitted_at) + (1 - self.smoothing) * self._pipeline_latency
+            )
+
+    def get_report(self) -> Dict:
+        """Percentiles de latencia, violaciones del presupuesto y decisiones de admisión."""
+        latencies_ms = np.array(self.latencies) * 1000.0
+        report = {
+            'policy': self.policy,
+            'latency_budget_ms': self.latency_budget_s * 1000.0,
+            'frames_admitted': self.frames_admitted,
+            'frames_dropped_late': self.frames_dropped,
+            'frames_detected': self.frames_detected,
+            'final_stride': self.stride,
+            'stride_changes': self.stride_changes,
+            'frames_published': len(latencies_ms),
+        }
+        if len(latencies_ms) > 0:
+            p50, p90, p95, p99 = np.percentile(latencies_ms, [50, 90, 95, 99])
+            report['latency_ms'] = {
+                'mean': float(latencies_ms.mean()), 'p50': float(p50), 'p90': float(p90),
+                'p95': float(p95), 'p99': float(p99), 'max': float(latencies_ms.max()),
+            }
+            violations = int((latencies_ms > self.latency_budget_s * 1000.0).sum())
+            report['budget_violations'] = violations
+            report['budget_violation_rate'] = violations / len(latencies_ms)
+        return report
+
+
+def print_stream_report(report: Dict):
+    """Imprime el resumen de latencia y descartes del modo stream."""
+    print("\n⏱️ Reporte del stream:")
+    print(
+        f"   Frames: {report['frames_captured']} capturados, {report['frames_published']} publicados, "
+        f"{report['frames_dropped']} descartados ({report['drop_rate'] * 100:.1f}%: "
+        f"{report['frames_overflowed']} por desborde de captura, {report['frames_dropped_late']} por atraso)"
+    )
+    latency = report.get('latency_ms')
+    if latency:
+        print(
+            f"   Latencia captura → publicación: p50 {latency['p50']:.0f} ms | p90 {latency['p90']:.0f} ms | "
+            f"p95 {latency['p95']:.0f} ms | p99 {latency['p99']:.0f} ms | máx {latency['max']:.0f} ms"
+        )
+        print(
+            f"   Presupuesto {report['latency_budget_ms']:.0f} ms ({report['policy']}): "
+            f"{report['budget_violations']} frames fuera ({report['budget_violation_rate'] * 100:.1f}%)"
+        )
+    if report['policy'] == "stride":
+        print(
+            f"   Detección: {report['frames_detected']} de {report['frames_admitted']} frames admitidos | "
+            f"salto final {report['final_stride']} ({report['stride_changes']} cambios)"
+        )
+
+
+def process_stream(
+    source: str,
+    player_model,
+    ball_model=None,
+    pitch_model=None,
+    on_frame: Optional[Callable[[Dict], None]] = None,
+    conf: float = 0.3,
+    detection_mode: str = "players_and_ball",
+    img_size: int = 640,
+    full_field_approx: bool = False,
+    latency_budget_ms: float = 500.0,
+    drop_policy: str = "drop",
+    max_stride: int = 4,
+    replay_realtime: Optional[bool] = None,
+    capture_buffer: int = 2,
+    batch_size: int = 1,
+    render: bool = False,
+    publish_radar: bool = True,
+    ball_search: str = "full",
+    pitch_motion_threshold: float = 0.0,
+    max_frames: int = 0,
+    stop_event: Optional[threading.Event] = None,
+    stats_path: Optional[str] = None
+) -> Dict:
+    """
+    Analiza un stream en vivo publicando los resultados frame a frame.
+
+    Args:
+        source: URL del stream (rtsp://, http://...), índice de cámara o ruta a un video local
+        player_model: Modelo YOLO para detección de jugadores
+        ball_model: Modelo YOLO para detección de pelota (opcional)
+        pitch_model: Modelo YOLO para detección de campo (opcional)
+        on_frame: Se llama con cada frame publicado, con un dict:
+            'frame_index', 'latency_ms', 'detected', 'team_metrics' (equipo ->
+            formación y métricas del frame), 'radar_points', 'radar_frame' (imagen
+            BGR o None) y, con `render`, 'annotated_frame'
+        conf: Umbral de confianza para detecciones de personas
+        detection_mode: Modo de detección ('players_only', 'ball_only', 'players_and_ball')
+        img_size: Tamaño de imagen para inferencia
+        full_field_approx: Si True, asume que la imagen completa es el campo (experimental)
+        latency_budget_ms: Latencia máxima captura → publicación
+        drop_policy: 'drop' (descartar frames atrasados) o 'stride' (saltar detecciones;
+            descarta sólo con el salto en `max_stride`)
+        max_stride: Salto de detección máximo con 'stride'
+        replay_realtime: Entregar la fuente a su fps nativo (por defecto, sí para archivos locales)
+        capture_buffer: Frames capturados retenidos; con más, se descartan los más viejos
+        batch_size: Frames por inferencia (1 minimiza la latencia)
+        render: Si True, se publica además el frame anotado
+        publish_radar: Si True, se publica el radar dibujado de cada frame
+        ball_search: 'full', 'roi' o 'tiled' (ver process_video)
+        pitch_motion_threshold: Movimiento de cámara que fuerza reinferir keypoints (ver process_video)
+        max_frames: Detenerse tras capturar estos frames (0 = hasta el fin del stream)
+        stop_event: Evento para detener un stream sin fin
+        stats_path: Si se indica, se escribe ahí el JSON de estadísticas con el reporte del stream
+
+    Returns:
+        Dict con el reporte del stream (latencias, descartes, pipeline)
+    """
+    source = str(source)
+    is_local_file = Path(source).is_file()
+    capture_source = int(source) if source.isdigit() else source
+    cap = cv2.VideoCapture(capture_source)
+    if not cap.isOpened():
+        raise RuntimeError(f"No se puede abrir el stream: {source}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if replay_realtime is None:
+        replay_realtime = is_local_file
+
+    analyzer = MatchAnalyzer(
+        player_model=player_model,
+        ball_model=ball_model,
+        pitch_model=pitch_model,
+        conf=conf,
+        detection_mode=detection_mode,
+        img_size=img_size,
+        full_field_approx=full_field_approx,
+        width=width,
+        height=height,
+        ball_search=ball_search,
+        pitch_motion_threshold=pitch_motion_threshold
+    )
+    # Con 'stride' la pelota se predice durante todo el salto máximo
+    analyzer.ball_predictor.max_gap = max(analyzer.ball_predictor.max_gap, max_stride * 2)
+
+    controller = LatencyController(latency_budget_ms / 1000.0, policy=drop_policy, max_stride=max_stride)
+    live = LiveFrameSource(cap, fps, replay_realtime=replay_realtime, buffer_size=capture_buffer)
+    print(f"📡 Stream {source} ({width}x{height} @ {fps:.1f} fps) | presupuesto {latency_budget_ms:.0f} ms, "
+          f"política '{drop_policy}'")
+
+    def admitted_contexts():
+        while stop_event is None or not stop_event.is_set():
+            item = live.read()
+            if item is None:
+                return
+            index, frame, capture_time = item
+            ctx = FrameContext(index, frame)
+            ctx.capture_time = capture_time
+            if controller.admit(ctx, time.perf_counter()):
+                yield ctx
+            if max_frames and index >= max_frames:
+                return
+
+    def publish_frames(contexts):
+        for ctx in contexts:
+            now = time.perf_counter()
+            radar_frame = None
+            if publish_radar and ctx.radar_points is not None:
+                radar_frame = draw_radar_view(analyzer.pitch_config, ctx.radar_points, scale=8)
+            update = {
+                'frame_index': ctx.index,
+                'latency_ms': (now - ctx.capture_time) * 1000.0,
+                'detected': ctx.detected,
+                'team_metrics': ctx.team_metrics,
+                'radar_points': ctx.radar_points,
+                'radar_frame': radar_frame,
+            }
+            if render:
+                update['annotated_frame'] = ctx.annotated_frame
+            controller.published(ctx, now)
+            if on_frame is not None:
+                on_frame(update)
+        return []
+
+    stages = [
+        PipelineStage('detect', lambda contexts: analyzer.detect_frames(contexts, schedule=False),
+                      batch_size=batch_size),
+        PipelineStage('classify_project', analyzer.classify_frames),
+    ]
+    if render:
+        stages.append(PipelineStage('render', analyzer.render_frames))
+    stages.append(PipelineStage('publish', publish_frames))
+
+    # Colas de un elemento: lo que espera en cola es latencia
+    pipeline = StagedPipeline(stages, queue_size=1, source_name='capture')
+    try:
+        pipeline.run(admitted_contexts())
+    finally:
+        live.release()
+
+    report = live.get_report()
+    report.update(controller.get_report())
+    report['frames_dropped'] = report['frames_overflowed'] + report['frames_dropped_late']
+    report['drop_rate'] = report['frames_dropped'] / report['frames_captured'] if report['frames_captured'] else 0.0
+    report['pipeline'] = pipeline.get_report()
+
+    if stats_path is not None:
+        stats_data = analyzer.build_stats(fps)
+        stats_data['stream'] = {k: v for k, v in report.items() if k != 'pipeline'}
+        with open(stats_path, 'w') as f:
+            json.dump(convert_to_native_types(stats_data), f, indent=2)
+        print(f"Estadísticas guardadas en: {stats_path}")
+
+    print_stream_report(report)
+    return report
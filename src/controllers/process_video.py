@@ -1,17 +1,34 @@
 import cv2
 import numpy as np
 import supervision as sv
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional
 from sklearn.cluster import KMeans
 from collections import deque, Counter
 import json
+import pickle
+import time
 from pathlib import Path
 from src.utils.view_transformer import ViewTransformer
 from src.utils.radar import SoccerPitchConfiguration, draw_radar_view
 from src.controllers.formation_detector import FormationDetector
 from src.controllers.tactical_metrics import TacticalMetricsCalculator, TacticalMetricsTracker
+from src.controllers.pipeline import PipelineStage, StagedPipeline
+from src.controllers.team_classification import OnlineTeamColorModel, TrackClassificationCache, TrackVoteStore
+from src.utils.video_io import PrefetchFrameSource, AsyncVideoWriter, concat_videos, open_video_reader, open_video_writer, seek_frame
+from src.utils.motion_prediction import TrackMotionPredictor, StrideDriftMonitor, BallSearchWindow
+from src.utils.checkpoint import RunCheckpoint
+from src.models.tiled_inference import TiledInference
+from src.utils.camera_motion import CameraMotionGate
+from src.utils.resolution_scheduler import AdaptiveResolutionScheduler
+from src.utils.detection_cache import DetectionCache
+from src.models.model_metadata import cached_model_metadata
 from ultralytics import YOLO
 
+# Búsqueda de la pelota: 'full' (frame completo a img_size), 'roi' (recorte a
+# resolución nativa alrededor de la posición predicha) o 'tiled' (mosaicos
+# solapados a resolución nativa que cubren todo el frame)
+BALL_SEARCH_MODES = ("full", "roi", "tiled")
+
 
 def convert_to_native_types(obj):
     """
@@ -39,78 +56,146 @@ def convert_to_native_types(obj):
         return obj
 
 
-def extract_color_features(frame: np.ndarray, bbox: np.ndarray) -> Dict[str, np.ndarray]:
-    """
-    Extrae características de color de una persona, separando camiseta y pantalón.
+# Fracción del frame cubierta por las ROIs a partir de la cual es más barato
+# convertir el frame entero y usar la tabla de sumas que copiar sus píxeles
+INTEGRAL_AREA_FRACTION = 0.35
 
-    Returns:
-        Dict con:
-        - 'shirt': [H_mean, S_mean, V_mean] para camiseta
-        - 'pants': [H_mean, S_mean, V_mean] para pantalón
-        - 'combined': [H_shirt, S_shirt, V_shirt, H_pants, S_pants, V_pants]
-        - 'color_variance': diferencia entre color de camiseta y pantalón
+
+def hsv_integral(frame: np.ndarray) -> np.ndarray:
+    """
+    Tabla de sumas acumuladas (summed-area table) del frame en HSV, de
+    (alto + 1, ancho + 1, 3). Con ella la media HSV de cualquier rectángulo
+    sale de 4 lecturas, sin volver a convertir ni recorrer sus píxeles.
     """
-    x1, y1, x2, y2 = map(int, bbox)
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    # int32 alcanza mientras 255 * píxeles < 2^31 (hasta ~4K); si no, float64
+    sdepth = cv2.CV_32S if hsv.shape[0] * hsv.shape[1] * 255 < 2 ** 31 else cv2.CV_64F
+    return cv2.integral(hsv, sdepth=sdepth)
+
+
+def _color_rois(boxes: np.ndarray, frame_width: int, frame_height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """ROIs (N, 4) de camiseta (torso superior) y pantalón (piernas) de cada caja, en enteros."""
+    x1, y1, x2, y2 = np.trunc(boxes).astype(np.int64).T
     height = y2 - y1
     width = x2 - x1
+    center_x = x1 + width // 2
+    half_w = np.trunc(width * 0.5).astype(np.int64) // 2
+
+    rois = []
+    for center_fraction, height_fraction in ((0.30, 0.25), (0.70, 0.20)):
+        center_y = y1 + np.trunc(height * center_fraction).astype(np.int64)
+        half_h = np.trunc(height * height_fraction).astype(np.int64) // 2
+        rois.append(np.stack([
+            np.clip(center_x - half_w, 0, frame_width),
+            np.clip(center_y - half_h, 0, frame_height),
+            np.clip(center_x + half_w, 0, frame_width),
+            np.clip(center_y + half_h, 0, frame_height),
+        ], axis=1))
+    return rois[0], rois[1]
+
+
+def _roi_means_gathered(frame: np.ndarray, rois: np.ndarray) -> np.ndarray:
+    """
+    Media HSV (N, 3) de cada ROI convirtiendo sólo sus píxeles: se juntan en
+    una única imagen de una fila, se convierten con un solo cvtColor y se
+    promedian por tramos con np.add.reduceat (ROI vacía = 0).
+    """
+    means = np.zeros((len(rois), 3))
+    area = np.maximum(rois[:, 2] - rois[:, 0], 0) * np.maximum(rois[:, 3] - rois[:, 1], 0)
+    valid = np.flatnonzero(area > 0)
+    if len(valid) == 0:
+        return means
+    pixels = np.concatenate([
+        frame[rois[i, 1]:rois[i, 3], rois[i, 0]:rois[i, 2]].reshape(-1, 3) for i in valid
+    ])
+    hsv = cv2.cvtColor(pixels[None], cv2.COLOR_BGR2HSV)[0]
+    starts = np.concatenate([[0], np.cumsum(area[valid])[:-1]])
+    means[valid] = np.add.reduceat(hsv, starts, axis=0, dtype=np.int64) / area[valid, None]
+    return means
+
+
+def _roi_means(integral: np.ndarray, rois: np.ndarray) -> np.ndarray:
+    """Media HSV (N, 3) de cada ROI a partir de la tabla de sumas (ROI vacía = 0)."""
+    x1, y1, x2, y2 = rois.T
+    x2 = np.maximum(x2, x1)
+    y2 = np.maximum(y2, y1)
+    sums = (
+        integral[y2, x2].astype(np.float64) - integral[y1, x2]
+        - integral[y2, x1] + integral[y1, x1]
+    )
+    area = (x2 - x1) * (y2 - y1)
+    means = np.zeros((len(rois), 3))
+    valid = area > 0
+    means[valid] = sums[valid] / area[valid, None]
+    return means
+
+
+def extract_color_features_batch(
+    frame: np.ndarray,
+    boxes: np.ndarray,
+    integral: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Medias HSV de camiseta y pantalón de todas las cajas en una sola pasada.
 
-    # ROI para camiseta (torso superior)
-    shirt_center_x = x1 + width // 2
-    shirt_center_y = y1 + int(height * 0.30)
-    shirt_roi_width = int(width * 0.5)
-    shirt_roi_height = int(height * 0.25)
-
-    shirt_x1 = max(0, shirt_center_x - shirt_roi_width // 2)
-    shirt_y1 = max(0, shirt_center_y - shirt_roi_height // 2)
-    shirt_x2 = min(frame.shape[1], shirt_center_x + shirt_roi_width // 2)
-    shirt_y2 = min(frame.shape[0], shirt_center_y + shirt_roi_height // 2)
-
-    # ROI para pantalón (piernas)
-    pants_center_x = x1 + width // 2
-    pants_center_y = y1 + int(height * 0.70)
-    pants_roi_width = int(width * 0.5)
-    pants_roi_height = int(height * 0.20)
-
-    pants_x1 = max(0, pants_center_x - pants_roi_width // 2)
-    pants_y1 = max(0, pants_center_y - pants_roi_height // 2)
-    pants_x2 = min(frame.shape[1], pants_center_x + pants_roi_width // 2)
-    pants_y2 = min(frame.shape[0], pants_center_y + pants_roi_height // 2)
-
-    # Extraer colores de camiseta
-    shirt_roi = frame[shirt_y1:shirt_y2, shirt_x1:shirt_x2]
-    if shirt_roi.size == 0:
-        shirt_color = np.array([0, 0, 0])
-    else:
-        shirt_hsv = cv2.cvtColor(shirt_roi, cv2.COLOR_BGR2HSV)
-        shirt_color = np.array([
-            np.mean(shirt_hsv[:, :, 0]),
-            np.mean(shirt_hsv[:, :, 1]),
-            np.mean(shirt_hsv[:, :, 2])
-        ])
-
-    # Extraer colores de pantalón
-    pants_roi = frame[pants_y1:pants_y2, pants_x1:pants_x2]
-    if pants_roi.size == 0:
-        pants_color = np.array([0, 0, 0])
-    else:
-        pants_hsv = cv2.cvtColor(pants_roi, cv2.COLOR_BGR2HSV)
-        pants_color = np.array([
-            np.mean(pants_hsv[:, :, 0]),
-            np.mean(pants_hsv[:, :, 1]),
-            np.mean(pants_hsv[:, :, 2])
-        ])
+    Con pocas personas se convierten sólo los píxeles de las ROIs (una llamada
+    a cvtColor para todas); si las ROIs cubren más de INTEGRAL_AREA_FRACTION
+    del frame, se convierte el frame entero y las medias salen de su tabla de
+    sumas. Ambos caminos dan exactamente las mismas medias.
 
-    # Calcular varianza de color (diferencia entre camiseta y pantalón)
-    color_variance = np.linalg.norm(shirt_color - pants_color)
+    Args:
+        frame: Frame BGR
+        boxes: Cajas (N, 4) en xyxy
+        integral: hsv_integral(frame) si ya se calculó para este frame
 
+    Returns:
+        Array (N, 6): [H_shirt, S_shirt, V_shirt, H_pants, S_pants, V_pants]
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.empty((0, 6))
+    shirt_rois, pants_rois = _color_rois(boxes, frame.shape[1], frame.shape[0])
+    rois = np.concatenate([shirt_rois, pants_rois])
+    if integral is None:
+        roi_area = np.sum((rois[:, 2] - rois[:, 0]).clip(0) * (rois[:, 3] - rois[:, 1]).clip(0))
+        if roi_area > INTEGRAL_AREA_FRACTION * frame.shape[0] * frame.shape[1]:
+            integral = hsv_integral(frame)
+    means = _roi_means(integral, rois) if integral is not None else _roi_means_gathered(frame, rois)
+    return np.hstack([means[:len(boxes)], means[len(boxes):]])
+
+
+def _color_features_dict(combined: np.ndarray) -> Dict[str, np.ndarray]:
+    shirt_color = combined[:3]
+    pants_color = combined[3:]
     return {
         'shirt': shirt_color,
         'pants': pants_color,
-        'combined': np.concatenate([shirt_color, pants_color]),
-        'color_variance': color_variance
+        'combined': combined,
+        # Varianza de color (diferencia entre camiseta y pantalón)
+        'color_variance': np.linalg.norm(shirt_color - pants_color)
     }
 
 
+def extract_color_features(
+    frame: np.ndarray,
+    bbox: np.ndarray,
+    integral: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Extrae características de color de una persona, separando camiseta y pantalón.
+
+    Para varias personas del mismo frame usar extract_color_features_batch.
+
+    Returns:
+        Dict con:
+        - 'shirt': [H_mean, S_mean, V_mean] para camiseta
+        - 'pants': [H_mean, S_mean, V_mean] para pantalón
+        - 'combined': [H_shirt, S_shirt, V_shirt, H_pants, S_pants, V_pants]
+        - 'color_variance': diferencia entre color de camiseta y pantalón
+    """
+    return _color_features_dict(extract_color_features_batch(frame, bbox, integral)[0])
+
+
 def is_in_playing_field(bbox: np.ndarray, frame_width: int, frame_height: int) -> bool:
     """
     Determina si una persona está dentro del área de juego visible.
@@ -190,73 +275,93 @@ def is_in_goal_area(bbox: np.ndarray, frame_width: int, frame_height: int) -> bo
     return is_in_goal_zone and in_field_area and is_reasonable_size
 
 
-def cluster_teams(frame: np.ndarray, detections: sv.Detections, frame_width: int, frame_height: int) -> Tuple[Dict, Dict, List[int], List[int], List[int]]:
+def playing_field_mask(boxes: np.ndarray, frame_width: int, frame_height: int) -> np.ndarray:
     """
-    Agrupa jugadores en 2 equipos y detecta árbitros usando K-means clustering mejorado.
+    Versión vectorizada de is_in_playing_field.
 
-    Estrategia mejorada (v3.1):
-    1. Filtrar personas FUERA del área de juego (banquillos, director técnico)
-    2. Excluir porteros (por posición en área de gol)
-    3. Detectar árbitros por score (color típico + varianza) - EXCLUYE ROJO
-    4. K-means con 2 clusters solo sobre jugadores (no árbitros ni porteros)
-    5. Usar características de camiseta para clustering
+    Args:
+        boxes: (N, 4) bounding boxes [x1, y1, x2, y2]
 
     Returns:
-        team1_colors, team2_colors, team1_indices, team2_indices, referee_indices
-        donde team_colors es un Dict con 'shirt' y 'pants'
+        Array booleano (N,): True si la persona está en el área de juego
     """
-    if len(detections) < 4:
-        mid = len(detections) // 2
-        team1_indices = list(range(mid))
-        team2_indices = list(range(mid, len(detections)))
-        default_team1 = {'shirt': np.array([90, 100, 100]), 'pants': np.array([0, 50, 50])}
-        default_team2 = {'shirt': np.array([0, 100, 100]), 'pants': np.array([0, 50, 50])}
-        return default_team1, default_team2, team1_indices, team2_indices, []
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    center_x = (boxes[:, 0] + boxes[:, 2]) / 2
+    center_y = (boxes[:, 1] + boxes[:, 3]) / 2
+    bbox_height = boxes[:, 3] - boxes[:, 1]
+
+    in_rows = (center_y >= frame_height * 0.15) & (center_y <= frame_height * 0.95)
+    big_enough = bbox_height >= frame_height * 0.05
+    # En las bandas laterales sólo se aceptan personas cerca de la línea de fondo (córner)
+    on_sideline = (center_x < frame_width * 0.08) | (center_x > frame_width * 0.92)
+    return in_rows & big_enough & ~(on_sideline & (center_y < frame_height * 0.85))
+
+
+def goal_area_mask(boxes: np.ndarray, frame_width: int, frame_height: int) -> np.ndarray:
+    """
+    Versión vectorizada de is_in_goal_area.
+
+    Args:
+        boxes: (N, 4) bounding boxes [x1, y1, x2, y2]
+
+    Returns:
+        Array booleano (N,): True si la persona está en área de gol
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    center_x = (boxes[:, 0] + boxes[:, 2]) / 2
+    center_y = (boxes[:, 1] + boxes[:, 3]) / 2
+    bbox_height = boxes[:, 3] - boxes[:, 1]
+
+    in_field_area = (center_y > frame_height * 0.25) & (center_y < frame_height * 0.95)
+    is_reasonable_size = bbox_height > frame_height * 0.08
+    is_in_goal_zone = (center_x < frame_width * 0.05) | (center_x > frame_width * 0.95)
+    return is_in_goal_zone & in_field_area & is_reasonable_size
+
+
+def _team_color_data(
+    frame: np.ndarray,
+    detections: sv.Detections,
+    frame_width: int,
+    frame_height: int
+) -> Tuple[List[Dict], List[int]]:
+    """
+    Colores de las personas en campo que no son porteros (filtrado por posición de cluster_teams).
 
+    Returns:
+        color_data (un Dict por persona con 'idx', 'shirt', 'pants' y 'variance') y non_gk_indices
+    """
     # Paso 1: Filtrar personas FUERA del área de juego (banquillos, bancas)
-    in_field_indices = []
-    out_of_field_indices = []
-    for idx, bbox in enumerate(detections.xyxy):
-        if is_in_playing_field(bbox, frame_width, frame_height):
-            in_field_indices.append(idx)
-        else:
-            out_of_field_indices.append(idx)
+    in_field = playing_field_mask(detections.xyxy, frame_width, frame_height)
 
     # Paso 2: Identificar porteros por posición (solo de los que están en campo)
-    goalkeeper_indices_set = set()
-    for idx in in_field_indices:
-        bbox = detections.xyxy[idx]
-        if is_in_goal_area(bbox, frame_width, frame_height):
-            x_center = (bbox[0] + bbox[2]) / 2
-            if x_center < frame_width * 0.05 or x_center > frame_width * 0.95:
-                goalkeeper_indices_set.add(idx)
+    is_goalkeeper = in_field & goal_area_mask(detections.xyxy, frame_width, frame_height)
 
     # Paso 3: Extraer características de color de personas en campo (NO-porteros)
     color_data = []
-    non_gk_indices = []
-
-    for idx in in_field_indices:
-        if idx not in goalkeeper_indices_set:
-            bbox = detections.xyxy[idx]
-            features = extract_color_features(frame, bbox)
-            color_data.append({
-                'idx': idx,
-                'features': features,
-                'shirt': features['shirt'],
-                'pants': features['pants'],
-                'variance': features['color_variance']
-            })
-            non_gk_indices.append(idx)
+    non_gk_indices = np.flatnonzero(in_field & ~is_goalkeeper).tolist()
+    batch_features = extract_color_features_batch(frame, detections.xyxy[non_gk_indices])
 
-    if len(color_data) < 3:
-        mid = len(non_gk_indices) // 2
-        team1_indices = non_gk_indices[:mid]
-        team2_indices = non_gk_indices[mid:]
-        default_team1 = {'shirt': np.array([90, 100, 100]), 'pants': np.array([0, 50, 50])}
-        default_team2 = {'shirt': np.array([0, 100, 100]), 'pants': np.array([0, 50, 50])}
-        return default_team1, default_team2, team1_indices, team2_indices, []
+    for idx, combined in zip(non_gk_indices, batch_features):
+        features = _color_features_dict(combined)
+        color_data.append({
+            'idx': idx,
+            'features': features,
+            'shirt': features['shirt'],
+            'pants': features['pants'],
+            'variance': features['color_variance']
+        })
 
-    # Paso 3: Detectar árbitros por alta varianza de color (algoritmo mejorado v3.2)
+    return color_data, non_gk_indices
+
+
+def _split_referees(color_data: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Separa árbitros de jugadores por score (color típico + varianza) - EXCLUYE ROJO.
+
+    Returns:
+        player_candidates, referee_candidates
+    """
+    # Detectar árbitros por alta varianza de color (algoritmo mejorado v3.2)
     # Los árbitros suelen tener colores muy diferentes entre camiseta y pantalón
     variances = np.array([d['variance'] for d in color_data])
 
@@ -351,6 +456,72 @@ def cluster_teams(frame: np.ndarray, detections: sv.Detections, frame_width: int
         player_candidates.extend(referee_candidates)
         referee_candidates = []
 
+    return player_candidates, referee_candidates
+
+
+def team_player_colors(
+    frame: np.ndarray,
+    detections: sv.Detections,
+    frame_width: int,
+    frame_height: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Colores HSV de camiseta y pantalón de los jugadores de campo de un frame
+    (sin personas fuera del campo, porteros ni árbitros): lo que agrupa
+    cluster_teams y lo que recibe OnlineTeamColorModel.update.
+
+    Returns:
+        shirt_colors (N, 3), pants_colors (N, 3); vacíos si hay menos de 3 personas en campo
+    """
+    color_data, _ = _team_color_data(frame, detections, frame_width, frame_height)
+    if len(color_data) < 3:
+        return np.empty((0, 3)), np.empty((0, 3))
+    player_candidates, _ = _split_referees(color_data)
+    return (
+        np.array([d['shirt'] for d in player_candidates], dtype=np.float64),
+        np.array([d['pants'] for d in player_candidates], dtype=np.float64),
+    )
+
+
+def cluster_teams(
+    frame: np.ndarray,
+    detections: sv.Detections,
+    frame_width: int,
+    frame_height: int
+) -> Tuple[Dict, Dict, List[int], List[int], List[int]]:
+    """
+    Agrupa jugadores en 2 equipos y detecta árbitros usando K-means clustering mejorado.
+
+    Estrategia mejorada (v3.1):
+    1. Filtrar personas FUERA del área de juego (banquillos, director técnico)
+    2. Excluir porteros (por posición en área de gol)
+    3. Detectar árbitros por score (color típico + varianza) - EXCLUYE ROJO
+    4. K-means con 2 clusters solo sobre jugadores (no árbitros ni porteros)
+    5. Usar características de camiseta para clustering
+
+    Returns:
+        team1_colors, team2_colors, team1_indices, team2_indices, referee_indices
+        donde team_colors es un Dict con 'shirt' y 'pants'
+    """
+    if len(detections) < 4:
+        mid = len(detections) // 2
+        team1_indices = list(range(mid))
+        team2_indices = list(range(mid, len(detections)))
+        default_team1 = {'shirt': np.array([90, 100, 100]), 'pants': np.array([0, 50, 50])}
+        default_team2 = {'shirt': np.array([0, 100, 100]), 'pants': np.array([0, 50, 50])}
+        return default_team1, default_team2, team1_indices, team2_indices, []
+
+    color_data, non_gk_indices = _team_color_data(frame, detections, frame_width, frame_height)
+
+    if len(color_data) < 3:
+        mid = len(non_gk_indices) // 2
+        team1_indices = non_gk_indices[:mid]
+        team2_indices = non_gk_indices[mid:]
+        default_team1 = {'shirt': np.array([90, 100, 100]), 'pants': np.array([0, 50, 50])}
+        default_team2 = {'shirt': np.array([0, 100, 100]), 'pants': np.array([0, 50, 50])}
+        return default_team1, default_team2, team1_indices, team2_indices, []
+
+    player_candidates, referee_candidates = _split_referees(color_data)
     referee_indices = [d['idx'] for d in referee_candidates]
 
     # Paso 4: Clustering solo sobre jugadores usando color de camiseta
@@ -395,7 +566,8 @@ def classify_person_smart(
     team1_colors: Dict,
     team2_colors: Dict,
     frame_width: int,
-    frame_height: int
+    frame_height: int,
+    features: Optional[np.ndarray] = None
 ) -> Tuple[str, int]:
     """
     Clasifica una persona como jugador de equipo 1, equipo 2, árbitro o portero.
@@ -408,11 +580,14 @@ def classify_person_smart(
     Args:
         team1_colors: Dict con 'shirt' y 'pants' del equipo 1
         team2_colors: Dict con 'shirt' y 'pants' del equipo 2
+        features: Fila (6,) de extract_color_features_batch para esta caja, si ya se calculó
 
     Returns:
         ('team1'|'team2'|'referee'|'goalkeeper', team_number)
     """
-    features = extract_color_features(frame, bbox)
+    if features is None:
+        features = extract_color_features_batch(frame, bbox)[0]
+    features = _color_features_dict(features)
     person_shirt = features['shirt']
     person_pants = features['pants']
     color_variance = features['color_variance']
@@ -522,120 +697,106 @@ def classify_person_smart(
         return ('team2', 2)
 
 
-def process_video(
-    source_path: str,
-    target_path: str,
-    player_model,
-    ball_model=None,
-    pitch_model=None,
-    conf: float = 0.3,
-    detection_mode: str = "players_and_ball",
-    img_size: int = 640,
-    full_field_approx: bool = False
-):
-    """
-    Procesa video completo con detección y tracking mejorado usando múltiples modelos.
+# Categorías de persona, en el orden de las máscaras de classify_persons_batch
+# (su índice es el código que se vota en TrackVoteStore)
+PERSON_CLASSES = ('team1', 'team2', 'referee', 'goalkeeper')
+GOALKEEPER_CLASS = PERSON_CLASSES.index('goalkeeper')
 
-    Args:
-        source_path: Ruta al video de entrada
-        target_path: Ruta al video de salida
-        player_model: Modelo YOLO para detección de jugadores
-        ball_model: Modelo YOLO para detección de pelota (opcional)
-        pitch_model: Modelo YOLO para detección de campo (opcional)
-        conf: Umbral de confianza para detecciones de personas
-        detection_mode: Modo de detección ('players_only', 'ball_only', 'players_and_ball')
-        img_size: Tamaño de imagen para inferencia
-        full_field_approx: Si True, asume que la imagen completa es el campo (experimental)
-    """
-    source_path = str(source_path)
-    target_path = str(target_path)
 
-    cap = cv2.VideoCapture(source_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"No se puede abrir el video fuente: {source_path}")
+def classify_persons_batch(
+    boxes: np.ndarray,
+    features: np.ndarray,
+    team1_colors: Dict,
+    team2_colors: Dict,
+    frame_width: int,
+    frame_height: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Versión vectorizada de classify_person_smart para todas las personas de un frame.
 
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    Aplica los mismos criterios (portero por posición y color, score de árbitro,
+    distancia a cada equipo) con operaciones de NumPy sobre todas las filas.
 
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(target_path, fourcc, fps, (width, height))
+    Args:
+        boxes: (N, 4) bounding boxes [x1, y1, x2, y2]
+        features: (N, 6) colores de extract_color_features_batch para esas cajas
+        team1_colors: Dict con 'shirt' y 'pants' del equipo 1
+        team2_colors: Dict con 'shirt' y 'pants' del equipo 2
 
-    # Trackers
-    person_tracker = sv.ByteTrack()
-    ball_tracker = sv.ByteTrack()
+    Returns:
+        team1_mask, team2_mask, referee_mask, goalkeeper_mask: arrays booleanos (N,),
+        exactamente uno True por fila
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    features = np.asarray(features, dtype=np.float64).reshape(-1, 6)
+    shirt, pants = features[:, :3], features[:, 3:]
+    color_variance = np.linalg.norm(shirt - pants, axis=1)
+
+    dist_team1_shirt = np.linalg.norm(shirt - team1_colors['shirt'], axis=1)
+    dist_team2_shirt = np.linalg.norm(shirt - team2_colors['shirt'], axis=1)
+    min_team_dist = np.minimum(dist_team1_shirt, dist_team2_shirt)
+    closer_to_team1 = dist_team1_shirt < dist_team2_shirt
+
+    # Portero: en el área de gol (extremos del campo) y con color distinto a ambos equipos
+    goalkeeper = goal_area_mask(boxes, frame_width, frame_height) & (min_team_dist > 45)
+
+    # Colores típicos de árbitros (mismos umbrales que classify_person_smart)
+    h, s, v = shirt.T
+    s_pants, v_pants = pants[:, 1], pants[:, 2]
+    is_black_shirt = (v < 70) & (s < 70)
+    is_yellow_shirt = (20 < h) & (h < 35) & (s > 100) & (v > 130)
+    is_bright_green_shirt = (40 < h) & (h < 75) & (s > 110) & (v > 110)
+    is_white_shirt = (v > 180) & (s < 50)
+    is_red_shirt = ((h < 15) | (h > 165)) & (s > 50) & (v > 50)
+    is_ref_color = (is_black_shirt | is_yellow_shirt | is_bright_green_shirt) & ~is_red_shirt & ~is_white_shirt
+    is_black_pants = (v_pants < 80) & (s_pants < 80)
+
+    referee_score = (
+        3 * (color_variance > 50)
+        + 3 * is_ref_color
+        + 2 * (is_black_pants & (is_yellow_shirt | is_bright_green_shirt))
+        + 2 * (min_team_dist > 75)
+        + 1 * (min_team_dist > 95)
+        - 3 * is_white_shirt
+    )
+    # Si parece árbitro pero es rojo, se clasifica por distancia (prioridad a equipo rojo)
+    referee = ~goalkeeper & (referee_score >= 6) & ~is_red_shirt
+
+    team1 = ~goalkeeper & ~referee & closer_to_team1
+    team2 = ~goalkeeper & ~referee & ~closer_to_team1
+    return team1, team2, referee, goalkeeper
+
+
+def identify_model_classes(player_model, ball_model=None) -> Tuple[List[int], List[int], List[int]]:
+    """
+    Identifica los IDs de clase de personas y pelota en los modelos de detección.
 
-    # Configurar modelo de pitch si se proporciona O si se usa aproximación
-    pitch_config = None
-    pitch_model_type = 'default'  # Default fallback
+    Args:
+        player_model: Modelo YOLO de jugadores
+        ball_model: Modelo YOLO de pelota (opcional)
 
-    if pitch_model or full_field_approx:
-        # Detectar automáticamente el tipo de modelo basado en número de keypoints
-        if pitch_model:
-            try:
-                # Hacer inferencia en un frame vacío para detectar estructura del modelo
-                test_results = pitch_model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
-                if test_results and test_results[0].keypoints is not None:
-                    num_keypoints = test_results[0].keypoints.data.shape[1] if len(test_results[0].keypoints.data.shape) > 1 else 0
-
-                    # Determinar tipo de modelo por número de keypoints
-                    if num_keypoints == 29:
-                        pitch_model_type = 'soccana'
-                        print(f"✅ Modelo Soccana detectado: {num_keypoints} keypoints")
-                    elif num_keypoints == 32:
-                        pitch_model_type = 'roboflow'  # homography.pt tiene 32 kps como roboflow
-                        print(f"✅ Modelo Homography/Roboflow detectado: {num_keypoints} keypoints")
-                    else:
-                        print(f"⚠️ Modelo desconocido con {num_keypoints} keypoints, usando default")
-            except Exception as e:
-                print(f"⚠️ No se pudo detectar tipo de modelo: {e}, usando default")
-
-        # Crear configuración con el tipo correcto
-        pitch_config = SoccerPitchConfiguration(model_type=pitch_model_type)
-
-    # Anotadores
-    team1_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#00FF00"), thickness=2)
-    team1_label_annotator = sv.LabelAnnotator(text_scale=0.5, text_thickness=1, text_color=sv.Color.BLACK, text_padding=3)
-    
-    team2_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#00BFFF"), thickness=2)
-    team2_label_annotator = sv.LabelAnnotator(text_scale=0.5, text_thickness=1, text_color=sv.Color.WHITE, text_padding=3)
-    
-    goalkeeper_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#9B59B6"), thickness=2)
-    goalkeeper_label_annotator = sv.LabelAnnotator(text_scale=0.5, text_thickness=1, text_color=sv.Color.WHITE, text_padding=3)
-    
-    referee_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#FFD700"), thickness=2)
-    referee_label_annotator = sv.LabelAnnotator(text_scale=0.5, text_thickness=1, text_color=sv.Color.BLACK, text_padding=3)
-    
-    ball_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#FF0000"), thickness=3)
-    ball_label_annotator = sv.LabelAnnotator(text_scale=0.6, text_thickness=2, text_color=sv.Color.WHITE, text_padding=4)
-
-    # Variables de estado
-    team1_colors = None
-    team2_colors = None
-    frame_count = 0
-    reference_team1_color = None
-    reference_team2_color = None
-    clustering_initialized = False
-    track_history = {}
-    HISTORY_LEN = 30
+    Returns:
+        (player_class_ids, player_model_ball_class_ids, ball_model_class_ids)
 
-    # Suavizado temporal para posiciones en radar
-    radar_positions_history = {}  # tracker_id -> deque de posiciones (x, y)
-    RADAR_SMOOTH_WINDOW = 5       # Ventana de suavizado (5 frames)
+    Los IDs se cachean por hash de los pesos (ver src/models/model_metadata.py).
+    """
+    player_classes = cached_model_metadata(
+        player_model, 'player_classes', lambda: _scan_player_classes(player_model.names)
+    )
+    ball_model_class_ids = []
+    if ball_model:
+        ball_model_class_ids = cached_model_metadata(
+            ball_model, 'ball_classes', lambda: _scan_ball_classes(ball_model.names)
+        )
+    return player_classes['person'], player_classes['ball'], ball_model_class_ids
 
-    # Inicializar módulos tácticos
-    formation_detector = FormationDetector()
-    metrics_calculator = TacticalMetricsCalculator()
-    team1_tracker = TacticalMetricsTracker(history_size=5000)
-    team2_tracker = TacticalMetricsTracker(history_size=5000)
-    formations_timeline = {'team1': [], 'team2': []}
 
-    # --- IDENTIFICAR CLASES DEL MODELO DE JUGADORES ---
-    player_model_names = player_model.names
+def _scan_player_classes(player_model_names: Dict) -> Dict[str, List[int]]:
+    """IDs de clase de personas y (fallback) de pelota en el modelo de jugadores."""
     player_class_ids = []
     # Fallback ball class IDs from player model (if ball model is missing)
-    player_model_ball_class_ids = [] 
-    
+    player_model_ball_class_ids = []
+
     for id, name in player_model_names.items():
         name_lower = str(name).lower()
         # Clases para personas (jugadores, árbitros, porteros, personas genéricas)
@@ -644,491 +805,1512 @@ def process_video(
         # Clases para pelota en el modelo de jugadores
         if any(x in name_lower for x in ['ball', 'sports ball']):
             player_model_ball_class_ids.append(id)
-    
+
     # Fallbacks por defecto si no se detectan nombres conocidos
     if not player_class_ids:
         # Asumir clase 0 si es un modelo custom desconocido o COCO standard
         player_class_ids = [0]
-    
+
     if not player_model_ball_class_ids:
         # Solo si parece ser COCO (muchas clases), usamos 32
-        if len(player_model_names) > 30: 
+        if len(player_model_names) > 30:
             player_model_ball_class_ids = [32]
-            
-    # --- IDENTIFICAR CLASES DEL MODELO DE PELOTA (si existe) ---
+
+    return {'person': player_class_ids, 'ball': player_model_ball_class_ids}
+
+
+def _scan_ball_classes(ball_model_names: Dict) -> List[int]:
+    """IDs de clase de pelota en el modelo de pelota."""
     ball_model_class_ids = []
-    if ball_model:
-        for id, name in ball_model.names.items():
-            name_lower = str(name).lower()
-            if any(x in name_lower for x in ['ball', 'sports ball']):
-                ball_model_class_ids.append(id)
-        
-        # Fallback si no se encuentra nombre explícito
-        if not ball_model_class_ids:
-            # Si es modelo de 1 sola clase, asumimos que es la pelota
-            if len(ball_model.names) == 1:
-                ball_model_class_ids = [0]
-            # Si parece ser COCO
-            elif len(ball_model.names) > 30:
-                ball_model_class_ids = [32]
+    for id, name in ball_model_names.items():
+        name_lower = str(name).lower()
+        if any(x in name_lower for x in ['ball', 'sports ball']):
+            ball_model_class_ids.append(id)
+
+    # Fallback si no se encuentra nombre explícito
+    if not ball_model_class_ids:
+        # Si es modelo de 1 sola clase, asumimos que es la pelota
+        if len(ball_model_names) == 1:
+            ball_model_class_ids = [0]
+        # Si parece ser COCO
+        elif len(ball_model_names) > 30:
+            ball_model_class_ids = [32]
+
+    return ball_model_class_ids
+
+
+def detect_pitch_model_type(pitch_model) -> str:
+    """
+    Detecta automáticamente el tipo de modelo de campo por su número de keypoints.
 
+    Returns:
+        'soccana' (29 keypoints), 'roboflow' (32 keypoints) o 'default'
+
+    La cantidad de keypoints sale de una inferencia de prueba; el resultado se
+    cachea por hash de los pesos (ver src/models/model_metadata.py).
+    """
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_count += 1
-            annotated_frame = frame.copy()
-
-            # --- DETECCIÓN DE JUGADORES ---
-            player_results = player_model.predict(
-                frame,
-                conf=conf,
-                iou=0.3,
-                imgsz=img_size,
-                max_det=100,
-                verbose=False
+        metadata = cached_model_metadata(pitch_model, 'pitch', lambda: _probe_pitch_model(pitch_model))
+    except Exception as e:
+        print(f"⚠️ No se pudo detectar tipo de modelo: {e}, usando default")
+        return 'default'
+
+    num_keypoints = metadata['num_keypoints']
+    pitch_model_type = metadata['pitch_model_type']
+    if pitch_model_type == 'soccana':
+        print(f"✅ Modelo Soccana detectado: {num_keypoints} keypoints")
+    elif pitch_model_type == 'roboflow':
+        print(f"✅ Modelo Homography/Roboflow detectado: {num_keypoints} keypoints")
+    elif num_keypoints is not None:
+        print(f"⚠️ Modelo desconocido con {num_keypoints} keypoints, usando default")
+    return pitch_model_type
+
+
+def _probe_pitch_model(pitch_model) -> Dict:
+    """Inferencia en un frame vacío para contar los keypoints del modelo de campo."""
+    num_keypoints = None
+    test_results = pitch_model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+    if test_results and test_results[0].keypoints is not None:
+        num_keypoints = test_results[0].keypoints.data.shape[1] if len(test_results[0].keypoints.data.shape) > 1 else 0
+
+    # Determinar tipo de modelo por número de keypoints
+    pitch_model_type = 'default'
+    if num_keypoints == 29:
+        pitch_model_type = 'soccana'
+    elif num_keypoints == 32:
+        pitch_model_type = 'roboflow'  # homography.pt tiene 32 kps como roboflow
+    return {'num_keypoints': num_keypoints, 'pitch_model_type': pitch_model_type}
+
+
+def filter_ball_detections(ball_detections: sv.Detections, frame_width: int, frame_height: int) -> sv.Detections:
+    """
+    Post-procesa candidatos de pelota: filtra por tamaño (pelotas muy grandes o
+    muy pequeñas = falsos positivos) y conserva la detección de mayor confianza.
+    """
+    if len(ball_detections) > 0:
+        areas = (ball_detections.xyxy[:, 2] - ball_detections.xyxy[:, 0]) * \
+                (ball_detections.xyxy[:, 3] - ball_detections.xyxy[:, 1])
+        max_ball_area = (frame_width * 0.05) * (frame_height * 0.05)  # Máximo 5% del frame
+        min_ball_area = (frame_width * 0.005) * (frame_height * 0.005)  # Mínimo 0.5% del frame
+        valid_size = (areas < max_ball_area) & (areas > min_ball_area)
+        ball_detections = ball_detections[valid_size]
+
+        # Si hay múltiples detecciones, tomar la de mayor confianza
+        if len(ball_detections) > 1:
+            best_idx = np.argmax(ball_detections.confidence)
+            ball_detections = ball_detections[best_idx:best_idx+1]
+
+    return ball_detections
+
+
+def get_bottom_center(dets: sv.Detections) -> np.ndarray:
+    """Punto inferior central (pies) de cada bounding box."""
+    return np.column_stack([
+        (dets.xyxy[:, 0] + dets.xyxy[:, 2]) / 2,
+        dets.xyxy[:, 3]
+    ])
+
+
+class FrameContext:
+    """
+    Datos de un frame a medida que atraviesa las etapas del pipeline.
+    """
+
+    def __init__(self, index: int, frame: np.ndarray):
+        """
+        Args:
+            index: Número de frame (empieza en 1)
+            frame: Imagen BGR propia del contexto (se anota in-place en render)
+        """
+        self.index = index
+        self.frame = frame
+        self.capture_time = None  # Instante de captura (perf_counter) en modo stream
+
+        # Etapa de detección
+        self.detected = True  # False = frame intermedio (cajas por predicción de movimiento)
+        self.audit = False  # Frame intermedio en el que igualmente se detecta para medir la deriva
+        self.player_detections = None
+        self.ball_detections = None
+        self.pitch_keypoints = None  # (keypoints_xy, keypoints_conf) o None
+        self.pitch_reused = False  # Keypoints no inferidos (cámara quieta): se reutiliza la homografía
+
+        # Etapa de clasificación / proyección
+        self.tracked_persons = None
+        self.tracked_ball = None
+        self.team1_mask = []
+        self.team2_mask = []
+        self.referee_mask = []
+        self.goalkeeper_mask = []
+        self.radar_points = None  # Dict categoría -> posiciones (m); None = sin radar
+        self.team_metrics = {}  # Equipo -> {'formation', 'metrics'} calculados en este frame
+
+        # Etapa de render
+        self.annotated_frame = None
+
+        # Estado serializado del análisis tras este frame (sólo en frames de checkpoint)
+        self.checkpoint_state = None
+        self.detect_state = None  # Estado de la etapa de detección tras este frame
+
+
+class FrameRenderer:
+    """
+    Dibuja sobre el frame las cajas por categoría, la pelota y el radar.
+
+    No guarda estado entre frames: sólo necesita lo calculado en las etapas
+    previas (FrameContext), por lo que puede usarse fuera de MatchAnalyzer
+    (p.ej. para renderizar resultados ya analizados en otro proceso).
+    """
+
+    def __init__(self, pitch_config: Optional[SoccerPitchConfiguration], width: int, height: int):
+        """
+        Args:
+            pitch_config: Configuración del campo para el radar (None = sin radar)
+            width: Ancho del frame
+            height: Alto del frame
+        """
+        self.pitch_config = pitch_config
+        self.width = width
+        self.height = height
+
+        # Anotadores
+        self.team1_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#00FF00"), thickness=2)
+        self.team1_label_annotator = sv.LabelAnnotator(text_scale=0.5, text_thickness=1, text_color=sv.Color.BLACK, text_padding=3)
+
+        self.team2_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#00BFFF"), thickness=2)
+        self.team2_label_annotator = sv.LabelAnnotator(text_scale=0.5, text_thickness=1, text_color=sv.Color.WHITE, text_padding=3)
+
+        self.goalkeeper_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#9B59B6"), thickness=2)
+        self.goalkeeper_label_annotator = sv.LabelAnnotator(text_scale=0.5, text_thickness=1, text_color=sv.Color.WHITE, text_padding=3)
+
+        self.referee_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#FFD700"), thickness=2)
+        self.referee_label_annotator = sv.LabelAnnotator(text_scale=0.5, text_thickness=1, text_color=sv.Color.BLACK, text_padding=3)
+
+        self.ball_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#FF0000"), thickness=3)
+        self.ball_label_annotator = sv.LabelAnnotator(text_scale=0.6, text_thickness=2, text_color=sv.Color.WHITE, text_padding=4)
+
+    def render_frames(self, contexts: List[FrameContext]) -> List[FrameContext]:
+        """Etapa de render: dibuja anotaciones y radar sobre cada frame."""
+        for ctx in contexts:
+            self._render(ctx)
+        return contexts
+
+    def _render(self, ctx: FrameContext):
+        # El frame del contexto ya es una copia propia: se anota in-place
+        annotated_frame = ctx.frame
+        tracked_persons = ctx.tracked_persons
+        width, height = self.width, self.height
+
+        # Anotar
+        if any(ctx.team1_mask):
+            t1_dets = tracked_persons[np.array(ctx.team1_mask)]
+            annotated_frame = self.team1_annotator.annotate(scene=annotated_frame, detections=t1_dets)
+            if t1_dets.tracker_id is not None:
+                labels = [f"Team 1 #{tid}" for tid in t1_dets.tracker_id]
+                annotated_frame = self.team1_label_annotator.annotate(scene=annotated_frame, detections=t1_dets, labels=labels)
+
+        if any(ctx.team2_mask):
+            t2_dets = tracked_persons[np.array(ctx.team2_mask)]
+            annotated_frame = self.team2_annotator.annotate(scene=annotated_frame, detections=t2_dets)
+            if t2_dets.tracker_id is not None:
+                labels = [f"Team 2 #{tid}" for tid in t2_dets.tracker_id]
+                annotated_frame = self.team2_label_annotator.annotate(scene=annotated_frame, detections=t2_dets, labels=labels)
+
+        if any(ctx.goalkeeper_mask):
+            gk_dets = tracked_persons[np.array(ctx.goalkeeper_mask)]
+            annotated_frame = self.goalkeeper_annotator.annotate(scene=annotated_frame, detections=gk_dets)
+            if gk_dets.tracker_id is not None:
+                labels = [f"GK #{tid}" for tid in gk_dets.tracker_id]
+                annotated_frame = self.goalkeeper_label_annotator.annotate(scene=annotated_frame, detections=gk_dets, labels=labels)
+
+        if any(ctx.referee_mask):
+            ref_dets = tracked_persons[np.array(ctx.referee_mask)]
+            annotated_frame = self.referee_annotator.annotate(scene=annotated_frame, detections=ref_dets)
+            if ref_dets.tracker_id is not None:
+                labels = [f"Referee #{tid}" for tid in ref_dets.tracker_id]
+                annotated_frame = self.referee_label_annotator.annotate(scene=annotated_frame, detections=ref_dets, labels=labels)
+
+        # --- PELOTA ---
+        if ctx.tracked_ball is not None:
+            annotated_frame = self.ball_annotator.annotate(scene=annotated_frame, detections=ctx.tracked_ball)
+            ball_labels = ["BALL"] * len(ctx.tracked_ball)
+            annotated_frame = self.ball_label_annotator.annotate(scene=annotated_frame, detections=ctx.tracked_ball, labels=ball_labels)
+
+        # --- RADAR ---
+        if ctx.radar_points is not None:
+            try:
+                radar_view = draw_radar_view(self.pitch_config, ctx.radar_points, scale=8)
+
+                # Mantener horizontal (sin rotación)
+                # Tamaño: 22% del ancho (reducido para no molestar)
+                scale_factor = 0.22
+                new_w = int(width * scale_factor)
+                aspect_ratio = radar_view.shape[0] / radar_view.shape[1]
+                new_h = int(new_w * aspect_ratio)
+
+                radar_resized = cv2.resize(radar_view, (new_w, new_h))
+
+                # Posición: esquina inferior derecha
+                margin_bottom = 20
+                margin_right = 20
+                offset_x = width - new_w - margin_right  # Esquina derecha con margen
+                offset_y = height - new_h - margin_bottom  # Abajo con margen
+
+                # Verificar que cabe en el frame
+                if offset_y >= 0 and offset_x >= 0:
+                    # Aplicar transparencia (alpha blending)
+                    alpha = 0.65  # 65% radar, 35% video
+                    roi = annotated_frame[offset_y:offset_y+new_h, offset_x:offset_x+new_w]
+                    blended = cv2.addWeighted(roi, 1-alpha, radar_resized, alpha, 0)
+                    annotated_frame[offset_y:offset_y+new_h, offset_x:offset_x+new_w] = blended
+            except Exception as e:
+                print(f"Error dibujando radar: {e}")
+
+        ctx.annotated_frame = annotated_frame
+
+
+class MatchAnalyzer:
+    """
+    Estado y etapas del análisis de un partido.
+
+    Reúne el estado que se acumula entre frames (trackers, colores de
+    referencia de los equipos, historiales de votos y posiciones, módulos
+    tácticos) y expone una función por etapa del pipeline:
+
+    - detect_frames: inferencia de jugadores, pelota y keypoints del campo
+    - classify_frames: tracking, equipos, homografía, proyección y métricas
+    - render_frames: anotaciones y radar sobre el frame
+
+    Cada etapa se ejecuta en un único hilo y procesa los frames en orden, así
+    que el estado de una etapa nunca se comparte con otra.
+    """
+
+    HISTORY_LEN = 30
+    RADAR_SMOOTH_WINDOW = 5  # Ventana de suavizado (5 frames)
+    # Frames entre actualizaciones del modelo de colores (OnlineTeamColorModel; las
+    # etiquetas difieren levemente del antiguo reajuste con KMeans cada 45 frames)
+    TEAM_COLOR_UPDATE_EVERY = 5
+
+    # Estado acumulado entre frames que se guarda en los checkpoints
+    CHECKPOINT_ATTRS = (
+        'person_tracker', 'ball_tracker', 'person_predictor', 'ball_predictor',
+        'drift_monitor', 'frames_detected', 'frames_predicted', 'last_transformer',
+        'last_color_update_frame', 'team1_colors', 'team2_colors', 'frame_count',
+        'team_color_model',
+        'track_votes', 'radar_positions_history', 'team1_tracker', 'team2_tracker',
+        'formations_timeline', 'team_cache',
+    )
+    # Estado de la etapa de detección: se toma en esa etapa (va por delante de la
+    # clasificación) al terminar el lote que cierra en el frame de checkpoint
+    DETECT_CHECKPOINT_ATTRS = ('ball_search', 'pitch_gate', 'resolution_scheduler')
+
+    def __init__(
+        self,
+        player_model,
+        ball_model,
+        pitch_model,
+        conf: float,
+        detection_mode: str,
+        img_size: int,
+        full_field_approx: bool,
+        width: int,
+        height: int,
+        detect_every: int = 1,
+        drift_audit_every: int = 10,
+        reference_colors: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        ball_search: str = "full",
+        ball_search_misses: int = 3,
+        ball_tile_size: int = 640,
+        ball_tile_overlap: float = 0.2,
+        pitch_motion_threshold: float = 0.0,
+        pitch_max_interval: int = 30,
+        target_fps: float = 0.0,
+        img_size_bounds: Tuple[int, int] = (320, 960),
+        team_reverify_every: int = 0
+    ):
+        """
+        Args:
+            reference_colors: Colores de camiseta (team1, team2) de referencia. Si se
+                indican, el modelo de colores parte de ellos en lugar de fijar
+                team1/team2 arbitrariamente (etiquetas consistentes entre tramos).
+            ball_search: 'full', 'roi' o 'tiled' (ver BALL_SEARCH_MODES y process_video)
+            ball_search_misses: Con 'roi', búsquedas sin pelota antes de volver al frame completo
+            ball_tile_size: Con 'tiled', lado de cada mosaico en píxeles
+            ball_tile_overlap: Con 'tiled', fracción de solapamiento entre mosaicos
+            pitch_motion_threshold: Movimiento de cámara acumulado (fracción del ancho) a partir
+                del cual se vuelven a inferir los keypoints del campo (0 = inferir siempre)
+            pitch_max_interval: Frames máximos entre dos inferencias de keypoints
+            target_fps: Si > 0, ajusta la resolución de cada modelo para que la detección
+                sostenga estos frames por segundo (ver AdaptiveResolutionScheduler)
+            img_size_bounds: Resolución mínima y máxima del ajuste adaptativo
+            team_reverify_every: Frames entre dos clasificaciones por color de un track estable;
+                en el resto se reutiliza su etiqueta. 0 (por defecto) = clasificar todos en cada
+                frame. Activarlo (p. ej. 15) es más rápido pero cambia ~1% de las etiquetas y el
+                suavizado (los tracks reutilizados no votan: los 30 votos abarcan más frames)
+        """
+        if ball_search not in BALL_SEARCH_MODES:
+            raise ValueError(f"Búsqueda de pelota desconocida: {ball_search} (opciones: {', '.join(BALL_SEARCH_MODES)})")
+        self.player_model = player_model
+        self.ball_model = ball_model
+        self.pitch_model = pitch_model
+        self.conf = conf
+        self.detection_mode = detection_mode
+        self.img_size = img_size
+        self.full_field_approx = full_field_approx
+        self.width = width
+        self.height = height
+
+        # Detección por saltos: los detectores corren 1 de cada `detect_every`
+        # frames y en los intermedios las cajas salen de predicción de movimiento
+        self.detect_every = max(1, int(detect_every))
+
+        # Trackers (sólo ven los frames detectados: el buffer de tracks perdidos
+        # se escala para seguir cubriendo ~30 frames de video)
+        if self.detect_every > 1:
+            lost_track_buffer = max(1, 30 // self.detect_every)
+            self.person_tracker = sv.ByteTrack(lost_track_buffer=lost_track_buffer)
+            self.ball_tracker = sv.ByteTrack(lost_track_buffer=lost_track_buffer)
+        else:
+            self.person_tracker = sv.ByteTrack()
+            self.ball_tracker = sv.ByteTrack()
+
+        self.drift_audit_every = max(0, int(drift_audit_every))
+        self.person_predictor = TrackMotionPredictor()
+        self.ball_predictor = TrackMotionPredictor(max_gap=self.detect_every * 2)
+        self.drift_monitor = StrideDriftMonitor()
+        self.frames_detected = 0
+
+        # Búsqueda de la pelota en un recorte alrededor de su posición predicha
+        # (estado de la etapa de detección: se guarda en los checkpoints con
+        # DETECT_CHECKPOINT_ATTRS, así que al reanudar se sigue buscando en el recorte)
+        self.ball_search = None
+        if ball_search == "roi" and ball_model is not None:
+            self.ball_search = BallSearchWindow(width, height, max_misses=ball_search_misses)
+        # Pelota por mosaicos solapados (reemplaza la búsqueda en el frame completo)
+        self.ball_tiler = None
+        if ball_search == "tiled" and ball_model is not None:
+            self.ball_tiler = TiledInference(ball_model, tile_size=ball_tile_size, overlap=ball_tile_overlap)
+            print(f"🧩 Pelota por mosaicos: {len(self.ball_tiler.tiles(width, height))} mosaicos de "
+                  f"{ball_tile_size}px por frame (solapamiento {ball_tile_overlap:.0%})")
+        self.frames_predicted = 0
+        self.last_transformer = None
+        self.last_color_update_frame = None
+
+        # Inferencia de keypoints sólo cuando la cámara se movió (estado de la
+        # etapa de detección, ver DETECT_CHECKPOINT_ATTRS)
+        self.pitch_gate = None
+        if pitch_model is not None and pitch_motion_threshold > 0:
+            self.pitch_gate = CameraMotionGate(pitch_motion_threshold, max_interval=pitch_max_interval)
+
+        # Resolución adaptativa por modelo para sostener target_fps (estado de la
+        # etapa de detección). La pelota sólo se ajusta si se busca en el frame completo
+        self.resolution_scheduler = None
+        if target_fps > 0:
+            base_sizes = {'player': img_size}
+            if ball_model is not None and self.ball_search is None and self.ball_tiler is None:
+                base_sizes['ball'] = img_size
+            if pitch_model is not None:
+                base_sizes['pitch'] = 640
+            self.resolution_scheduler = AdaptiveResolutionScheduler(
+                target_fps, base_sizes, size_bounds=img_size_bounds
             )
-            player_detections = sv.Detections.from_ultralytics(player_results[0])
-            
-            # Filtrar clases dinámicamente usando los IDs identificados
-            if player_detections.class_id is not None:
-                mask = np.isin(player_detections.class_id, player_class_ids)
-                player_detections = player_detections[mask]
-            
-            # --- DETECCIÓN DE PELOTA MEJORADA ---
-            ball_detections = sv.Detections.empty()
-            if detection_mode in ["ball_only", "players_and_ball"]:
-                if ball_model:
-                    # Usar modelo específico de pelota con parámetros optimizados
-                    ball_results = ball_model.predict(
-                        frame,
-                        conf=max(0.1, conf * 0.3),  # Umbral aún más bajo (10% mínimo)
-                        iou=0.4,                     # IoU más permisivo para pelota
-                        imgsz=img_size,
-                        verbose=False
-                    )
-                    ball_detections = sv.Detections.from_ultralytics(ball_results[0])
-                    
-                    # Filtrar clases válidas del modelo de pelota
-                    if ball_detections.class_id is not None and ball_model_class_ids:
-                         mask = np.isin(ball_detections.class_id, ball_model_class_ids)
-                         ball_detections = ball_detections[mask]
-
-                    # Post-procesamiento: Filtrar por tamaño (pelotas muy grandes = falsos positivos)
-                    if len(ball_detections) > 0:
-                        areas = (ball_detections.xyxy[:, 2] - ball_detections.xyxy[:, 0]) * \
-                                (ball_detections.xyxy[:, 3] - ball_detections.xyxy[:, 1])
-                        max_ball_area = (width * 0.05) * (height * 0.05)  # Máximo 5% del frame
-                        min_ball_area = (width * 0.005) * (height * 0.005)  # Mínimo 0.5% del frame
-                        valid_size = (areas < max_ball_area) & (areas > min_ball_area)
-                        ball_detections = ball_detections[valid_size]
-
-                        # Si hay múltiples detecciones, tomar la de mayor confianza
-                        if len(ball_detections) > 1:
-                            best_idx = np.argmax(ball_detections.confidence)
-                            ball_detections = ball_detections[best_idx:best_idx+1]
-                else:
-                    # Fallback: Usar modelo de jugadores si tiene clase de pelota
-                    raw_detections = sv.Detections.from_ultralytics(player_results[0])
-                    if raw_detections.class_id is not None and player_model_ball_class_ids:
-                         mask = np.isin(raw_detections.class_id, player_model_ball_class_ids)
-                         ball_detections = raw_detections[mask]
-                         if len(ball_detections) > 0:
-                             ball_conf_threshold = max(0.1, conf * 0.3)
-                             ball_detections = ball_detections[ball_detections.confidence >= ball_conf_threshold]
-
-                             # Mismo post-procesamiento
-                             areas = (ball_detections.xyxy[:, 2] - ball_detections.xyxy[:, 0]) * \
-                                     (ball_detections.xyxy[:, 3] - ball_detections.xyxy[:, 1])
-                             max_ball_area = (width * 0.05) * (height * 0.05)
-                             min_ball_area = (width * 0.005) * (height * 0.005)
-                             valid_size = (areas < max_ball_area) & (areas > min_ball_area)
-                             ball_detections = ball_detections[valid_size]
-
-                             if len(ball_detections) > 1:
-                                 best_idx = np.argmax(ball_detections.confidence)
-                                 ball_detections = ball_detections[best_idx:best_idx+1]
-
-            # --- TRACKING DE JUGADORES ---
-            tracked_persons = person_tracker.update_with_detections(player_detections)
-            
-            # Actualizar modelos de color (Clustering)
-            if (frame_count % 45 == 1 or team1_colors is None) and len(player_detections) > 0:
-                team1_colors_new, team2_colors_new, _, _, _ = cluster_teams(
-                    frame, player_detections, width, height
-                )
 
-                if not clustering_initialized:
-                    reference_team1_color = team1_colors_new['shirt'].copy()
-                    reference_team2_color = team2_colors_new['shirt'].copy()
-                    team1_colors = team1_colors_new
-                    team2_colors = team2_colors_new
-                    clustering_initialized = True
-                else:
-                    # Verificar intercambio
-                    dist_t1_ref1 = np.linalg.norm(team1_colors_new['shirt'] - reference_team1_color)
-                    dist_t1_ref2 = np.linalg.norm(team1_colors_new['shirt'] - reference_team2_color)
-                    dist_t2_ref1 = np.linalg.norm(team2_colors_new['shirt'] - reference_team1_color)
-                    dist_t2_ref2 = np.linalg.norm(team2_colors_new['shirt'] - reference_team2_color)
-
-                    score_keep = dist_t1_ref1 + dist_t2_ref2
-                    score_swap = dist_t1_ref2 + dist_t2_ref1
-
-                    if score_swap < score_keep:
-                        team1_colors = team2_colors_new
-                        team2_colors = team1_colors_new
-                    else:
-                        team1_colors = team1_colors_new
-                        team2_colors = team2_colors_new
-                    
-                    alpha = 0.1
-                    reference_team1_color = (1 - alpha) * reference_team1_color + alpha * team1_colors['shirt']
-                    reference_team2_color = (1 - alpha) * reference_team2_color + alpha * team2_colors['shirt']
-
-            # Clasificar cada persona rastreada
-            team1_mask = []
-            team2_mask = []
-            referee_mask = []
-            goalkeeper_mask = []
-            
-            if len(tracked_persons) > 0 and team1_colors is not None:
-                for i, (xyxy, _, _, _, tracker_id, _) in enumerate(tracked_persons):
-                    if not is_in_playing_field(xyxy, width, height):
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(False)
-                        team2_mask.append(False)
-                        referee_mask.append(False)
-                        continue
-
-                    in_goal = is_in_goal_area(xyxy, width, height)
-                    x_center = (xyxy[0] + xyxy[2]) / 2
-                    
-                    if in_goal and (x_center < width * 0.05 or x_center > width * 0.95):
-                        current_vote = 'goalkeeper'
-                    else:
-                        person_type, _ = classify_person_smart(
-                            frame, xyxy, team1_colors, team2_colors, width, height
-                        )
-                        current_vote = person_type
-
-                    if tracker_id not in track_history:
-                        track_history[tracker_id] = deque(maxlen=HISTORY_LEN)
-                    
-                    track_history[tracker_id].append(current_vote)
-                    vote_counts = Counter(track_history[tracker_id])
-                    most_common = vote_counts.most_common(1)[0][0]
-                    
-                    if current_vote == 'goalkeeper':
-                        final_class = 'goalkeeper'
+        # Configurar modelo de pitch si se proporciona O si se usa aproximación
+        self.pitch_config = None
+        self.pitch_model_type = 'default'  # Default fallback
+
+        if pitch_model or full_field_approx:
+            # Detectar automáticamente el tipo de modelo basado en número de keypoints
+            if pitch_model:
+                self.pitch_model_type = detect_pitch_model_type(pitch_model)
+
+            # Crear configuración con el tipo correcto
+            self.pitch_config = SoccerPitchConfiguration(model_type=self.pitch_model_type)
+
+        self.renderer = FrameRenderer(self.pitch_config, width, height)
+
+        # Variables de estado
+        self.team1_colors = None
+        self.team2_colors = None
+        self.frame_count = 0
+        # Colores de los equipos actualizados en línea (el equipo 1 nunca cambia de centroide)
+        self.team_color_model = OnlineTeamColorModel()
+        if reference_colors is not None:
+            self.team_color_model.seed(reference_colors)
+        # Últimos HISTORY_LEN votos de categoría de cada track (se muestra la mayoría)
+        self.track_votes = TrackVoteStore(len(PERSON_CLASSES), self.HISTORY_LEN)
+        # Tracks estables: se reutiliza la etiqueta y sólo se reclasifican cada tanto
+        self.team_cache = TrackClassificationCache(team_reverify_every) if team_reverify_every > 0 else None
+
+        # Suavizado temporal para posiciones en radar
+        self.radar_positions_history = {}  # tracker_id -> deque de posiciones (x, y)
+
+        # Inicializar módulos tácticos
+        self.formation_detector = FormationDetector()
+        self.metrics_calculator = TacticalMetricsCalculator()
+        self.team1_tracker = TacticalMetricsTracker(history_size=5000)
+        self.team2_tracker = TacticalMetricsTracker(history_size=5000)
+        self.formations_timeline = {'team1': [], 'team2': []}
+
+        (
+            self.player_class_ids,
+            self.player_model_ball_class_ids,
+            self.ball_model_class_ids
+        ) = identify_model_classes(player_model, ball_model)
+
+    # ------------------------------------------------------------------ #
+    # Etapa: detección
+    # ------------------------------------------------------------------ #
+    def detect_frames(self, contexts: List[FrameContext], schedule: bool = True) -> List[FrameContext]:
+        """
+        Etapa de detección: corre los modelos sobre el lote de frames.
+
+        Cada modelo recibe todos los frames del lote en una sola llamada
+        (micro-batching); los resultados se asignan a cada frame en orden.
+        Con `detect_every` > 1 sólo se infieren los frames de detección (y, sólo
+        con el modelo de jugadores, los de auditoría de deriva); el resto pasa sin
+        detecciones.
+
+        Args:
+            contexts: Frames del lote
+            schedule: Si False, se respetan `ctx.detected` / `ctx.audit` ya decididos
+                por quien llama (p.ej. el control de latencia del modo stream)
+        """
+        if schedule:
+            for ctx in contexts:
+                self._schedule(ctx)
+
+        all_contexts = contexts
+        contexts = [ctx for ctx in all_contexts if ctx.detected or ctx.audit]
+        if not contexts:
+            return all_contexts
+        frames = [ctx.frame for ctx in contexts]
+        # La auditoría sólo mide la deriva de los jugadores: pelota y keypoints se
+        # infieren únicamente en los frames de detección
+        detected_idx = [i for i, ctx in enumerate(contexts) if ctx.detected]
+        timings = {}
+
+        # --- DETECCIÓN DE JUGADORES ---
+        t0 = time.perf_counter()
+        player_results = self.player_model.predict(
+            frames,
+            conf=self.conf,
+            iou=0.3,
+            imgsz=self._model_size('player'),
+            max_det=100,
+            verbose=False
+        )
+        timings['player'] = time.perf_counter() - t0
+
+        # --- DETECCIÓN DE PELOTA (modelo específico) ---
+        ball_windows = [None] * len(contexts)
+        ball_raw = [None] * len(contexts)
+        if self.detection_mode in ["ball_only", "players_and_ball"] and self.ball_model and detected_idx:
+            t0 = time.perf_counter()
+            if self.ball_search is not None:
+                for i in detected_idx:
+                    ball_windows[i] = self.ball_search.window(contexts[i].index)
+            results = self._detect_ball(
+                [frames[i] for i in detected_idx], [ball_windows[i] for i in detected_idx]
+            )
+            for i, result in zip(detected_idx, results):
+                ball_raw[i] = result
+            timings['ball'] = time.perf_counter() - t0
+
+        # --- KEYPOINTS DEL CAMPO ---
+        pitch_results = [None] * len(contexts)
+        if self.pitch_config and self.pitch_model:
+            pitch_idx = detected_idx
+            if self.pitch_gate is not None:
+                # Cámara quieta: se omite la inferencia y se reutiliza la homografía
+                pitch_idx = []
+                for i in detected_idx:
+                    if self.pitch_gate.should_infer(contexts[i].frame, contexts[i].index):
+                        pitch_idx.append(i)
                     else:
-                        final_class = most_common
-
-                    if final_class == 'goalkeeper':
-                        goalkeeper_mask.append(True)
-                        team1_mask.append(False)
-                        team2_mask.append(False)
-                        referee_mask.append(False)
-                    elif final_class == 'referee':
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(False)
-                        team2_mask.append(False)
-                        referee_mask.append(True)
-                    elif final_class == 'team1':
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(True)
-                        team2_mask.append(False)
-                        referee_mask.append(False)
-                    elif final_class == 'team2':
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(False)
-                        team2_mask.append(True)
-                        referee_mask.append(False)
+                        contexts[i].pitch_reused = True
+            t0 = time.perf_counter()
+            try:
+                if pitch_idx:
+                    # Usar un umbral bajo para la inferencia inicial (conf=0.01)
+                    # para no perder keypoints que podrían ser válidos para Soccana (que usa 0.05)
+                    pitch_kwargs = {'verbose': False, 'conf': 0.01}
+                    if self.resolution_scheduler is not None:
+                        pitch_kwargs['imgsz'] = self._model_size('pitch')
+                    results = self.pitch_model([frames[i] for i in pitch_idx], **pitch_kwargs)
+                    for i, result in zip(pitch_idx, results):
+                        pitch_results[i] = result
+            except Exception as e:
+                for ctx in contexts:
+                    if ctx.index % 100 == 0:
+                        print(f"Error en inferencia de pitch (frame {ctx.index}): {e}")
+            timings['pitch'] = time.perf_counter() - t0
+
+        for ctx, player_result, ball_result, pitch_result in zip(
+            contexts, player_results, ball_raw, pitch_results
+        ):
+            self._postprocess_detections(ctx, player_result, ball_result, pitch_result)
+
+        if self.ball_search is not None and self.detection_mode in ["ball_only", "players_and_ball"]:
+            for i in detected_idx:
+                self.ball_search.update(
+                    contexts[i].index, contexts[i].ball_detections, searched_roi=ball_windows[i] is not None
+                )
+
+        if self.resolution_scheduler is not None:
+            for ctx in contexts:
+                if ctx.detected:
+                    self.resolution_scheduler.observe_ball(len(ctx.ball_detections) > 0)
+            self.resolution_scheduler.observe(
+                all_contexts[0].index, all_contexts[-1].index, len(all_contexts), timings
+            )
+        return all_contexts
+
+    def _model_size(self, model_key: str) -> int:
+        """Resolución de inferencia de un modelo ('player', 'ball' o 'pitch')."""
+        if self.resolution_scheduler is not None and model_key in self.resolution_scheduler.sizes:
+            return self.resolution_scheduler.size(model_key)
+        return self.img_size
+
+    def _detect_ball(self, frames: List[np.ndarray], windows: List) -> List[sv.Detections]:
+        """
+        Corre el modelo de pelota: sobre el frame completo (a img_size, o por
+        mosaicos con 'tiled') donde `windows` es None y sobre el recorte
+        indicado (a resolución nativa) en el resto. Devuelve detecciones en
+        coordenadas del frame completo.
+        """
+        predict_kwargs = dict(
+            conf=max(0.1, self.conf * 0.3),  # Umbral aún más bajo (10% mínimo)
+            iou=0.4,                          # IoU más permisivo para pelota
+            verbose=False
+        )
+        detections = [None] * len(frames)
+
+        full_idx = [i for i, window in enumerate(windows) if window is None]
+        if full_idx and self.ball_tiler is not None:
+            tiled = self.ball_tiler.predict([frames[i] for i in full_idx], **predict_kwargs)
+            for i, frame_detections in zip(full_idx, tiled):
+                detections[i] = frame_detections
+        elif full_idx:
+            results = self.ball_model.predict(
+                [frames[i] for i in full_idx], imgsz=self._model_size('ball'), **predict_kwargs
+            )
+            for i, result in zip(full_idx, results):
+                detections[i] = sv.Detections.from_ultralytics(result)
+
+        roi_idx = [i for i, window in enumerate(windows) if window is not None]
+        if roi_idx:
+            crops = []
+            for i in roi_idx:
+                x1, y1, x2, y2 = windows[i]
+                crops.append(np.ascontiguousarray(frames[i][y1:y2, x1:x2]))
+            results = self.ball_model.predict(crops, imgsz=self.ball_search.roi_size, **predict_kwargs)
+            for i, result in zip(roi_idx, results):
+                roi_detections = sv.Detections.from_ultralytics(result)
+                x1, y1 = windows[i][:2]
+                roi_detections.xyxy = roi_detections.xyxy + np.array([x1, y1, x1, y1], dtype=roi_detections.xyxy.dtype)
+                detections[i] = roi_detections
+
+        return detections
+
+    def _schedule(self, ctx: FrameContext):
+        """Decide si el frame se detecta, se predice o se predice y audita."""
+        position = (ctx.index - 1) % self.detect_every
+        ctx.detected = position == 0
+        # Se audita el último frame predicho del intervalo (peor caso de deriva)
+        gap_index = (ctx.index - 1) // self.detect_every
+        ctx.audit = (
+            not ctx.detected
+            and self.drift_audit_every > 0
+            and position == self.detect_every - 1
+            and gap_index % self.drift_audit_every == 0
+        )
+
+    def _postprocess_detections(self, ctx: FrameContext, player_result, ball_result, pitch_result):
+        """
+        Convierte los resultados crudos de un frame en detecciones filtradas
+        (`ball_result` ya viene como sv.Detections en coordenadas del frame).
+        """
+        width, height = self.width, self.height
+
+        player_detections = sv.Detections.from_ultralytics(player_result)
+
+        # Filtrar clases dinámicamente usando los IDs identificados
+        if player_detections.class_id is not None:
+            mask = np.isin(player_detections.class_id, self.player_class_ids)
+            player_detections = player_detections[mask]
+
+        # --- DETECCIÓN DE PELOTA MEJORADA ---
+        ball_detections = sv.Detections.empty()
+        if self.detection_mode in ["ball_only", "players_and_ball"]:
+            if self.ball_model:
+                if ball_result is not None:  # None = frame de auditoría
+                    ball_detections = ball_result
+
+                # Filtrar clases válidas del modelo de pelota
+                if ball_detections.class_id is not None and self.ball_model_class_ids:
+                    mask = np.isin(ball_detections.class_id, self.ball_model_class_ids)
+                    ball_detections = ball_detections[mask]
+
+                ball_detections = filter_ball_detections(ball_detections, width, height)
+            else:
+                # Fallback: Usar modelo de jugadores si tiene clase de pelota
+                raw_detections = sv.Detections.from_ultralytics(player_result)
+                if raw_detections.class_id is not None and self.player_model_ball_class_ids:
+                    mask = np.isin(raw_detections.class_id, self.player_model_ball_class_ids)
+                    ball_detections = raw_detections[mask]
+                    if len(ball_detections) > 0:
+                        ball_conf_threshold = max(0.1, self.conf * 0.3)
+                        ball_detections = ball_detections[ball_detections.confidence >= ball_conf_threshold]
+
+                        # Mismo post-procesamiento
+                        ball_detections = filter_ball_detections(ball_detections, width, height)
+
+        ctx.player_detections = player_detections
+        ctx.ball_detections = ball_detections
+
+        if pitch_result is not None:
+            try:
+                if pitch_result.keypoints is not None and len(pitch_result.keypoints) > 0:
+                    keypoints_xy = pitch_result.keypoints.xy.cpu().numpy()[0]
+                    keypoints_conf = pitch_result.keypoints.conf.cpu().numpy()[0]
+                    ctx.pitch_keypoints = (keypoints_xy, keypoints_conf)
+            except Exception as e:
+                if ctx.index % 100 == 0:
+                    print(f"Error en inferencia de pitch (frame {ctx.index}): {e}")
+
+    # ------------------------------------------------------------------ #
+    # Etapa: tracking, clasificación de equipos y proyección
+    # ------------------------------------------------------------------ #
+    def classify_frames(self, contexts: List[FrameContext]) -> List[FrameContext]:
+        """Etapa de clasificación/proyección: actualiza el estado del partido."""
+        for ctx in contexts:
+            self._classify(ctx)
+        return contexts
+
+    def _classify(self, ctx: FrameContext):
+        frame = ctx.frame
+        width, height = self.width, self.height
+        self.frame_count = ctx.index
+        player_detections = ctx.player_detections
+
+        # --- TRACKING DE JUGADORES ---
+        if ctx.detected:
+            self.frames_detected += 1
+            tracked_persons = self.person_tracker.update_with_detections(player_detections)
+            self.person_predictor.update(tracked_persons, ctx.index)
+        else:
+            # Frame intermedio: cajas extrapoladas desde la última detección
+            self.frames_predicted += 1
+            tracked_persons = self.person_predictor.predict(ctx.index, width, height)
+            if ctx.audit:
+                self.drift_monitor.update(tracked_persons, player_detections)
+
+        # Actualizar el modelo de colores de los equipos (incremental, cada pocos frames)
+        needs_color_update = (
+            not self.team_color_model.initialized
+            or self.last_color_update_frame is None
+            or self.frame_count - self.last_color_update_frame >= self.TEAM_COLOR_UPDATE_EVERY
+        )
+        if ctx.detected and needs_color_update and len(player_detections) > 0:
+            self.last_color_update_frame = self.frame_count
+            shirt_colors, pants_colors = team_player_colors(frame, player_detections, width, height)
+            if self.team_color_model.update(shirt_colors, pants_colors):
+                self.team1_colors, self.team2_colors = self.team_color_model.team_colors()
+
+        # Clasificar cada persona rastreada
+        num_persons = len(tracked_persons)
+        team1_mask = np.zeros(num_persons, dtype=bool)
+        team2_mask = np.zeros(num_persons, dtype=bool)
+        referee_mask = np.zeros(num_persons, dtype=bool)
+        goalkeeper_mask = np.zeros(num_persons, dtype=bool)
+
+        if num_persons > 0 and self.team1_colors is not None:
+            boxes = tracked_persons.xyxy
+            in_field = playing_field_mask(boxes, width, height)
+            in_goal = in_field & goal_area_mask(boxes, width, height)
+
+            # Voto del frame (código de PERSON_CLASSES, -1 = no vota): portero por
+            # posición; el resto por color (sólo frames detectados)
+            tracker_ids = tracked_persons.tracker_id
+            votes = np.where(in_goal, GOALKEEPER_CLASS, -1)
+            if ctx.detected:
+                candidates = np.flatnonzero(in_field & ~in_goal)
+                classify_idx = [
+                    i for i in candidates
+                    if self.team_cache is None or self.team_cache.needs_classification(
+                        tracker_ids[i], boxes[i], ctx.index, self.track_votes
+                    )
+                ]
+                if self.team_cache is not None:
+                    # Tracks estables: se reutiliza la etiqueta de su historial
+                    self.team_cache.mark_reused(len(candidates) - len(classify_idx))
+                if classify_idx:
+                    # Colores y clasificación en una sola pasada para todos los tracks a (re)clasificar
+                    features = extract_color_features_batch(frame, boxes[classify_idx])
+                    class_masks = classify_persons_batch(
+                        boxes[classify_idx], features, self.team1_colors, self.team2_colors, width, height
+                    )
+                    votes[classify_idx] = np.argmax(np.stack(class_masks, axis=1), axis=1)
+                    if self.team_cache is not None:
+                        for i in classify_idx:
+                            self.team_cache.mark_classified(tracker_ids[i], boxes[i], ctx.index)
+
+            voted = np.flatnonzero(votes >= 0)
+            self.track_votes.add(tracker_ids[voted], votes[voted], ctx.index)
+
+            # Categoría final: el portero por posición manda; si no, la mayoría del track
+            final_classes = np.where(in_goal, GOALKEEPER_CLASS, self.track_votes.majority(tracker_ids))
+            final_classes[~in_field] = -1
+            team1_mask, team2_mask, referee_mask, goalkeeper_mask = (
+                final_classes == code for code in range(len(PERSON_CLASSES))
+            )
+
+        if ctx.index % 300 == 0:
+            self.track_votes.prune(ctx.index)
+            if self.team_cache is not None:
+                self.team_cache.prune(ctx.index)
+
+        ctx.tracked_persons = tracked_persons
+        ctx.team1_mask = team1_mask
+        ctx.team2_mask = team2_mask
+        ctx.referee_mask = referee_mask
+        ctx.goalkeeper_mask = goalkeeper_mask
+
+        # --- TRACKING DE PELOTA ---
+        if ctx.detected:
+            if len(ctx.ball_detections) > 0:
+                ctx.tracked_ball = self.ball_tracker.update_with_detections(ctx.ball_detections)
+            self.ball_predictor.update(ctx.tracked_ball, ctx.index)
+        else:
+            predicted_ball = self.ball_predictor.predict(ctx.index, width, height)
+            if len(predicted_ball) > 0:
+                ctx.tracked_ball = predicted_ball
+
+        # --- PROYECCIÓN AL RADAR Y MÉTRICAS ---
+        if self.pitch_config:  # Si hay configuración de pitch (ya sea por modelo o approx)
+            if (ctx.detected and not ctx.pitch_reused) or self.last_transformer is None:
+                transformer = self._build_transformer(ctx)
+                self.last_transformer = transformer
+            else:
+                # Frame intermedio o cámara quieta: se reutiliza la última homografía
+                transformer = self.last_transformer
+
+            # Si tenemos un transformer válido, proyectamos y actualizamos métricas
+            if transformer:
+                try:
+                    ctx.radar_points = self._project_positions(ctx, transformer)
+                except Exception as e:
+                    print(f"Error dibujando radar: {e}")
+
+    def _build_transformer(self, ctx: FrameContext):
+        """Calcula la homografía del frame (keypoints del modelo o aproximación)."""
+        width, height = self.width, self.height
+        frame_count = ctx.index
+        pitch_config = self.pitch_config
+        transformer = None
+
+        # Caso A: Modelo de Pitch disponible
+        if self.pitch_model and ctx.pitch_keypoints is not None:
+            try:
+                keypoints_xy, keypoints_conf = ctx.pitch_keypoints
+
+                # Umbral adaptativo optimizado:
+                # Soccana: 0.05 para capturar keypoints de áreas penales (baja confianza)
+                # Roboflow: 0.5 (alta confianza requerida)
+                conf_threshold = 0.05 if self.pitch_model_type == 'soccana' else 0.5
+                valid_kp_mask = keypoints_conf > conf_threshold
+                valid_keypoints = keypoints_xy[valid_kp_mask]
+                valid_indices = np.where(valid_kp_mask)[0]
+
+                # Filtrar keypoints que NO tienen mapeo en la configuración del pitch
+                # Esto es crucial si el modelo detecta keypoints que no están en el mapa (ej. modelo Roboflow sin librería sports)
+                mapped_indices_mask = np.isin(valid_indices, list(pitch_config.keypoints_map.keys()))
+                valid_indices = valid_indices[mapped_indices_mask]
+                valid_keypoints = valid_keypoints[mapped_indices_mask]
+
+                # Usar todos los keypoints válidos (RANSAC manejará outliers)
+                if len(valid_keypoints) >= 4:
+                    # Verificar distribución de keypoints (no solo círculo central)
+                    # Calcular dispersión en X e Y
+                    x_range = valid_keypoints[:, 0].max() - valid_keypoints[:, 0].min()
+                    y_range = valid_keypoints[:, 1].max() - valid_keypoints[:, 1].min()
+
+                    # Si los keypoints están muy concentrados (solo círculo central),
+                    # la homografía será inestable
+                    min_spread = width * 0.3  # Al menos 30% del ancho
+                    well_distributed = x_range > min_spread or y_range > min_spread
+
+                    if well_distributed:
+                        target_points = pitch_config.get_keypoints_from_ids(valid_indices)
+                        transformer = ViewTransformer(valid_keypoints, target_points)
+
+                        # Verificar si la homografía se calculó correctamente
+                        if transformer.m is None:
+                            if frame_count % 100 == 0:
+                                print(f"Frame {frame_count}: Homografía fallida (matriz singular), usando aproximación")
+                            transformer = None
+                        elif frame_count % 100 == 0:
+                            print(f"Frame {frame_count}: Homografía OK con {len(valid_keypoints)} keypoints")
                     else:
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(False)
-                        team2_mask.append(False)
-                        referee_mask.append(False)
-            
-            # Anotar
-            if any(team1_mask):
-                t1_dets = tracked_persons[np.array(team1_mask)]
-                annotated_frame = team1_annotator.annotate(scene=annotated_frame, detections=t1_dets)
-                if t1_dets.tracker_id is not None:
-                    labels = [f"Team 1 #{tid}" for tid in t1_dets.tracker_id]
-                    annotated_frame = team1_label_annotator.annotate(scene=annotated_frame, detections=t1_dets, labels=labels)
-
-            if any(team2_mask):
-                t2_dets = tracked_persons[np.array(team2_mask)]
-                annotated_frame = team2_annotator.annotate(scene=annotated_frame, detections=t2_dets)
-                if t2_dets.tracker_id is not None:
-                    labels = [f"Team 2 #{tid}" for tid in t2_dets.tracker_id]
-                    annotated_frame = team2_label_annotator.annotate(scene=annotated_frame, detections=t2_dets, labels=labels)
-
-            if any(goalkeeper_mask):
-                gk_dets = tracked_persons[np.array(goalkeeper_mask)]
-                annotated_frame = goalkeeper_annotator.annotate(scene=annotated_frame, detections=gk_dets)
-                if gk_dets.tracker_id is not None:
-                    labels = [f"GK #{tid}" for tid in gk_dets.tracker_id]
-                    annotated_frame = goalkeeper_label_annotator.annotate(scene=annotated_frame, detections=gk_dets, labels=labels)
-
-            if any(referee_mask):
-                ref_dets = tracked_persons[np.array(referee_mask)]
-                annotated_frame = referee_annotator.annotate(scene=annotated_frame, detections=ref_dets)
-                if ref_dets.tracker_id is not None:
-                    labels = [f"Referee #{tid}" for tid in ref_dets.tracker_id]
-                    annotated_frame = referee_label_annotator.annotate(scene=annotated_frame, detections=ref_dets, labels=labels)
-
-            # --- TRACKING DE PELOTA ---
-            tracked_ball = None
-            if len(ball_detections) > 0:
-                tracked_ball = ball_tracker.update_with_detections(ball_detections)
-                annotated_frame = ball_annotator.annotate(scene=annotated_frame, detections=tracked_ball)
-                ball_labels = ["BALL"] * len(tracked_ball)
-                annotated_frame = ball_label_annotator.annotate(scene=annotated_frame, detections=tracked_ball, labels=ball_labels)
-
-            # --- RADAR ---
-            if pitch_config:  # Si hay configuración de pitch (ya sea por modelo o approx)
-                transformer = None
-                
-                # Caso A: Modelo de Pitch disponible
-                if pitch_model:
-                    try:
-                        # Usar un umbral bajo para la inferencia inicial (conf=0.01)
-                        # para no perder keypoints que podrían ser válidos para Soccana (que usa 0.05)
-                        pitch_results = pitch_model(frame, verbose=False, conf=0.01)[0]
-                        if pitch_results.keypoints is not None and len(pitch_results.keypoints) > 0:
-                            keypoints_xy = pitch_results.keypoints.xy.cpu().numpy()[0]
-                            keypoints_conf = pitch_results.keypoints.conf.cpu().numpy()[0]
-
-                            # Umbral adaptativo optimizado:
-                            # Soccana: 0.05 para capturar keypoints de áreas penales (baja confianza)
-                            # Roboflow: 0.5 (alta confianza requerida)
-                            conf_threshold = 0.05 if pitch_model_type == 'soccana' else 0.5
-                            valid_kp_mask = keypoints_conf > conf_threshold
-                            valid_keypoints = keypoints_xy[valid_kp_mask]
-                            valid_indices = np.where(valid_kp_mask)[0]
-
-                            # Filtrar keypoints que NO tienen mapeo en la configuración del pitch
-                            # Esto es crucial si el modelo detecta keypoints que no están en el mapa (ej. modelo Roboflow sin librería sports)
-                            mapped_indices_mask = np.isin(valid_indices, list(pitch_config.keypoints_map.keys()))
-                            valid_indices = valid_indices[mapped_indices_mask]
-                            valid_keypoints = valid_keypoints[mapped_indices_mask]
-
-                            # Usar todos los keypoints válidos (RANSAC manejará outliers)
-                            if len(valid_keypoints) >= 4:
-                                # Verificar distribución de keypoints (no solo círculo central)
-                                # Calcular dispersión en X e Y
-                                x_range = valid_keypoints[:, 0].max() - valid_keypoints[:, 0].min()
-                                y_range = valid_keypoints[:, 1].max() - valid_keypoints[:, 1].min()
-
-                                # Si los keypoints están muy concentrados (solo círculo central),
-                                # la homografía será inestable
-                                min_spread = width * 0.3  # Al menos 30% del ancho
-                                well_distributed = x_range > min_spread or y_range > min_spread
-
-                                if well_distributed:
-                                    target_points = pitch_config.get_keypoints_from_ids(valid_indices)
-                                    transformer = ViewTransformer(valid_keypoints, target_points)
-
-                                    # Verificar si la homografía se calculó correctamente
-                                    if transformer.m is None:
-                                        if frame_count % 100 == 0:
-                                            print(f"Frame {frame_count}: Homografía fallida (matriz singular), usando aproximación")
-                                        transformer = None
-                                    elif frame_count % 100 == 0:
-                                        print(f"Frame {frame_count}: Homografía OK con {len(valid_keypoints)} keypoints")
-                                else:
-                                    if frame_count % 100 == 0:
-                                        print(f"Frame {frame_count}: Keypoints mal distribuidos (spread: {x_range:.0f}x{y_range:.0f}), usando aproximación")
-                                    transformer = None
-                    except Exception as e:
                         if frame_count % 100 == 0:
-                            print(f"Error en inferencia de pitch (frame {frame_count}): {e}")
-
-                # Caso B: Aproximación de Campo Completo (MEJORADA)
-                # Se usa si: 1) full_field_approx=True, o 2) modelo de pitch falló
-                if transformer is None and (full_field_approx or pitch_model):
-                    # Mejora: Usar márgenes para ajustar mejor la vista de cámara
-                    # Las cámaras de broadcast no muestran exactamente el campo completo
-                    # Típicamente hay ~5-10% de margen en los bordes
-
-                    # Detectar si hay más campo arriba (cielo/público) o abajo (línea)
-                    # Asumimos vista típica de broadcast: más espacio arriba
-                    margin_top = height * 0.15     # 15% superior es cielo/público
-                    margin_bottom = height * 0.05   # 5% inferior es fuera del campo
-                    margin_left = width * 0.08      # 8% lateral (bancas)
-                    margin_right = width * 0.08     # 8% lateral
-
-                    source_points = np.array([
-                        [margin_left, margin_top],                          # Top-Left (ajustado)
-                        [width - margin_right, margin_top],                 # Top-Right (ajustado)
-                        [width - margin_right, height - margin_bottom],     # Bottom-Right (ajustado)
-                        [margin_left, height - margin_bottom]               # Bottom-Left (ajustado)
-                    ], dtype=np.float32)
-
-                    # Mapear a las esquinas del campo usando el método correcto
-                    # Esto funciona tanto con Roboflow Sports (IDs: 0, 5, 29, 24)
-                    # como con configuración default (IDs: 0, 1, 2, 3)
-                    corner_ids = pitch_config.get_corner_keypoint_ids()
-                    target_points = np.array([
-                        pitch_config.keypoints_map[corner_ids[0]],  # Top-Left corner
-                        pitch_config.keypoints_map[corner_ids[1]],  # Top-Right corner
-                        pitch_config.keypoints_map[corner_ids[2]],  # Bottom-Right corner
-                        pitch_config.keypoints_map[corner_ids[3]]   # Bottom-Left corner
-                    ], dtype=np.float32)
-
-                    transformer = ViewTransformer(source_points, target_points)
-
-                # Si tenemos un transformer válido, proyectamos y dibujamos
-                if transformer:
-                    try:
-                        points_to_transform = {}
-
-                        def get_bottom_center(dets):
-                            return np.column_stack([
-                                (dets.xyxy[:, 0] + dets.xyxy[:, 2]) / 2,
-                                dets.xyxy[:, 3]
-                            ])
-
-                        def smooth_positions(tracker_ids, raw_positions):
-                            """Suaviza posiciones usando promedio móvil."""
-                            smoothed = []
-                            for tid, pos in zip(tracker_ids, raw_positions):
-                                if tid not in radar_positions_history:
-                                    radar_positions_history[tid] = deque(maxlen=RADAR_SMOOTH_WINDOW)
-
-                                radar_positions_history[tid].append(pos)
-                                # Promedio de las últimas N posiciones
-                                avg_pos = np.mean(list(radar_positions_history[tid]), axis=0)
-                                smoothed.append(avg_pos)
-                            return np.array(smoothed)
-
-                        # Transformar y suavizar team1 (con flip_x para corregir inversión)
-                        if any(team1_mask):
-                            t1_dets = tracked_persons[np.array(team1_mask)]
-                            raw_pos = transformer.transform_points(get_bottom_center(t1_dets), flip_x=True)
-                            if t1_dets.tracker_id is not None:
-                                points_to_transform['team1'] = smooth_positions(t1_dets.tracker_id, raw_pos)
-                            else:
-                                points_to_transform['team1'] = raw_pos
-
-                        # Transformar y suavizar team2 (con flip_x para corregir inversión)
-                        if any(team2_mask):
-                            t2_dets = tracked_persons[np.array(team2_mask)]
-                            raw_pos = transformer.transform_points(get_bottom_center(t2_dets), flip_x=True)
-                            if t2_dets.tracker_id is not None:
-                                points_to_transform['team2'] = smooth_positions(t2_dets.tracker_id, raw_pos)
-                            else:
-                                points_to_transform['team2'] = raw_pos
-
-                        # Transformar árbitros (sin suavizar mucho ya que se mueven menos)
-                        if any(referee_mask):
-                            ref_dets = tracked_persons[np.array(referee_mask)]
-                            points_to_transform['referee'] = transformer.transform_points(
-                                get_bottom_center(ref_dets), flip_x=True
-                            )
-
-                        # Transformar porteros
-                        if any(goalkeeper_mask):
-                            gk_dets = tracked_persons[np.array(goalkeeper_mask)]
-                            points_to_transform['goalkeeper'] = transformer.transform_points(
-                                get_bottom_center(gk_dets), flip_x=True
-                            )
-
-                        # Transformar pelota (suavizado agresivo por su movimiento rápido)
-                        if tracked_ball is not None and len(tracked_ball) > 0:
-                            raw_ball_pos = transformer.transform_points(get_bottom_center(tracked_ball), flip_x=True)
-                            if tracked_ball.tracker_id is not None and len(tracked_ball.tracker_id) > 0:
-                                ball_tid = tracked_ball.tracker_id[0]
-                                if ball_tid not in radar_positions_history:
-                                    radar_positions_history[ball_tid] = deque(maxlen=3)  # Ventana más corta para pelota
-                                radar_positions_history[ball_tid].append(raw_ball_pos[0])
-                                smooth_ball = np.mean(list(radar_positions_history[ball_tid]), axis=0)
-                                points_to_transform['ball'] = np.array([smooth_ball])
-                            else:
-                                points_to_transform['ball'] = raw_ball_pos
-                        
-                        # --- ACTUALIZACIÓN DE MÉTRICAS TÁCTICAS ---
-                        if 'team1' in points_to_transform and len(points_to_transform['team1']) > 0:
-                            formation1 = formation_detector.detect_formation(points_to_transform['team1'])
-                            formations_timeline['team1'].append(formation1)
-                            
-                            metrics1 = metrics_calculator.calculate_all_metrics(points_to_transform['team1'])
-                            team1_tracker.update(metrics1, frame_count)
-                            
-                        if 'team2' in points_to_transform and len(points_to_transform['team2']) > 0:
-                            formation2 = formation_detector.detect_formation(points_to_transform['team2'])
-                            formations_timeline['team2'].append(formation2)
-                            
-                            metrics2 = metrics_calculator.calculate_all_metrics(points_to_transform['team2'])
-                            team2_tracker.update(metrics2, frame_count)
-                            
-                        radar_view = draw_radar_view(pitch_config, points_to_transform, scale=8)
-
-                        # Mantener horizontal (sin rotación)
-                        # Tamaño: 22% del ancho (reducido para no molestar)
-                        scale_factor = 0.22
-                        new_w = int(width * scale_factor)
-                        aspect_ratio = radar_view.shape[0] / radar_view.shape[1]
-                        new_h = int(new_w * aspect_ratio)
-
-                        radar_resized = cv2.resize(radar_view, (new_w, new_h))
-
-                        # Posición: esquina inferior derecha
-                        margin_bottom = 20
-                        margin_right = 20
-                        offset_x = width - new_w - margin_right  # Esquina derecha con margen
-                        offset_y = height - new_h - margin_bottom  # Abajo con margen
-
-                        # Verificar que cabe en el frame
-                        if offset_y >= 0 and offset_x >= 0:
-                            # Aplicar transparencia (alpha blending)
-                            alpha = 0.65  # 65% radar, 35% video
-                            roi = annotated_frame[offset_y:offset_y+new_h, offset_x:offset_x+new_w]
-                            blended = cv2.addWeighted(roi, 1-alpha, radar_resized, alpha, 0)
-                            annotated_frame[offset_y:offset_y+new_h, offset_x:offset_x+new_w] = blended
-                    except Exception as e:
-                        print(f"Error dibujando radar: {e}")
-
-            out.write(annotated_frame)
+                            print(f"Frame {frame_count}: Keypoints mal distribuidos (spread: {x_range:.0f}x{y_range:.0f}), usando aproximación")
+                        transformer = None
+            except Exception as e:
+                if frame_count % 100 == 0:
+                    print(f"Error en inferencia de pitch (frame {frame_count}): {e}")
+
+        # Caso B: Aproximación de Campo Completo (MEJORADA)
+        # Se usa si: 1) full_field_approx=True, o 2) modelo de pitch falló
+        if transformer is None and (self.full_field_approx or self.pitch_model):
+            # Mejora: Usar márgenes para ajustar mejor la vista de cámara
+            # Las cámaras de broadcast no muestran exactamente el campo completo
+            # Típicamente hay ~5-10% de margen en los bordes
+
+            # Detectar si hay más campo arriba (cielo/público) o abajo (línea)
+            # Asumimos vista típica de broadcast: más espacio arriba
+            margin_top = height * 0.15     # 15% superior es cielo/público
+            margin_bottom = height * 0.05   # 5% inferior es fuera del campo
+            margin_left = width * 0.08      # 8% lateral (bancas)
+            margin_right = width * 0.08     # 8% lateral
+
+            source_points = np.array([
+                [margin_left, margin_top],                          # Top-Left (ajustado)
+                [width - margin_right, margin_top],                 # Top-Right (ajustado)
+                [width - margin_right, height - margin_bottom],     # Bottom-Right (ajustado)
+                [margin_left, height - margin_bottom]               # Bottom-Left (ajustado)
+            ], dtype=np.float32)
+
+            # Mapear a las esquinas del campo usando el método correcto
+            # Esto funciona tanto con Roboflow Sports (IDs: 0, 5, 29, 24)
+            # como con configuración default (IDs: 0, 1, 2, 3)
+            corner_ids = pitch_config.get_corner_keypoint_ids()
+            target_points = np.array([
+                pitch_config.keypoints_map[corner_ids[0]],  # Top-Left corner
+                pitch_config.keypoints_map[corner_ids[1]],  # Top-Right corner
+                pitch_config.keypoints_map[corner_ids[2]],  # Bottom-Right corner
+                pitch_config.keypoints_map[corner_ids[3]]   # Bottom-Left corner
+            ], dtype=np.float32)
+
+            transformer = ViewTransformer(source_points, target_points)
+
+        return transformer
+
+    def _smooth_positions(self, tracker_ids, raw_positions) -> np.ndarray:
+        """Suaviza posiciones usando promedio móvil."""
+        smoothed = []
+        for tid, pos in zip(tracker_ids, raw_positions):
+            if tid not in self.radar_positions_history:
+                self.radar_positions_history[tid] = deque(maxlen=self.RADAR_SMOOTH_WINDOW)
+
+            self.radar_positions_history[tid].append(pos)
+            # Promedio de las últimas N posiciones
+            avg_pos = np.mean(list(self.radar_positions_history[tid]), axis=0)
+            smoothed.append(avg_pos)
+        return np.array(smoothed)
+
+    def _project_positions(self, ctx: FrameContext, transformer: ViewTransformer) -> Dict[str, np.ndarray]:
+        """Proyecta las personas y la pelota al campo y actualiza las métricas tácticas."""
+        tracked_persons = ctx.tracked_persons
+        tracked_ball = ctx.tracked_ball
+        points_to_transform = {}
+
+        # Transformar y suavizar team1 (con flip_x para corregir inversión)
+        if any(ctx.team1_mask):
+            t1_dets = tracked_persons[np.array(ctx.team1_mask)]
+            raw_pos = transformer.transform_points(get_bottom_center(t1_dets), flip_x=True)
+            if t1_dets.tracker_id is not None:
+                points_to_transform['team1'] = self._smooth_positions(t1_dets.tracker_id, raw_pos)
+            else:
+                points_to_transform['team1'] = raw_pos
+
+        # Transformar y suavizar team2 (con flip_x para corregir inversión)
+        if any(ctx.team2_mask):
+            t2_dets = tracked_persons[np.array(ctx.team2_mask)]
+            raw_pos = transformer.transform_points(get_bottom_center(t2_dets), flip_x=True)
+            if t2_dets.tracker_id is not None:
+                points_to_transform['team2'] = self._smooth_positions(t2_dets.tracker_id, raw_pos)
+            else:
+                points_to_transform['team2'] = raw_pos
 
-        # --- GENERAR ESTADÍSTICAS FINALES ---
-        print("Generando estadísticas tácticas...")
+        # Transformar árbitros (sin suavizar mucho ya que se mueven menos)
+        if any(ctx.referee_mask):
+            ref_dets = tracked_persons[np.array(ctx.referee_mask)]
+            points_to_transform['referee'] = transformer.transform_points(
+                get_bottom_center(ref_dets), flip_x=True
+            )
 
-        def get_dominant_formation(formations_list):
-            if not formations_list: return "Unknown"
-            formation_names = [f.get('formation', 'Unknown') for f in formations_list]
-            if not formation_names: return "Unknown"
-            return Counter(formation_names).most_common(1)[0][0]
-
-        # Calcular estadísticas agregadas de métricas
-        team1_stats = team1_tracker.get_statistics()
-        team2_stats = team2_tracker.get_statistics()
-
-        stats_data = {
-            'total_frames': frame_count,
-            'duration_seconds': frame_count / fps if fps > 0 else 0,
-            'formations': {
-                'team1': {
-                    'most_common': get_dominant_formation(formations_timeline['team1']),
-                    'timeline': [f.get('formation', 'Unknown') for f in formations_timeline['team1']]
-                },
-                'team2': {
-                    'most_common': get_dominant_formation(formations_timeline['team2']),
-                    'timeline': [f.get('formation', 'Unknown') for f in formations_timeline['team2']]
-                }
-            },
-            'metrics': {
-                'team1': team1_stats,
-                'team2': team2_stats
+        # Transformar porteros
+        if any(ctx.goalkeeper_mask):
+            gk_dets = tracked_persons[np.array(ctx.goalkeeper_mask)]
+            points_to_transform['goalkeeper'] = transformer.transform_points(
+                get_bottom_center(gk_dets), flip_x=True
+            )
+
+        # Transformar pelota (suavizado agresivo por su movimiento rápido)
+        if tracked_ball is not None and len(tracked_ball) > 0:
+            raw_ball_pos = transformer.transform_points(get_bottom_center(tracked_ball), flip_x=True)
+            if tracked_ball.tracker_id is not None and len(tracked_ball.tracker_id) > 0:
+                ball_tid = tracked_ball.tracker_id[0]
+                if ball_tid not in self.radar_positions_history:
+                    self.radar_positions_history[ball_tid] = deque(maxlen=3)  # Ventana más corta para pelota
+                self.radar_positions_history[ball_tid].append(raw_ball_pos[0])
+                smooth_ball = np.mean(list(self.radar_positions_history[ball_tid]), axis=0)
+                points_to_transform['ball'] = np.array([smooth_ball])
+            else:
+                points_to_transform['ball'] = raw_ball_pos
+
+        # --- ACTUALIZACIÓN DE MÉTRICAS TÁCTICAS ---
+        if 'team1' in points_to_transform and len(points_to_transform['team1']) > 0:
+            formation1 = self.formation_detector.detect_formation(points_to_transform['team1'])
+            self.formations_timeline['team1'].append(formation1)
+
+            metrics1 = self.metrics_calculator.calculate_all_metrics(points_to_transform['team1'])
+            self.team1_tracker.update(metrics1, ctx.index)
+            ctx.team_metrics['team1'] = {'formation': formation1, 'metrics': metrics1}
+
+        if 'team2' in points_to_transform and len(points_to_transform['team2']) > 0:
+            formation2 = self.formation_detector.detect_formation(points_to_transform['team2'])
+            self.formations_timeline['team2'].append(formation2)
+
+            metrics2 = self.metrics_calculator.calculate_all_metrics(points_to_transform['team2'])
+            self.team2_tracker.update(metrics2, ctx.index)
+            ctx.team_metrics['team2'] = {'formation': formation2, 'metrics': metrics2}
+
+        return points_to_transform
+
+    # ------------------------------------------------------------------ #
+    # Etapa: render
+    # ------------------------------------------------------------------ #
+    def render_frames(self, contexts: List[FrameContext]) -> List[FrameContext]:
+        """Etapa de render: dibuja anotaciones y radar sobre cada frame."""
+        return self.renderer.render_frames(contexts)
+
+    def get_ball_search_report(self) -> Optional[Dict]:
+        """Búsquedas de pelota en recorte vs. frame completo (None si no se usa 'roi')."""
+        return self.ball_search.get_report() if self.ball_search is not None else None
+
+    def get_pitch_gate_report(self) -> Optional[Dict]:
+        """Inferencias de keypoints realizadas vs. omitidas por cámara quieta (None si no se usa)."""
+        return self.pitch_gate.get_report() if self.pitch_gate is not None else None
+
+    def get_team_cache_report(self) -> Optional[Dict]:
+        """Clasificaciones por color vs. etiquetas reutilizadas (None si no hay caché)."""
+        return self.team_cache.get_report() if self.team_cache is not None else None
+
+    def get_team_color_report(self) -> Dict:
+        """Actualizaciones del modelo de colores de los equipos."""
+        return self.team_color_model.get_report()
+
+    def get_resolution_report(self) -> Optional[Dict]:
+        """Resoluciones elegidas por tramo (None si la resolución es fija)."""
+        if self.resolution_scheduler is None:
+            return None
+        self.resolution_scheduler.flush()
+        return self.resolution_scheduler.get_report()
+
+    def get_stride_report(self) -> Dict:
+        """Frames detectados vs. predichos y deriva medida en los frames auditados."""
+        return {
+            'detect_every': self.detect_every,
+            'frames_detected': self.frames_detected,
+            'frames_predicted': self.frames_predicted,
+            'drift': self.drift_monitor.get_report(),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Estadísticas finales
+    # ------------------------------------------------------------------ #
+    def build_stats(self, fps: float) -> Dict:
+        """Construye el diccionario de estadísticas tácticas (contenido de _stats.json)."""
+        return build_match_stats(
+            self.frame_count, fps, self.formations_timeline, self.team1_tracker, self.team2_tracker
+        )
+
+    def reset_stats(self):
+        """
+        Descarta formaciones y métricas acumuladas (conserva trackers, colores
+        e historiales). Se usa para que los frames de calentamiento de un
+        tramo no cuenten en sus estadísticas.
+        """
+        self.team1_tracker = TacticalMetricsTracker(history_size=5000)
+        self.team2_tracker = TacticalMetricsTracker(history_size=5000)
+        self.formations_timeline = {'team1': [], 'team2': []}
+
+    # ------------------------------------------------------------------ #
+    # Checkpoints
+    # ------------------------------------------------------------------ #
+    def get_state(self, attrs: Optional[Tuple[str, ...]] = None) -> bytes:
+        """
+        Serializa el estado acumulado (CHECKPOINT_ATTRS). Se llama desde la
+        etapa de clasificación, así que refleja exactamente los frames ya clasificados.
+
+        Args:
+            attrs: Atributos a serializar (por defecto CHECKPOINT_ATTRS; la etapa de
+                detección usa DETECT_CHECKPOINT_ATTRS)
+        """
+        state = {}
+        for name in attrs or self.CHECKPOINT_ATTRS:
+            value = getattr(self, name)
+            # supervision expone ByteTrack tras un proxy de deprecación que pickle no
+            # puede resolver por nombre: se guardan sus atributos, no el objeto
+            if isinstance(value, sv.ByteTrack):
+                value = ('ByteTrack', vars(value))
+            state[name] = value
+        return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_state(self, state: bytes):
+        """Restaura un estado generado por get_state (antes de procesar frames)."""
+        for name, value in pickle.loads(state).items():
+            if isinstance(value, tuple) and len(value) == 2 and value[0] == 'ByteTrack':
+                getattr(self, name).__dict__.update(value[1])
+                continue
+            setattr(self, name, value)
+
+
+def build_match_stats(
+    total_frames: int,
+    fps: float,
+    formations_timeline: Dict[str, List[Dict]],
+    team1_tracker: TacticalMetricsTracker,
+    team2_tracker: TacticalMetricsTracker
+) -> Dict:
+    """Arma el diccionario de estadísticas tácticas (contenido de _stats.json)."""
+    def get_dominant_formation(formations_list):
+        if not formations_list: return "Unknown"
+        formation_names = [f.get('formation', 'Unknown') for f in formations_list]
+        if not formation_names: return "Unknown"
+        return Counter(formation_names).most_common(1)[0][0]
+
+    # Calcular estadísticas agregadas de métricas
+    team1_stats = team1_tracker.get_statistics()
+    team2_stats = team2_tracker.get_statistics()
+
+    return {
+        'total_frames': total_frames,
+        'duration_seconds': total_frames / fps if fps > 0 else 0,
+        'formations': {
+            'team1': {
+                'most_common': get_dominant_formation(formations_timeline['team1']),
+                'timeline': [f.get('formation', 'Unknown') for f in formations_timeline['team1']]
             },
-            'timeline': {
-                'team1': team1_tracker.export_to_dict(),
-                'team2': team2_tracker.export_to_dict()
+            'team2': {
+                'most_common': get_dominant_formation(formations_timeline['team2']),
+                'timeline': [f.get('formation', 'Unknown') for f in formations_timeline['team2']]
             }
+        },
+        'metrics': {
+            'team1': team1_stats,
+            'team2': team2_stats
+        },
+        'timeline': {
+            'team1': team1_tracker.export_to_dict(),
+            'team2': team2_tracker.export_to_dict()
         }
+    }
+
+
+def read_frame_contexts(cap, start_index: int = 0):
+    """
+    Genera un FrameContext por frame leído. El frame no se copia: tanto
+    cv2.VideoCapture como PrefetchFrameSource y FFmpegFrameReader devuelven
+    un array nuevo en cada lectura.
+
+    Args:
+        start_index: Frames ya procesados antes del primero leído (al reanudar)
+    """
+    frame_index = start_index
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_index += 1
+        yield FrameContext(frame_index, frame)
+
+
+def print_run_report(run_report: Dict):
+    """Imprime el reporte de rendimiento de una ejecución de process_video."""
+    if not run_report:
+        return
+
+    print("⏱️ Reporte de rendimiento:")
+    decode = run_report.get('decode')
+    if decode:
+        print(
+            f"   Decodificación: {decode['frames_decoded']} frames en {decode['decode_time_s']:.1f}s "
+            f"(prefetch={decode['prefetch_depth']}) | consumidor sin frames: "
+            f"{decode['consumer_starved_time_s']:.2f}s en {decode['consumer_starved_reads']} lecturas"
+        )
+    encode = run_report.get('encode')
+    if encode:
+        print(
+            f"   Codificación: {encode['frames_written']} frames en {encode['encode_time_s']:.1f}s "
+            f"| cola máx {encode['max_queue_depth']}/{encode['queue_size']} "
+            f"(media {encode['mean_queue_depth']:.1f}) | análisis bloqueado: "
+            f"{encode['producer_blocked_time_s']:.2f}s en {encode['producer_blocked_writes']} escrituras"
+        )
+    stride = run_report.get('stride')
+    if stride:
+        print(
+            f"   Detección cada {stride['detect_every']} frames: {stride['frames_detected']} detectados, "
+            f"{stride['frames_predicted']} predichos"
+        )
+        drift = stride.get('drift')
+        if drift:
+            print(
+                f"   Deriva vs stride 1 ({drift['audited_frames']} frames auditados): IoU medio "
+                f"{drift['mean_iou']:.2f} | error pies {drift['mean_foot_error_px']:.1f}px | "
+                f"detecciones cubiertas {drift['match_rate'] * 100:.0f}%"
+            )
+    ball_search = run_report.get('ball_search')
+    if ball_search:
+        searches = ball_search['roi_searches'] + ball_search['full_searches']
+        roi_share = ball_search['roi_searches'] / searches if searches else 0.0
+        print(
+            f"   Búsqueda de pelota: {ball_search['roi_searches']} en recorte {ball_search['roi_size']}px "
+            f"({ball_search['roi_hits']} con pelota) | {ball_search['full_searches']} en frame completo "
+            f"({ball_search['full_hits']} con pelota) | {roi_share * 100:.0f}% en recorte"
+        )
+    pitch_gate = run_report.get('pitch_gate')
+    if pitch_gate:
+        print(
+            f"   Keypoints del campo: {pitch_gate['pitch_inferences']} inferencias, "
+            f"{pitch_gate['pitch_skipped']} omitidas por cámara quieta "
+            f"({pitch_gate['skip_rate'] * 100:.0f}%, umbral {pitch_gate['motion_threshold']:.1%} del ancho)"
+        )
+    team_cache = run_report.get('team_cache')
+    if team_cache:
+        print(
+            f"   Equipos por track: {team_cache['classified']} clasificaciones por color, "
+            f"{team_cache['reused']} etiquetas reutilizadas ({team_cache['reuse_rate'] * 100:.0f}%, "
+            f"reverificación cada {team_cache['reverify_every']} frames)"
+        )
+    team_colors = run_report.get('team_colors')
+    if team_colors:
+        print(
+            f"   Colores de equipos: {team_colors['updates']} actualizaciones incrementales "
+            f"({team_colors['samples']} jugadores, {team_colors['rejected_updates']} descartadas)"
+        )
+    detection_cache = run_report.get('detection_cache')
+    if detection_cache:
+        action = "reproducidas" if detection_cache['replayed'] else "grabadas"
+        print(f"   Caché de detecciones: {detection_cache['frames']} frames {action} ({detection_cache['path']})")
+    resolution = run_report.get('resolution')
+    if resolution:
+        sizes = ", ".join(f"{key} {size}" for key, size in resolution['final_sizes'].items())
+        print(
+            f"   Resolución adaptativa (objetivo {resolution['target_fps']:.0f} fps): "
+            f"{len(resolution['segments'])} tramos, final {sizes}"
+        )
+    pipeline = run_report.get('pipeline')
+    if pipeline:
+        mode = "paralelo" if pipeline['parallel'] else "serial"
+        print(f"   Pipeline ({mode}, {pipeline['wall_time_s']:.1f}s) - utilización por etapa:")
+        for name, stage in pipeline['stages'].items():
+            batches = stage.get('batches', stage['items'])
+            batch_info = f", {batches} lotes" if batches != stage['items'] else ""
+            print(
+                f"     {name:<18} {stage['utilization'] * 100:5.1f}% "
+                f"({stage['busy_time_s']:.1f}s, {stage['items']} frames{batch_info})"
+            )
+
+
+def process_video(
+    source_path: str,
+    target_path: str,
+    player_model,
+    ball_model=None,
+    pitch_model=None,
+    conf: float = 0.3,
+    detection_mode: str = "players_and_ball",
+    img_size: int = 640,
+    full_field_approx: bool = False,
+    prefetch_depth: int = 4,
+    encode_queue_size: int = 8,
+    pipeline_queue_size: int = 4,
+    parallel_stages: bool = True,
+    batch_size: int = 1,
+    detect_every: int = 1,
+    drift_audit_every: int = 10,
+    video_backend: str = "opencv",
+    render: bool = True,
+    checkpoint_every: int = 0,
+    resume: bool = False,
+    ball_search: str = "full",
+    ball_search_misses: int = 3,
+    ball_tile_size: int = 640,
+    ball_tile_overlap: float = 0.2,
+    pitch_motion_threshold: float = 0.0,
+    pitch_max_interval: int = 30,
+    target_fps: float = 0.0,
+    img_size_bounds: Tuple[int, int] = (320, 960),
+    cache_detections: bool = False,
+    team_reverify_every: int = 0
+) -> Dict:
+    """
+    Procesa video completo con detección y tracking mejorado usando múltiples modelos.
+
+    El procesamiento se organiza como un pipeline de etapas
+    (decode → detect → classify/project → render → encode) unidas por colas
+    acotadas; cada etapa corre en su propio hilo, de modo que la clasificación,
+    homografía y radar de un frame se solapan con la inferencia del siguiente.
+
+    Args:
+        source_path: Ruta al video de entrada
+        target_path: Ruta al video de salida
+        player_model: Modelo YOLO para detección de jugadores
+        ball_model: Modelo YOLO para detección de pelota (opcional)
+        pitch_model: Modelo YOLO para detección de campo (opcional)
+        conf: Umbral de confianza para detecciones de personas
+        detection_mode: Modo de detección ('players_only', 'ball_only', 'players_and_ball')
+        img_size: Tamaño de imagen para inferencia
+        full_field_approx: Si True, asume que la imagen completa es el campo (experimental)
+        prefetch_depth: Frames decodificados por adelantado en un hilo de fondo (0 = lectura síncrona)
+        encode_queue_size: Frames pendientes de codificar en el hilo escritor (0 = escritura síncrona)
+        pipeline_queue_size: Capacidad de las colas entre etapas del pipeline
+        parallel_stages: Si False, todas las etapas corren en serie en el hilo llamador
+        batch_size: Frames enviados juntos a cada modelo en una sola inferencia (micro-batching)
+        detect_every: Corre los detectores 1 de cada N frames; en los intermedios las cajas
+            se predicen por movimiento a partir de los tracks (1 = detectar todos)
+        drift_audit_every: Con detect_every > 1, detecta además el último frame predicho de
+            cada N intervalos para medir la deriva frente a stride 1 (0 = sin auditoría)
+        video_backend: E/S de video: 'opencv' (cv2, mp4v) o 'ffmpeg' (pipes rawvideo, salida H.264)
+        render: Si False (modo sólo estadísticas) no se dibuja ni se codifica video: se calculan
+            tracking, equipos, homografía, formaciones y métricas y sólo se escribe
+            `<stem>_stats.json` junto a `target_path`
+        checkpoint_every: Cada N frames guarda el estado del análisis en `<stem>_checkpoint.pkl`
+            y cierra una parte del video en `<stem>_parts/` (0 = sin checkpoints). Se redondea
+            a un múltiplo de `batch_size`: el estado de la etapa de detección (`ball_search`
+            'roi', compuerta de keypoints, resolución adaptativa) se guarda al cerrar un lote
+        resume: Si hay un checkpoint compatible, continúa desde su último frame; las
+            estadísticas finales son las mismas que las de una ejecución sin interrupciones
+        ball_search: 'full' (modelo de pelota sobre el frame completo a img_size), 'roi'
+            (sobre un recorte a resolución nativa alrededor de la posición predicha de la
+            pelota; vuelve al frame completo tras `ball_search_misses` búsquedas sin pelota)
+            o 'tiled' (mosaicos solapados a resolución nativa, unidos con NMS)
+        ball_search_misses: Búsquedas consecutivas sin pelota antes de ampliar al frame completo
+        ball_tile_size: Con 'tiled', lado de cada mosaico en píxeles
+        ball_tile_overlap: Con 'tiled', fracción de solapamiento entre mosaicos vecinos
+        pitch_motion_threshold: Si > 0, los keypoints del campo sólo se infieren cuando el
+            movimiento de cámara acumulado (fracción del ancho, por correlación de fase)
+            supera este umbral; en el resto se reutiliza la homografía (0 = inferir siempre)
+        pitch_max_interval: Frames máximos entre dos inferencias de keypoints
+        target_fps: Si > 0, la resolución de inferencia de cada modelo se ajusta durante la
+            ejecución (dentro de `img_size_bounds`) para que la detección sostenga estos frames
+            por segundo; las resoluciones elegidas por tramo quedan en el JSON de estadísticas
+        img_size_bounds: Resolución mínima y máxima del ajuste adaptativo
+        cache_detections: Si True, las detecciones se guardan en disco (outputs/detection_cache,
+            por hash del video, de los modelos y de los parámetros de detección) y, si ya
+            existen, se reproducen sin correr los modelos (sólo corren las etapas posteriores).
+            No se usa con `target_fps` (la resolución adaptativa no es reproducible)
+        team_reverify_every: Frames entre dos clasificaciones por color de un track estable;
+            en el resto se reutiliza su etiqueta. 0 (por defecto) = clasificar todos en cada
+            frame. Activarlo (p. ej. 15) es más rápido pero cambia ~1% de las etiquetas y el
+            suavizado (los tracks reutilizados no votan: los 30 votos abarcan más frames)
+
+    Returns:
+        Dict con el reporte de rendimiento de la ejecución
+    """
+    source_path = str(source_path)
+    target_path = str(target_path)
+
+    cap = open_video_reader(source_path, backend=video_backend)
+    if not cap.isOpened():
+        raise RuntimeError(f"No se puede abrir el video fuente: {source_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    run_report = {}
+
+    # Checkpoints: el video se escribe en partes que se cierran en cada checkpoint
+    checkpoint_every = max(0, int(checkpoint_every))
+    # El estado de la etapa de detección (ventana de pelota, compuerta de keypoints,
+    # resolución adaptativa) se toma al cerrar un lote: cada checkpoint debe coincidir
+    # con el último frame de un lote, también después de reanudar
+    batch_frames = max(1, int(batch_size))
+    if checkpoint_every % batch_frames:
+        aligned = (checkpoint_every // batch_frames + 1) * batch_frames
+        print(f"⚠️ checkpoint_every={checkpoint_every} no es múltiplo de batch_size={batch_frames}; se usa {aligned}")
+        checkpoint_every = aligned
+    checkpoint = RunCheckpoint(target_path) if checkpoint_every > 0 or resume else None
+    checkpoint_settings = {
+        'source_path': source_path, 'conf': conf, 'detection_mode': detection_mode,
+        'img_size': img_size, 'full_field_approx': full_field_approx,
+        'detect_every': detect_every, 'drift_audit_every': drift_audit_every, 'render': render,
+        'ball_search': ball_search, 'ball_search_misses': ball_search_misses,
+        'ball_tile_size': ball_tile_size, 'ball_tile_overlap': ball_tile_overlap,
+        'pitch_motion_threshold': pitch_motion_threshold, 'pitch_max_interval': pitch_max_interval,
+        'target_fps': target_fps, 'img_size_bounds': list(img_size_bounds),
+        'team_reverify_every': team_reverify_every, 'batch_size': batch_size,
+    }
+    resumed = checkpoint.load(checkpoint_settings) if resume else None
+    start_index = resumed['frame_index'] if resumed else 0
+    video_parts = list(resumed['parts']) if resumed else []
+
+    def open_part_writer():
+        """Writer de la siguiente parte del video (o del video final si no hay partes)."""
+        if checkpoint_every > 0 or video_parts:
+            checkpoint.parts_dir.mkdir(parents=True, exist_ok=True)
+            path = checkpoint.part_path(len(video_parts))
+        else:
+            path = target_path
+        return open_video_writer(path, fps, (width, height), backend=video_backend), path
+
+    if start_index > 0:
+        # Búsqueda exacta: el frame siguiente al checkpoint, no el keyframe más cercano
+        if not seek_frame(cap, start_index):
+            raise RuntimeError(f"El video termina antes del frame {start_index} del checkpoint: {source_path}")
+        print(f"♻️ Reanudando desde el checkpoint del frame {start_index} ({len(video_parts)} partes de video)")
+
+    out, out_path = open_part_writer() if render else (None, None)
+
+    # Decodificación anticipada en segundo plano (solapa decode con inferencia)
+    if prefetch_depth > 0:
+        cap = PrefetchFrameSource(cap, depth=prefetch_depth)
+    # Codificación en un hilo propio (out.write no bloquea el análisis)
+    if render and encode_queue_size > 0:
+        out = AsyncVideoWriter(out, queue_size=encode_queue_size)
+
+    analyzer = MatchAnalyzer(
+        player_model=player_model,
+        ball_model=ball_model,
+        pitch_model=pitch_model,
+        conf=conf,
+        detection_mode=detection_mode,
+        img_size=img_size,
+        full_field_approx=full_field_approx,
+        width=width,
+        height=height,
+        detect_every=detect_every,
+        drift_audit_every=drift_audit_every,
+        ball_search=ball_search,
+        ball_search_misses=ball_search_misses,
+        ball_tile_size=ball_tile_size,
+        ball_tile_overlap=ball_tile_overlap,
+        pitch_motion_threshold=pitch_motion_threshold,
+        pitch_max_interval=pitch_max_interval,
+        target_fps=target_fps,
+        img_size_bounds=tuple(img_size_bounds),
+        team_reverify_every=team_reverify_every
+    )
+    if resumed:
+        analyzer.load_state(resumed['state'])
+        if resumed['detect_state'] is not None:
+            analyzer.load_state(resumed['detect_state'])
+
+    # --- CACHÉ DE DETECCIONES ---
+    detection_cache = None
+    replaying = False
+    if cache_detections and target_fps > 0:
+        print("⚠️ Caché de detecciones desactivada: la resolución adaptativa (target_fps) no es reproducible")
+    elif cache_detections:
+        cache_settings = {
+            key: checkpoint_settings[key] for key in (
+                'conf', 'detection_mode', 'img_size', 'full_field_approx', 'detect_every',
+                'drift_audit_every', 'ball_search', 'ball_search_misses', 'ball_tile_size',
+                'ball_tile_overlap', 'pitch_motion_threshold', 'pitch_max_interval',
+                # Con ball_search='roi' las ventanas de un lote se fijan antes de procesarlo
+                'batch_size',
+            )
+        }
+        detection_cache = DetectionCache.for_run(
+            source_path,
+            {'player': player_model, 'ball': ball_model, 'pitch': analyzer.pitch_model},
+            cache_settings
+        )
+        replaying = detection_cache is not None and detection_cache.load()
+        if replaying:
+            print(f"♻️ Reproduciendo detecciones desde la caché: {detection_cache.path} ({len(detection_cache)} frames)")
+
+    if replaying:
+        detect_frames = detection_cache.replay
+    elif detection_cache is not None and start_index == 0:
+        def detect_frames(contexts):
+            return detection_cache.record(analyzer.detect_frames(contexts))
+    else:
+        # Al reanudar no se graba: la caché debe cubrir el video completo
+        detection_cache = None
+        detect_frames = analyzer.detect_frames
+
+    if checkpoint_every > 0:
+        detect_batch = detect_frames
+
+        def detect_frames(contexts):
+            contexts = detect_batch(contexts)
+            # El lote termina en el frame de checkpoint (checkpoint_every es múltiplo de batch_size)
+            if contexts and contexts[-1].index % checkpoint_every == 0:
+                contexts[-1].detect_state = analyzer.get_state(analyzer.DETECT_CHECKPOINT_ATTRS)
+            return contexts
+
+    def classify_frames(contexts):
+        for ctx in contexts:
+            analyzer.classify_frames([ctx])
+            # Instantánea del estado justo después de clasificar el frame de checkpoint
+            if checkpoint_every > 0 and ctx.index % checkpoint_every == 0:
+                ctx.checkpoint_state = analyzer.get_state()
+        return contexts
+
+    def encode_frames(contexts):
+        nonlocal out, out_path
+        for ctx in contexts:
+            if out is not None:
+                out.write(ctx.annotated_frame)
+            if ctx.checkpoint_state is None:
+                continue
+            # Cerrar la parte actual: el checkpoint sólo referencia video ya escrito
+            if out is not None:
+                video_parts.append(out_path)
+                next_writer, out_path = open_part_writer()
+                if isinstance(out, AsyncVideoWriter):
+                    out.switch_writer(next_writer)
+                else:
+                    out.release()
+                    out = next_writer
+            checkpoint.save(ctx.index, ctx.checkpoint_state, video_parts, checkpoint_settings,
+                            detect_state=ctx.detect_state)
+        return []
+
+    stages = [
+        PipelineStage('detect', detect_frames, batch_size=batch_size),
+        PipelineStage('classify_project', classify_frames),
+    ]
+    if render:
+        stages += [
+            PipelineStage('render', analyzer.render_frames),
+            PipelineStage('encode', encode_frames),
+        ]
+    else:
+        print("📊 Modo sólo estadísticas: sin render ni codificación de video")
+        if checkpoint_every > 0:
+            stages.append(PipelineStage('checkpoint', encode_frames))
+
+    pipeline = StagedPipeline(
+        stages,
+        queue_size=pipeline_queue_size,
+        parallel=parallel_stages
+    )
+
+    try:
+        pipeline.run(read_frame_contexts(cap, start_index=start_index))
+        if detection_cache is not None and not replaying:
+            detection_cache.save()
+
+        # --- CERRAR EL VIDEO Y UNIR LAS PARTES ---
+        # Se cierra antes de las estadísticas: un error del codificador en los
+        # últimos frames hace fallar la ejecución (y conserva el checkpoint)
+        if out is not None:
+            out.release()
+            if video_parts:
+                video_parts.append(out_path)
+                concat_videos(video_parts, target_path, backend=video_backend)
+
+        # --- GENERAR ESTADÍSTICAS FINALES ---
+        print("Generando estadísticas tácticas...")
+        stats_data = analyzer.build_stats(fps)
+        resolution_report = analyzer.get_resolution_report()
+        if resolution_report is not None:
+            stats_data['inference_resolution'] = resolution_report
 
         stats_path = Path(target_path).parent / f"{Path(target_path).stem}_stats.json"
         with open(stats_path, 'w') as f:
@@ -1137,6 +2319,36 @@ def process_video(
             json.dump(stats_data_converted, f, indent=2)
         print(f"Estadísticas guardadas en: {stats_path}")
 
+        if checkpoint is not None:
+            checkpoint.clear()
+
     finally:
         cap.release()
-        out.release()
+        if out is not None:
+            out.release()
+
+    if isinstance(cap, PrefetchFrameSource):
+        run_report['decode'] = cap.get_report()
+    if isinstance(out, AsyncVideoWriter):
+        run_report['encode'] = out.get_report()
+    run_report['pipeline'] = pipeline.get_report()
+    if analyzer.detect_every > 1:
+        run_report['stride'] = analyzer.get_stride_report()
+    if analyzer.ball_search is not None:
+        run_report['ball_search'] = analyzer.get_ball_search_report()
+    if analyzer.pitch_gate is not None:
+        run_report['pitch_gate'] = analyzer.get_pitch_gate_report()
+    if analyzer.resolution_scheduler is not None:
+        run_report['resolution'] = analyzer.get_resolution_report()
+    if analyzer.team_cache is not None:
+        run_report['team_cache'] = analyzer.get_team_cache_report()
+    run_report['team_colors'] = analyzer.get_team_color_report()
+    if detection_cache is not None:
+        run_report['detection_cache'] = {
+            'path': str(detection_cache.path),
+            'replayed': replaying,
+            'frames': detection_cache.frames_replayed if replaying else len(detection_cache),
+        }
+    print_run_report(run_report)
+
+    return run_report
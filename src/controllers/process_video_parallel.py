@@ -0,0 +1,719 @@
+"""
+Procesamiento de un partido completo en paralelo por tramos de tiempo.
+
+El video se divide en tramos consecutivos; cada tramo se analiza en un
+proceso distinto (detección, tracking, equipos, radar y métricas) empezando
+unos segundos antes de su inicio ("calentamiento") para que trackers, votos de
+equipo y suavizados lleguen estabilizados al primer frame propio. Después:
+
+1. Se reconcilian los IDs de tracking: los frames de calentamiento de un tramo
+   son frames propios del tramo anterior, y allí se emparejan los tracks por
+   IoU (asignación húngara) para heredar el ID global.
+2. Se mantienen consistentes las etiquetas team1/team2: todos los tramos parten
+   de los mismos colores de referencia y, si en el solapamiento la mayoría de
+   los tracks emparejados aparece con el equipo invertido, se intercambian.
+3. Se renderiza cada tramo en paralelo con los IDs globales, se unen los
+   videos y se escribe un único `_stats.json`.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import supervision as sv
+from scipy.optimize import linear_sum_assignment
+
+from src.controllers.process_video import (
+    FrameContext,
+    FrameRenderer,
+    MatchAnalyzer,
+    build_match_stats,
+    cluster_teams,
+    convert_to_native_types,
+    identify_model_classes,
+)
+from src.controllers.tactical_metrics import TacticalMetricsTracker
+from src.models.inference_backend import load_inference_model
+from src.utils.motion_prediction import box_iou_matrix
+from src.utils.radar import SoccerPitchConfiguration
+from src.utils.video_io import concat_videos, open_video_reader, open_video_writer, seek_frame
+
+# Categorías de persona de un registro (código = posición; 0 = sin categoría)
+PERSON_LABELS = (None, 'team1', 'team2', 'referee', 'goalkeeper')
+# Categorías de los puntos del radar
+RADAR_CATEGORIES = ('team1', 'team2', 'referee', 'goalkeeper', 'ball')
+
+
+def _model_spec(model, backend: str = "pytorch", precision: str = "fp32", img_size: int = 640):
+    """
+    Representación serializable de un modelo para enviarlo a los workers.
+
+    Los modelos YOLO cargados desde un .pt (o una ruta) se envían como pesos +
+    backend de inferencia + precisión, y cada proceso los carga con
+    load_inference_model (ONNX/INT8 usan la exportación cacheada). Los modelos
+    ONNX ya cargados se envían tal cual (OnnxYOLO sólo serializa su ruta, así
+    que se conserva el mismo grafo FP32 o INT8); cualquier otro objeto debe
+    ser serializable con pickle.
+    """
+    if model is None:
+        return None
+    weights = str(model) if isinstance(model, (str, Path)) else getattr(model, "ckpt_path", None)
+    if weights:
+        return {'weights': str(weights), 'backend': backend, 'precision': precision, 'img_size': img_size}
+    return model
+
+
+def _load_model(spec):
+    """Inversa de _model_spec."""
+    if isinstance(spec, dict):
+        return load_inference_model(
+            spec['weights'], backend=spec['backend'], img_size=spec['img_size'], precision=spec['precision']
+        )
+    return spec
+
+
+def _pack_detections(detections: List[Optional[sv.Detections]], prefix: str) -> Dict[str, np.ndarray]:
+    """Aplana una lista de detecciones por frame (None permitido) en arreglos contiguos."""
+    present = [d for d in detections if d is not None]
+    packed = {
+        f'{prefix}_counts': np.array([-1 if d is None else len(d) for d in detections], dtype=np.int64),
+        f'{prefix}_xyxy': np.concatenate([d.xyxy for d in present] + [np.zeros((0, 4))]).astype(np.float64),
+    }
+    for field, fill, dtype in (('class_id', -1, np.int64), ('tracker_id', -1, np.int64),
+                               ('confidence', np.nan, np.float64)):
+        packed[f'{prefix}_has_{field}'] = np.array(
+            [d is not None and getattr(d, field) is not None for d in detections], dtype=bool
+        )
+        values = [np.full(len(d), fill) if getattr(d, field) is None else getattr(d, field) for d in present]
+        packed[f'{prefix}_{field}'] = np.concatenate(values + [np.zeros(0)]).astype(dtype)
+    return packed
+
+
+def _unpack_detections(packed: Dict[str, np.ndarray], prefix: str) -> List[Optional[sv.Detections]]:
+    """Inversa de _pack_detections."""
+    detections = []
+    offset = 0
+    for i, count in enumerate(packed[f'{prefix}_counts']):
+        if count < 0:
+            detections.append(None)
+            continue
+        rows = slice(offset, offset + count)
+        offset += count
+        fields = {
+            field: packed[f'{prefix}_{field}'][rows]
+            for field in ('class_id', 'tracker_id', 'confidence')
+            if packed[f'{prefix}_has_{field}'][i]
+        }
+        detections.append(sv.Detections(xyxy=packed[f'{prefix}_xyxy'][rows], **fields))
+    return detections
+
+
+def pack_records(records: List[FrameContext]) -> Dict[str, np.ndarray]:
+    """
+    Empaqueta los registros de un tramo para enviarlos entre procesos.
+
+    Sólo se conserva lo que el proceso principal necesita para reconciliar IDs
+    y lo que el render dibuja: personas rastreadas (cajas, IDs, clase y
+    categoría), pelota y puntos del radar. Todo va en arreglos planos con
+    conteos por frame (como DetectionCache), en vez de una lista de
+    FrameContext con sus Detections y diccionarios.
+    """
+    packed = {'index': np.array([ctx.index for ctx in records], dtype=np.int64)}
+    packed.update(_pack_detections([ctx.tracked_persons for ctx in records], 'person'))
+    packed.update(_pack_detections([ctx.tracked_ball for ctx in records], 'ball'))
+    packed['person_label'] = np.array(
+        [PERSON_LABELS.index(label) for ctx in records for label in _person_classes(ctx)], dtype=np.int8
+    )
+
+    radar_counts = np.full((len(records), len(RADAR_CATEGORIES)), -1, dtype=np.int64)
+    radar_xy = []
+    for i, ctx in enumerate(records):
+        for j, category in enumerate(RADAR_CATEGORIES):
+            points = (ctx.radar_points or {}).get(category)
+            if points is not None:
+                points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+                radar_counts[i, j] = len(points)
+                radar_xy.append(points)
+    packed['has_radar'] = np.array([ctx.radar_points is not None for ctx in records], dtype=bool)
+    packed['radar_counts'] = radar_counts
+    packed['radar_xy'] = np.concatenate(radar_xy + [np.zeros((0, 2))])
+    return packed
+
+
+def unpack_records(packed: Dict[str, np.ndarray]) -> List[FrameContext]:
+    """Inversa de pack_records: FrameContext sin imagen, listos para reconciliar o renderizar."""
+    persons = _unpack_detections(packed, 'person')
+    balls = _unpack_detections(packed, 'ball')
+    records = []
+    label_offset = radar_offset = 0
+    for i, index in enumerate(packed['index']):
+        ctx = FrameContext(int(index), None)
+        ctx.tracked_persons = persons[i]
+        ctx.tracked_ball = balls[i]
+
+        n = len(persons[i]) if persons[i] is not None else 0
+        labels = packed['person_label'][label_offset:label_offset + n]
+        label_offset += n
+        ctx.team1_mask = (labels == PERSON_LABELS.index('team1')).tolist()
+        ctx.team2_mask = (labels == PERSON_LABELS.index('team2')).tolist()
+        ctx.referee_mask = (labels == PERSON_LABELS.index('referee')).tolist()
+        ctx.goalkeeper_mask = (labels == PERSON_LABELS.index('goalkeeper')).tolist()
+
+        radar_points = {}
+        for j, category in enumerate(RADAR_CATEGORIES):
+            count = packed['radar_counts'][i, j]
+            if count >= 0:
+                radar_points[category] = packed['radar_xy'][radar_offset:radar_offset + count]
+                radar_offset += count
+        ctx.radar_points = radar_points if packed['has_radar'][i] else None
+        records.append(ctx)
+    return records
+
+
+def _init_worker(threads_per_worker: int):
+    """Limita los hilos de cada worker para no sobre-suscribir los núcleos."""
+    cv2.setNumThreads(threads_per_worker)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+
+def estimate_reference_colors(
+    source_path: str,
+    player_model,
+    conf: float = 0.3,
+    img_size: int = 640,
+    video_backend: str = "opencv",
+    probe_frames: int = 250,
+    min_players: int = 6
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Colores de camiseta (team1, team2) de referencia para todos los tramos.
+
+    Usa el primer frame (muestreando 1 de cada 5) con al menos `min_players`
+    personas detectadas. Retorna None si no encuentra ninguno.
+    """
+    player_class_ids, _, _ = identify_model_classes(player_model)
+    cap = open_video_reader(source_path, backend=video_backend)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    try:
+        for frame_index in range(probe_frames):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_index % 5:
+                continue
+
+            results = player_model.predict(frame, conf=conf, iou=0.3, imgsz=img_size, max_det=100, verbose=False)
+            detections = sv.Detections.from_ultralytics(results[0])
+            if detections.class_id is not None:
+                detections = detections[np.isin(detections.class_id, player_class_ids)]
+            if len(detections) < min_players:
+                continue
+
+            team1_colors, team2_colors, _, _, _ = cluster_teams(frame, detections, width, height)
+            return team1_colors['shirt'].copy(), team2_colors['shirt'].copy()
+    finally:
+        cap.release()
+    return None
+
+
+def _analyze_chunk(task: Dict) -> Dict:
+    """
+    Worker: analiza los frames [warmup_start, end) de un tramo.
+
+    Retorna los registros por frame empaquetados (pack_records: sólo lo
+    necesario para reconciliar y renderizar) y las estadísticas de los frames
+    propios [start, end); los de calentamiento sólo se usan para reconciliar
+    IDs con el tramo anterior.
+    """
+    t0 = time.perf_counter()
+    player_model = _load_model(task['player_model'])
+    ball_model = _load_model(task['ball_model'])
+    pitch_model = _load_model(task['pitch_model'])
+
+    cap = open_video_reader(task['source_path'], backend=task['video_backend'])
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    analyzer = MatchAnalyzer(
+        player_model=player_model,
+        ball_model=ball_model,
+        pitch_model=pitch_model,
+        conf=task['conf'],
+        detection_mode=task['detection_mode'],
+        img_size=task['img_size'],
+        full_field_approx=task['full_field_approx'],
+        width=width,
+        height=height,
+        detect_every=task['detect_every'],
+        drift_audit_every=0,
+        reference_colors=task['reference_colors'],
+        ball_search=task['ball_search'],
+        ball_search_misses=task['ball_search_misses'],
+        ball_tile_size=task['ball_tile_size'],
+        ball_tile_overlap=task['ball_tile_overlap'],
+        pitch_motion_threshold=task['pitch_motion_threshold'],
+        pitch_max_interval=task['pitch_max_interval'],
+        target_fps=task['target_fps'],
+        img_size_bounds=task['img_size_bounds'],
+        team_reverify_every=task['team_reverify_every']
+    )
+
+    warmup_start, start, end = task['warmup_start'], task['start'], task['end']
+    batch_size = max(1, task['batch_size'])
+    records = []
+
+    try:
+        seek_frame(cap, warmup_start)
+        position = warmup_start
+        while position < end:
+            # Los lotes no cruzan el inicio del tramo propio (ahí se reinician las estadísticas)
+            batch_end = min(end, position + batch_size)
+            if position < start:
+                batch_end = min(batch_end, start)
+            if position == start:
+                analyzer.reset_stats()
+
+            batch = []
+            for frame_index in range(position, batch_end):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                batch.append(FrameContext(frame_index + 1, frame))
+
+            if batch:
+                analyzer.classify_frames(analyzer.detect_frames(batch))
+            for ctx in batch:
+                # La imagen no se conserva: el render vuelve a leer el video
+                ctx.frame = None
+                records.append(ctx)
+
+            if len(batch) < batch_end - position:
+                break  # Fin del video antes de lo esperado
+            position = batch_end
+    finally:
+        cap.release()
+
+    return {
+        'chunk_index': task['chunk_index'],
+        'start': start,
+        'records': pack_records(records),
+        'formations_timeline': analyzer.formations_timeline,
+        'team1_history': analyzer.team1_tracker.export_to_dict(),
+        'team2_history': analyzer.team2_tracker.export_to_dict(),
+        'pitch_model_type': analyzer.pitch_model_type if analyzer.pitch_config else None,
+        'pitch_gate': analyzer.get_pitch_gate_report(),
+        'resolution': analyzer.get_resolution_report(),
+        'analysis_time_s': time.perf_counter() - t0,
+    }
+
+
+def _render_chunk(task: Dict) -> Dict:
+    """Worker: dibuja los registros (con IDs globales) sobre los frames del tramo."""
+    t0 = time.perf_counter()
+    cap = open_video_reader(task['source_path'], backend=task['video_backend'])
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    pitch_config = None
+    if task['pitch_model_type'] is not None:
+        pitch_config = SoccerPitchConfiguration(model_type=task['pitch_model_type'])
+    renderer = FrameRenderer(pitch_config, width, height)
+
+    out = open_video_writer(task['target_path'], fps, (width, height), backend=task['video_backend'])
+    written = 0
+    try:
+        seek_frame(cap, task['start'])
+        for ctx in unpack_records(task['records']):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            ctx.frame = frame
+            renderer.render_frames([ctx])
+            out.write(ctx.annotated_frame)
+            ctx.frame = ctx.annotated_frame = None
+            written += 1
+    finally:
+        cap.release()
+        out.release()
+
+    return {'frames_written': written, 'render_time_s': time.perf_counter() - t0}
+
+
+def _person_classes(ctx: FrameContext) -> List[Optional[str]]:
+    """Categoría final de cada persona rastreada de un registro."""
+    classes = []
+    for i in range(len(ctx.tracked_persons) if ctx.tracked_persons is not None else 0):
+        label = None
+        for name, mask in (('team1', ctx.team1_mask), ('team2', ctx.team2_mask),
+                           ('referee', ctx.referee_mask), ('goalkeeper', ctx.goalkeeper_mask)):
+            if i < len(mask) and mask[i]:
+                label = name
+        classes.append(label)
+    return classes
+
+
+def reconcile_tracks(
+    previous: Dict[int, FrameContext],
+    current: List[FrameContext],
+    min_iou: float = 0.5
+) -> Tuple[Dict[int, int], bool]:
+    """
+    Empareja los tracks de un tramo con los del anterior en los frames que comparten.
+
+    Args:
+        previous: Registros del tramo anterior por índice de frame (IDs ya globales)
+        current: Registros de calentamiento del tramo actual (IDs locales)
+        min_iou: IoU mínimo para que un par de cajas cuente como coincidencia
+
+    Returns:
+        (mapeo id local -> id global, True si team1/team2 están invertidos)
+    """
+    pair_votes: Dict[Tuple[int, int], int] = {}
+    pair_classes: List[Tuple[int, int, Optional[str], Optional[str]]] = []
+    overlap_frames = 0
+
+    for ctx in current:
+        prev_ctx = previous.get(ctx.index)
+        if prev_ctx is None or ctx.tracked_persons is None or prev_ctx.tracked_persons is None:
+            continue
+        if len(ctx.tracked_persons) == 0 or len(prev_ctx.tracked_persons) == 0:
+            continue
+        if ctx.tracked_persons.tracker_id is None or prev_ctx.tracked_persons.tracker_id is None:
+            continue
+        overlap_frames += 1
+
+        iou = box_iou_matrix(ctx.tracked_persons.xyxy, prev_ctx.tracked_persons.xyxy)
+        rows, cols = linear_sum_assignment(-iou)
+        classes, prev_classes = _person_classes(ctx), _person_classes(prev_ctx)
+        for r, c in zip(rows, cols):
+            if iou[r, c] < min_iou:
+                continue
+            local_id = int(ctx.tracked_persons.tracker_id[r])
+            global_id = int(prev_ctx.tracked_persons.tracker_id[c])
+            pair_votes[(local_id, global_id)] = pair_votes.get((local_id, global_id), 0) + 1
+            pair_classes.append((local_id, global_id, classes[r], prev_classes[c]))
+
+    if not pair_votes:
+        return {}, False
+
+    # Asignación uno a uno que maximiza los frames coincidentes
+    local_ids = sorted({l for l, _ in pair_votes})
+    global_ids = sorted({g for _, g in pair_votes})
+    votes = np.zeros((len(local_ids), len(global_ids)))
+    for (l, g), n in pair_votes.items():
+        votes[local_ids.index(l), global_ids.index(g)] = n
+    rows, cols = linear_sum_assignment(-votes)
+    min_votes = max(1, overlap_frames // 4)
+    mapping = {
+        local_ids[r]: global_ids[c]
+        for r, c in zip(rows, cols) if votes[r, c] >= min_votes
+    }
+
+    # ¿Las etiquetas de equipo de los tracks emparejados están invertidas?
+    agree = swapped = 0
+    for local_id, global_id, label, prev_label in pair_classes:
+        if mapping.get(local_id) != global_id or {label, prev_label} - {'team1', 'team2'}:
+            continue
+        if label == prev_label:
+            agree += 1
+        else:
+            swapped += 1
+
+    return mapping, swapped > agree
+
+
+def _apply_chunk_mapping(records: List[FrameContext], mapping: Dict[int, int], swap_teams: bool):
+    """Reescribe los tracker_id (in-place) y, si corresponde, intercambia team1/team2."""
+    for ctx in records:
+        if ctx.tracked_persons is not None and ctx.tracked_persons.tracker_id is not None:
+            ctx.tracked_persons.tracker_id = np.array(
+                [mapping[int(tid)] for tid in ctx.tracked_persons.tracker_id], dtype=int
+            )
+        if swap_teams:
+            ctx.team1_mask, ctx.team2_mask = ctx.team2_mask, ctx.team1_mask
+            if ctx.radar_points is not None:
+                points = dict(ctx.radar_points)
+                team1, team2 = points.pop('team1', None), points.pop('team2', None)
+                if team2 is not None:
+                    points['team1'] = team2
+                if team1 is not None:
+                    points['team2'] = team1
+                ctx.radar_points = points
+
+
+def process_video_parallel(
+    source_path: str,
+    target_path: str,
+    player_model,
+    ball_model=None,
+    pitch_model=None,
+    conf: float = 0.3,
+    detection_mode: str = "players_and_ball",
+    img_size: int = 640,
+    full_field_approx: bool = False,
+    num_workers: Optional[int] = None,
+    chunk_duration_s: Optional[float] = None,
+    overlap_s: float = 2.0,
+    batch_size: int = 1,
+    detect_every: int = 1,
+    video_backend: str = "opencv",
+    render: bool = True,
+    ball_search: str = "full",
+    ball_search_misses: int = 3,
+    ball_tile_size: int = 640,
+    ball_tile_overlap: float = 0.2,
+    pitch_motion_threshold: float = 0.0,
+    pitch_max_interval: int = 30,
+    target_fps: float = 0.0,
+    img_size_bounds: Tuple[int, int] = (320, 960),
+    team_reverify_every: int = 0,
+    inference_backend: str = "pytorch",
+    precision: str = "fp32"
+) -> Dict:
+    """
+    Procesa un video completo repartiendo tramos de tiempo entre varios procesos.
+
+    Produce el mismo tipo de salida que process_video: un video anotado en
+    `target_path` y `<stem>_stats.json` junto a él.
+
+    Args:
+        source_path: Ruta al video de entrada
+        target_path: Ruta al video de salida
+        player_model: Modelo YOLO (o ruta a sus pesos) para detección de jugadores
+        ball_model: Modelo YOLO (o ruta) para detección de pelota (opcional)
+        pitch_model: Modelo YOLO (o ruta) para detección de campo (opcional)
+        conf: Umbral de confianza para detecciones de personas
+        detection_mode: Modo de detección ('players_only', 'ball_only', 'players_and_ball')
+        img_size: Tamaño de imagen para inferencia
+        full_field_approx: Si True, asume que la imagen completa es el campo (experimental)
+        num_workers: Procesos en paralelo (por defecto, núcleos disponibles)
+        chunk_duration_s: Duración de cada tramo (por defecto, un tramo por worker)
+        overlap_s: Segundos de calentamiento antes de cada tramo (solapamiento con el anterior)
+        batch_size: Frames por inferencia dentro de cada worker
+        detect_every: Corre los detectores 1 de cada N frames (ver process_video)
+        video_backend: E/S de video: 'opencv' o 'ffmpeg'
+        render: Si False se omiten el render y la unión del video; sólo se escribe el JSON de estadísticas
+        ball_search: 'full', 'roi' o 'tiled' (ver process_video)
+        ball_search_misses: Con 'roi', búsquedas sin pelota antes de ampliar al frame completo
+        ball_tile_size: Con 'tiled', lado de cada mosaico en píxeles
+        ball_tile_overlap: Con 'tiled', fracción de solapamiento entre mosaicos
+        pitch_motion_threshold: Movimiento de cámara que fuerza reinferir keypoints (ver process_video)
+        pitch_max_interval: Frames máximos entre dos inferencias de keypoints
+        target_fps: Si > 0, cada worker ajusta la resolución de inferencia para sostener estos
+            frames por segundo (ver process_video)
+        img_size_bounds: Resolución mínima y máxima del ajuste adaptativo
+        team_reverify_every: Frames entre dos clasificaciones por color de un track estable
+            (0 por defecto = desactivado; ver process_video)
+        inference_backend: 'pytorch' u 'onnx' para los modelos dados como pesos .pt
+            (cada worker los carga con load_inference_model)
+        precision: 'fp32' o 'int8' (sólo con backend 'onnx')
+
+    Returns:
+        Dict con el reporte de la ejecución (tramos, tiempos por fase, IDs reconciliados)
+    """
+    wall_start = time.perf_counter()
+    source_path = str(source_path)
+    target_path = str(target_path)
+
+    cap = open_video_reader(source_path, backend=video_backend)
+    if not cap.isOpened():
+        raise RuntimeError(f"No se puede abrir el video fuente: {source_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total_frames <= 0:
+        raise RuntimeError(f"No se pudo determinar el número de frames de: {source_path}")
+
+    num_workers = max(1, num_workers or os.cpu_count() or 1)
+    if chunk_duration_s:
+        chunk_frames = max(1, int(chunk_duration_s * fps))
+    else:
+        chunk_frames = int(np.ceil(total_frames / num_workers))
+    detect_every = max(1, int(detect_every))
+    overlap_frames = max(0, int(overlap_s * fps))
+
+    # Los workers cargan cada modelo con el mismo backend y precisión. Se cargan
+    # una vez aquí para que la exportación ONNX / cuantización INT8 quede en
+    # caché antes de lanzar los procesos (que si no la repetirían en paralelo).
+    model_specs = {
+        name: _model_spec(model, inference_backend, precision, img_size)
+        for name, model in (('player_model', player_model), ('ball_model', ball_model),
+                            ('pitch_model', pitch_model))
+    }
+    parent_player_model = _load_model(model_specs['player_model'])
+    if inference_backend != "pytorch" or precision != "fp32":
+        for name in ('ball_model', 'pitch_model'):
+            _load_model(model_specs[name])
+
+    # Colores de referencia comunes: team1/team2 significan lo mismo en todos los tramos
+    reference_colors = estimate_reference_colors(
+        source_path, parent_player_model, conf, img_size, video_backend
+    )
+    if reference_colors is None:
+        print("⚠️ No se encontraron jugadores para fijar colores de referencia; se reconciliará sólo por solapamiento")
+
+    tasks = []
+    for chunk_index, start in enumerate(range(0, total_frames, chunk_frames)):
+        # Calentamiento alineado con la grilla de detect_every
+        warmup_start = max(0, start - overlap_frames)
+        warmup_start -= warmup_start % detect_every
+        tasks.append({
+            'chunk_index': chunk_index,
+            'source_path': source_path,
+            'warmup_start': warmup_start,
+            'start': start,
+            'end': min(total_frames, start + chunk_frames),
+            **model_specs,
+            'conf': conf,
+            'detection_mode': detection_mode,
+            'img_size': img_size,
+            'full_field_approx': full_field_approx,
+            'batch_size': batch_size,
+            'detect_every': detect_every,
+            'reference_colors': reference_colors,
+            'video_backend': video_backend,
+            'ball_search': ball_search,
+            'ball_search_misses': ball_search_misses,
+            'ball_tile_size': ball_tile_size,
+            'ball_tile_overlap': ball_tile_overlap,
+            'pitch_motion_threshold': pitch_motion_threshold,
+            'pitch_max_interval': pitch_max_interval,
+            'target_fps': target_fps,
+            'img_size_bounds': tuple(img_size_bounds),
+            'team_reverify_every': team_reverify_every,
+        })
+
+    threads_per_worker = max(1, (os.cpu_count() or 1) // num_workers)
+    print(f"🧩 {len(tasks)} tramos de ~{chunk_frames / fps:.0f}s en {num_workers} procesos "
+          f"(solapamiento {overlap_frames / fps:.1f}s)")
+
+    context = multiprocessing.get_context("spawn")
+    chunk_dir = Path(target_path).parent / f"{Path(target_path).stem}_chunks"
+    report = {'chunks': len(tasks), 'workers': num_workers}
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=context,
+        initializer=_init_worker, initargs=(threads_per_worker,)
+    ) as pool:
+        # --- FASE 1: ANÁLISIS ---
+        phase_start = time.perf_counter()
+        results = sorted(pool.map(_analyze_chunk, tasks), key=lambda r: r['chunk_index'])
+        report['analysis_time_s'] = time.perf_counter() - phase_start
+
+        # --- FASE 2: RECONCILIACIÓN DE IDS Y EQUIPOS ---
+        next_global_id = 1
+        previous_records: Dict[int, FrameContext] = {}
+        reconciliation = []
+        for result in results:
+            start = result['start']
+            records = unpack_records(result['records'])
+            warmup = [r for r in records if r.index <= start]
+            owned = [r for r in records if r.index > start]
+
+            mapping, swap_teams = reconcile_tracks(previous_records, warmup) if previous_records else ({}, False)
+            inherited_ids = len(mapping)
+            local_ids = sorted({
+                int(tid) for r in owned
+                if r.tracked_persons is not None and r.tracked_persons.tracker_id is not None
+                for tid in r.tracked_persons.tracker_id
+            })
+            for local_id in local_ids:
+                if local_id not in mapping:
+                    mapping[local_id] = next_global_id
+                next_global_id = max(next_global_id, mapping[local_id] + 1)
+
+            _apply_chunk_mapping(owned, mapping, swap_teams)
+            if swap_teams:
+                result['formations_timeline'] = {
+                    'team1': result['formations_timeline']['team2'],
+                    'team2': result['formations_timeline']['team1'],
+                }
+                result['team1_history'], result['team2_history'] = result['team2_history'], result['team1_history']
+
+            result['records'] = pack_records(owned)
+            previous_records = {r.index: r for r in owned}
+            reconciliation.append({
+                'chunk_index': result['chunk_index'],
+                'inherited_ids': inherited_ids,
+                'teams_swapped': swap_teams,
+            })
+        report['reconciliation'] = reconciliation
+
+        # --- FASE 3: RENDER EN PARALELO ---
+        phase_start = time.perf_counter()
+        render_tasks = []
+        for result in results if render else []:
+            render_tasks.append({
+                'source_path': source_path,
+                'target_path': str(chunk_dir / f"chunk_{result['chunk_index']:04d}.mp4"),
+                'start': result['start'],
+                'records': result['records'],
+                'pitch_model_type': result['pitch_model_type'],
+                'video_backend': video_backend,
+            })
+        if render_tasks:
+            chunk_dir.mkdir(parents=True, exist_ok=True)
+        render_results = list(pool.map(_render_chunk, render_tasks))
+        report['render_time_s'] = time.perf_counter() - phase_start
+
+    # --- FASE 4: UNIÓN DEL VIDEO Y ESTADÍSTICAS ---
+    phase_start = time.perf_counter()
+    if render:
+        concat_videos([t['target_path'] for t in render_tasks], target_path, backend=video_backend)
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+    report['stitch_time_s'] = time.perf_counter() - phase_start
+
+    formations_timeline = {'team1': [], 'team2': []}
+    team1_tracker = TacticalMetricsTracker(history_size=5000)
+    team2_tracker = TacticalMetricsTracker(history_size=5000)
+    for result in results:
+        formations_timeline['team1'].extend(result['formations_timeline']['team1'])
+        formations_timeline['team2'].extend(result['formations_timeline']['team2'])
+        team1_tracker.import_from_dict(result['team1_history'])
+        team2_tracker.import_from_dict(result['team2_history'])
+
+    if render:
+        frames_written = sum(r['frames_written'] for r in render_results)
+    else:
+        frames_written = sum(len(r['records']['index']) for r in results)
+    stats_data = build_match_stats(frames_written, fps, formations_timeline, team1_tracker, team2_tracker)
+    if target_fps > 0:
+        # Cada worker adapta su resolución por separado: un reporte por tramo de video
+        stats_data['inference_resolution'] = {
+            'target_fps': target_fps,
+            'chunks': [
+                dict(r['resolution'], chunk_index=r['chunk_index'])
+                for r in results if r['resolution'] is not None
+            ],
+        }
+    stats_path = Path(target_path).parent / f"{Path(target_path).stem}_stats.json"
+    with open(stats_path, 'w') as f:
+        json.dump(convert_to_native_types(stats_data), f, indent=2)
+    print(f"Estadísticas guardadas en: {stats_path}")
+
+    report['frames'] = frames_written
+    report['wall_time_s'] = time.perf_counter() - wall_start
+    print(
+        f"⏱️ Paralelo: {report['wall_time_s']:.1f}s total | análisis {report['analysis_time_s']:.1f}s | "
+        f"render {report['render_time_s']:.1f}s | unión {report['stitch_time_s']:.1f}s"
+    )
+    gates = [r['pitch_gate'] for r in results if r['pitch_gate']]
+    if gates:
+        report['pitch_inferences'] = sum(g['pitch_inferences'] for g in gates)
+        report['pitch_skipped'] = sum(g['pitch_skipped'] for g in gates)
+        print(f"   Keypoints del campo: {report['pitch_inferences']} inferencias, "
+              f"{report['pitch_skipped']} omitidas por cámara quieta")
+    return report
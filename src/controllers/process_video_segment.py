@@ -2,16 +2,21 @@ import cv2
 import numpy as np
 import supervision as sv
 from typing import Dict, Tuple
-from collections import deque, Counter
+from collections import deque
 from src.controllers.process_video import (
-    extract_color_features,
-    is_in_playing_field,
-    is_in_goal_area,
-    cluster_teams,
-    classify_person_smart
+    GOALKEEPER_CLASS,
+    PERSON_CLASSES,
+    extract_color_features_batch,
+    playing_field_mask,
+    goal_area_mask,
+    team_player_colors,
+    classify_persons_batch
 )
+from src.controllers.team_classification import OnlineTeamColorModel, TrackClassificationCache, TrackVoteStore
 from src.utils.view_transformer import ViewTransformer
 from src.utils.radar import SoccerPitchConfiguration, draw_radar_view
+from src.utils.video_io import AsyncVideoWriter, open_video_reader, open_video_writer
+from src.utils.motion_prediction import TrackMotionPredictor, StrideDriftMonitor
 from ultralytics import YOLO
 
 def process_video_segment(
@@ -24,7 +29,12 @@ def process_video_segment(
     detection_mode: str = "players_and_ball",
     img_size: int = 640,
     start_s: float = 0,
-    duration_s: float = 10
+    duration_s: float = 10,
+    encode_queue_size: int = 8,
+    detect_every: int = 1,
+    drift_audit_every: int = 10,
+    video_backend: str = "opencv",
+    team_reverify_every: int = 0
 ):
     """
     Procesa solo un segmento del video con detección y tracking mejorado usando múltiples modelos.
@@ -40,11 +50,21 @@ def process_video_segment(
         img_size: Tamaño de imagen para inferencia
         start_s: Segundo de inicio del segmento
         duration_s: Duración del segmento en segundos
+        encode_queue_size: Frames pendientes de codificar en el hilo escritor (0 = escritura síncrona)
+        detect_every: Corre los detectores 1 de cada N frames; en los intermedios las cajas
+            se predicen por movimiento a partir de los tracks (1 = detectar todos)
+        drift_audit_every: Con detect_every > 1, detecta además el último frame predicho de
+            cada N intervalos para medir la deriva frente a stride 1 (0 = sin auditoría)
+        video_backend: E/S de video: 'opencv' (cv2, mp4v) o 'ffmpeg' (pipes rawvideo, salida H.264)
+        team_reverify_every: Frames entre dos clasificaciones por color de un track estable;
+            en el resto se reutiliza su etiqueta. 0 (por defecto) = clasificar todos en cada
+            frame. Activarlo (p. ej. 15) es más rápido pero cambia ~1% de las etiquetas y el
+            suavizado (los tracks reutilizados no votan: los 30 votos abarcan más frames)
     """
     source_path = str(source_path)
     target_path = str(target_path)
 
-    cap = cv2.VideoCapture(source_path)
+    cap = open_video_reader(source_path, backend=video_backend)
     if not cap.isOpened():
         raise RuntimeError(f"No se puede abrir el video fuente: {source_path}")
 
@@ -52,15 +72,27 @@ def process_video_segment(
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(target_path, fourcc, fps, (width, height))
+    out = open_video_writer(target_path, fps, (width, height), backend=video_backend)
+    if encode_queue_size > 0:
+        out = AsyncVideoWriter(out, queue_size=encode_queue_size)
 
     start_frame = max(0, int(start_s * fps))
     total_frames = int(duration_s * fps)
 
+    # Detección por saltos (detect_every > 1): cajas predichas en los frames intermedios
+    detect_every = max(1, int(detect_every))
+    person_predictor = TrackMotionPredictor()
+    ball_predictor = TrackMotionPredictor(max_gap=detect_every * 2)
+    drift_monitor = StrideDriftMonitor()
+    frames_detected = 0
+    last_color_update_frame = None
+    last_pitch_keypoints = None
+
     # Trackers modificados: Usar UN solo tracker para personas para mantener consistencia de ID
-    person_tracker = sv.ByteTrack()
-    ball_tracker = sv.ByteTrack()
+    # (con detect_every > 1 sólo ven frames detectados: se escala el buffer de tracks perdidos)
+    lost_track_buffer = max(1, 30 // detect_every)
+    person_tracker = sv.ByteTrack(lost_track_buffer=lost_track_buffer)
+    ball_tracker = sv.ByteTrack(lost_track_buffer=lost_track_buffer)
 
     # Anotadores (mismos que process_video.py)
     team1_annotator = sv.BoxAnnotator(color=sv.Color.from_hex("#00FF00"), thickness=2)
@@ -83,14 +115,15 @@ def process_video_segment(
     team2_colors = None
     frame_count = 0
 
-    # NUEVO: Sistema de tracking de asignación de equipos para consistencia
-    reference_team1_color = None
-    reference_team2_color = None
-    clustering_initialized = False
+    # Colores de los equipos actualizados en línea (el equipo 1 nunca cambia de centroide;
+    # ver OnlineTeamColorModel para el cambio de etiquetas respecto del reajuste con KMeans)
+    team_color_model = OnlineTeamColorModel()
+    TEAM_COLOR_UPDATE_EVERY = 5
     
     # Historial de votos para cada track_id para evitar parpadeos
-    track_history = {}
     HISTORY_LEN = 30
+    track_votes = TrackVoteStore(len(PERSON_CLASSES), HISTORY_LEN)
+    team_cache = TrackClassificationCache(team_reverify_every) if team_reverify_every > 0 else None
 
     # NUEVO: Historial de posiciones para suavizado temporal en radar
     radar_positions_history = {}
@@ -115,188 +148,166 @@ def process_video_segment(
             frame_count += 1
             annotated_frame = frame.copy()
 
-            # --- DETECCIÓN DE JUGADORES ---
-            player_results = player_model.predict(
-                frame,
-                conf=conf,
-                iou=0.3,
-                imgsz=img_size,
-                max_det=100,
-                verbose=False
+            # Frame de detección o de auditoría de deriva (los demás se predicen)
+            gap_position = (frame_count - 1) % detect_every
+            run_detectors = gap_position == 0
+            audit_frame = (
+                not run_detectors
+                and drift_audit_every > 0
+                and gap_position == detect_every - 1
+                and ((frame_count - 1) // detect_every) % drift_audit_every == 0
             )
-            player_detections = sv.Detections.from_ultralytics(player_results[0])
-            
-            # Filtrar solo clase 0 (personas)
-            if player_detections.class_id is not None:
-                player_detections = player_detections[player_detections.class_id == 0]
 
-            # --- DETECCIÓN DE PELOTA MEJORADA ---
+            player_detections = None
             ball_detections = sv.Detections.empty()
-            if detection_mode in ["ball_only", "players_and_ball"]:
-                if ball_model:
-                    # Usar modelo específico de pelota con umbral más bajo
-                    ball_results = ball_model.predict(
-                        frame,
-                        conf=max(0.1, conf * 0.3),  # Bajado de 0.15 a 0.1 (10% mínimo)
-                        iou=0.4,  # Más permisivo (era 0.3)
-                        imgsz=img_size,
-                        verbose=False
-                    )
-                    ball_detections = sv.Detections.from_ultralytics(ball_results[0])
-
-                    # Post-procesamiento: Filtrado por tamaño
-                    if len(ball_detections) > 0:
-                        # Calcular áreas de detecciones
-                        widths = ball_detections.xyxy[:, 2] - ball_detections.xyxy[:, 0]
-                        heights = ball_detections.xyxy[:, 3] - ball_detections.xyxy[:, 1]
-                        areas = widths * heights
-
-                        # Filtrar por tamaño razonable (entre 0.5% y 5% del frame)
-                        max_ball_area = (width * 0.05) * (height * 0.05)
-                        min_ball_area = (width * 0.005) * (height * 0.005)
-                        valid_size = (areas < max_ball_area) & (areas > min_ball_area)
-
-                        ball_detections = ball_detections[valid_size]
-
-                        # Si hay múltiples detecciones, tomar la de mayor confianza
-                        if len(ball_detections) > 1:
-                            best_idx = np.argmax(ball_detections.confidence)
-                            ball_detections = ball_detections[best_idx:best_idx+1]
-                else:
-                    # Fallback: Usar modelo de jugadores si tiene clase 32 (sports ball)
-                    raw_detections = sv.Detections.from_ultralytics(player_results[0])
-                    if raw_detections.class_id is not None:
-                         ball_detections = raw_detections[raw_detections.class_id == 32]
-                         if len(ball_detections) > 0:
-                             # Aplicar mismo umbral más bajo
-                             ball_conf_threshold = max(0.1, conf * 0.3)
-                             ball_detections = ball_detections[ball_detections.confidence >= ball_conf_threshold]
-
-                             # Post-procesamiento por tamaño (igual que modelo específico)
-                             widths = ball_detections.xyxy[:, 2] - ball_detections.xyxy[:, 0]
-                             heights = ball_detections.xyxy[:, 3] - ball_detections.xyxy[:, 1]
-                             areas = widths * heights
-
-                             max_ball_area = (width * 0.05) * (height * 0.05)
-                             min_ball_area = (width * 0.005) * (height * 0.005)
-                             valid_size = (areas < max_ball_area) & (areas > min_ball_area)
-
-                             ball_detections = ball_detections[valid_size]
-
-                             # Tomar mejor detección si hay múltiples
-                             if len(ball_detections) > 1:
-                                 best_idx = np.argmax(ball_detections.confidence)
-                                 ball_detections = ball_detections[best_idx:best_idx+1]
+            if run_detectors or audit_frame:
+                # --- DETECCIÓN DE JUGADORES ---
+                player_results = player_model.predict(
+                    frame,
+                    conf=conf,
+                    iou=0.3,
+                    imgsz=img_size,
+                    max_det=100,
+                    verbose=False
+                )
+                player_detections = sv.Detections.from_ultralytics(player_results[0])
+            
+                # Filtrar solo clase 0 (personas)
+                if player_detections.class_id is not None:
+                    player_detections = player_detections[player_detections.class_id == 0]
+
+                # --- DETECCIÓN DE PELOTA MEJORADA ---
+                if detection_mode in ["ball_only", "players_and_ball"]:
+                    if ball_model:
+                        # Usar modelo específico de pelota con umbral más bajo
+                        ball_results = ball_model.predict(
+                            frame,
+                            conf=max(0.1, conf * 0.3),  # Bajado de 0.15 a 0.1 (10% mínimo)
+                            iou=0.4,  # Más permisivo (era 0.3)
+                            imgsz=img_size,
+                            verbose=False
+                        )
+                        ball_detections = sv.Detections.from_ultralytics(ball_results[0])
+
+                        # Post-procesamiento: Filtrado por tamaño
+                        if len(ball_detections) > 0:
+                            # Calcular áreas de detecciones
+                            widths = ball_detections.xyxy[:, 2] - ball_detections.xyxy[:, 0]
+                            heights = ball_detections.xyxy[:, 3] - ball_detections.xyxy[:, 1]
+                            areas = widths * heights
+
+                            # Filtrar por tamaño razonable (entre 0.5% y 5% del frame)
+                            max_ball_area = (width * 0.05) * (height * 0.05)
+                            min_ball_area = (width * 0.005) * (height * 0.005)
+                            valid_size = (areas < max_ball_area) & (areas > min_ball_area)
+
+                            ball_detections = ball_detections[valid_size]
+
+                            # Si hay múltiples detecciones, tomar la de mayor confianza
+                            if len(ball_detections) > 1:
+                                best_idx = np.argmax(ball_detections.confidence)
+                                ball_detections = ball_detections[best_idx:best_idx+1]
+                    else:
+                        # Fallback: Usar modelo de jugadores si tiene clase 32 (sports ball)
+                        raw_detections = sv.Detections.from_ultralytics(player_results[0])
+                        if raw_detections.class_id is not None:
+                             ball_detections = raw_detections[raw_detections.class_id == 32]
+                             if len(ball_detections) > 0:
+                                 # Aplicar mismo umbral más bajo
+                                 ball_conf_threshold = max(0.1, conf * 0.3)
+                                 ball_detections = ball_detections[ball_detections.confidence >= ball_conf_threshold]
+
+                                 # Post-procesamiento por tamaño (igual que modelo específico)
+                                 widths = ball_detections.xyxy[:, 2] - ball_detections.xyxy[:, 0]
+                                 heights = ball_detections.xyxy[:, 3] - ball_detections.xyxy[:, 1]
+                                 areas = widths * heights
+
+                                 max_ball_area = (width * 0.05) * (height * 0.05)
+                                 min_ball_area = (width * 0.005) * (height * 0.005)
+                                 valid_size = (areas < max_ball_area) & (areas > min_ball_area)
+
+                                 ball_detections = ball_detections[valid_size]
+
+                                 # Tomar mejor detección si hay múltiples
+                                 if len(ball_detections) > 1:
+                                     best_idx = np.argmax(ball_detections.confidence)
+                                     ball_detections = ball_detections[best_idx:best_idx+1]
 
             # --- MEJORA: Tracking PRIMERO ---
-            tracked_persons = person_tracker.update_with_detections(player_detections)
-
-            # Recalcular colores cada 45 frames (mejorado de 30)
-            if (frame_count % 45 == 1 or team1_colors is None) and len(player_detections) > 0:
-                team1_colors_new, team2_colors_new, _, _, _ = cluster_teams(
-                    frame, player_detections, width, height
-                )
+            if run_detectors:
+                frames_detected += 1
+                tracked_persons = person_tracker.update_with_detections(player_detections)
+                person_predictor.update(tracked_persons, frame_count)
+            else:
+                # Frame intermedio: cajas extrapoladas desde la última detección
+                tracked_persons = person_predictor.predict(frame_count, width, height)
+                if audit_frame:
+                    drift_monitor.update(tracked_persons, player_detections)
+
+            # Actualizar el modelo de colores de los equipos (incremental, cada pocos frames)
+            needs_color_update = (
+                not team_color_model.initialized
+                or last_color_update_frame is None
+                or frame_count - last_color_update_frame >= TEAM_COLOR_UPDATE_EVERY
+            )
+            if run_detectors and needs_color_update and len(player_detections) > 0:
+                last_color_update_frame = frame_count
+                shirt_colors, pants_colors = team_player_colors(frame, player_detections, width, height)
+                if team_color_model.update(shirt_colors, pants_colors):
+                    team1_colors, team2_colors = team_color_model.team_colors()
 
-                # NUEVO: Verificar consistencia con colores de referencia
-                if not clustering_initialized:
-                    # Primera inicialización
-                    reference_team1_color = team1_colors_new['shirt'].copy()
-                    reference_team2_color = team2_colors_new['shirt'].copy()
-                    team1_colors = team1_colors_new
-                    team2_colors = team2_colors_new
-                    clustering_initialized = True
-                else:
-                    # Verificar intercambio usando suma de distancias
-                    dist_t1_ref1 = np.linalg.norm(team1_colors_new['shirt'] - reference_team1_color)
-                    dist_t1_ref2 = np.linalg.norm(team1_colors_new['shirt'] - reference_team2_color)
-                    dist_t2_ref1 = np.linalg.norm(team2_colors_new['shirt'] - reference_team1_color)
-                    dist_t2_ref2 = np.linalg.norm(team2_colors_new['shirt'] - reference_team2_color)
-
-                    score_keep = dist_t1_ref1 + dist_t2_ref2
-                    score_swap = dist_t1_ref2 + dist_t2_ref1
-
-                    if score_swap < score_keep:
-                        # INTERCAMBIAR
-                        team1_colors = team2_colors_new
-                        team2_colors = team1_colors_new
-                    else:
-                        # Mantener
-                        team1_colors = team1_colors_new
-                        team2_colors = team2_colors_new
-                    
-                    # Actualizar referencia suavemente
-                    alpha = 0.1
-                    reference_team1_color = (1 - alpha) * reference_team1_color + alpha * team1_colors['shirt']
-                    reference_team2_color = (1 - alpha) * reference_team2_color + alpha * team2_colors['shirt']
-            
             # Clasificar y Votar
-            team1_mask = []
-            team2_mask = []
-            referee_mask = []
-            goalkeeper_mask = []
-            
-            if len(tracked_persons) > 0 and team1_colors is not None:
-                for i, (xyxy, _, _, _, tracker_id, _) in enumerate(tracked_persons):
-                    # 0. Filtrar personas FUERA del campo (Entrenadores, público, etc.)
-                    if not is_in_playing_field(xyxy, width, height):
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(False)
-                        team2_mask.append(False)
-                        referee_mask.append(False)
-                        continue
-
-                    in_goal = is_in_goal_area(xyxy, width, height)
-                    x_center = (xyxy[0] + xyxy[2]) / 2
-                    is_gk = False
-                    
-                    # Ampliado a 12% para cubrir mejor el área chica (igual que process_video.py)
-                    if in_goal and (x_center < width * 0.12 or x_center > width * 0.88):
-                        is_gk = True
-                        current_vote = 'goalkeeper'
-                    else:
-                        person_type, _ = classify_person_smart(
-                            frame, xyxy, team1_colors, team2_colors, width, height
+            num_persons = len(tracked_persons)
+            team1_mask = np.zeros(num_persons, dtype=bool)
+            team2_mask = np.zeros(num_persons, dtype=bool)
+            referee_mask = np.zeros(num_persons, dtype=bool)
+            goalkeeper_mask = np.zeros(num_persons, dtype=bool)
+
+            if num_persons > 0 and team1_colors is not None:
+                # 0. Filtrar personas FUERA del campo (Entrenadores, público, etc.)
+                boxes = tracked_persons.xyxy
+                in_field = playing_field_mask(boxes, width, height)
+                in_goal = in_field & goal_area_mask(boxes, width, height)
+
+                # Voto del frame (código de PERSON_CLASSES, -1 = no vota): portero por
+                # posición; el resto por color (sólo frames detectados)
+                tracker_ids = tracked_persons.tracker_id
+                votes = np.where(in_goal, GOALKEEPER_CLASS, -1)
+                if run_detectors:
+                    candidates = np.flatnonzero(in_field & ~in_goal)
+                    classify_idx = [
+                        i for i in candidates
+                        if team_cache is None or team_cache.needs_classification(
+                            tracker_ids[i], boxes[i], frame_count, track_votes
                         )
-                        current_vote = person_type
-
-                    if tracker_id not in track_history:
-                        track_history[tracker_id] = deque(maxlen=HISTORY_LEN)
-                    
-                    track_history[tracker_id].append(current_vote)
-                    
-                    vote_counts = Counter(track_history[tracker_id])
-                    most_common = vote_counts.most_common(1)[0][0]
-                    
-                    if current_vote == 'goalkeeper':
-                        final_class = 'goalkeeper'
-                    else:
-                        final_class = most_common
-
-                    if final_class == 'goalkeeper':
-                        goalkeeper_mask.append(True)
-                        team1_mask.append(False)
-                        team2_mask.append(False)
-                        referee_mask.append(False)
-                    elif final_class == 'referee':
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(False)
-                        team2_mask.append(False)
-                        referee_mask.append(True)
-                    elif final_class == 'team1':
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(True)
-                        team2_mask.append(False)
-                        referee_mask.append(False)
-                    elif final_class == 'team2':
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(False)
-                        team2_mask.append(True)
-                        referee_mask.append(False)
-                    else:
-                        goalkeeper_mask.append(False)
-                        team1_mask.append(False)
-                        team2_mask.append(False)
-                        referee_mask.append(False)
+                    ]
+                    if team_cache is not None:
+                        # Tracks estables: se reutiliza la etiqueta de su historial
+                        team_cache.mark_reused(len(candidates) - len(classify_idx))
+                    if classify_idx:
+                        features = extract_color_features_batch(frame, boxes[classify_idx])
+                        class_masks = classify_persons_batch(
+                            boxes[classify_idx], features, team1_colors, team2_colors, width, height
+                        )
+                        votes[classify_idx] = np.argmax(np.stack(class_masks, axis=1), axis=1)
+                        if team_cache is not None:
+                            for i in classify_idx:
+                                team_cache.mark_classified(tracker_ids[i], boxes[i], frame_count)
+
+                voted = np.flatnonzero(votes >= 0)
+                track_votes.add(tracker_ids[voted], votes[voted], frame_count)
+
+                # Categoría final: el portero por posición manda; si no, la mayoría del track
+                final_classes = np.where(in_goal, GOALKEEPER_CLASS, track_votes.majority(tracker_ids))
+                final_classes[~in_field] = -1
+                team1_mask, team2_mask, referee_mask, goalkeeper_mask = (
+                    final_classes == code for code in range(len(PERSON_CLASSES))
+                )
+
+            if frame_count % 300 == 0:
+                track_votes.prune(frame_count)
+                if team_cache is not None:
+                    team_cache.prune(frame_count)
 
             # Anotaciones
             if any(team1_mask):
@@ -329,8 +340,16 @@ def process_video_segment(
 
             # Tracking de pelota
             tracked_ball = None # Inicializar
-            if len(ball_detections) > 0:
-                tracked_ball = ball_tracker.update_with_detections(ball_detections)
+            if run_detectors:
+                if len(ball_detections) > 0:
+                    tracked_ball = ball_tracker.update_with_detections(ball_detections)
+                ball_predictor.update(tracked_ball, frame_count)
+            else:
+                predicted_ball = ball_predictor.predict(frame_count, width, height)
+                if len(predicted_ball) > 0:
+                    tracked_ball = predicted_ball
+
+            if tracked_ball is not None:
                 annotated_frame = ball_annotator.annotate(scene=annotated_frame, detections=tracked_ball)
                 ball_labels = ["BALL"] * len(tracked_ball)
                 annotated_frame = ball_label_annotator.annotate(scene=annotated_frame, detections=tracked_ball, labels=ball_labels)
@@ -338,10 +357,16 @@ def process_video_segment(
             # --- RADAR CON SUAVIZADO TEMPORAL ---
             if pitch_model:
                 try:
-                    pitch_results = pitch_model(frame, verbose=False, conf=0.3)[0]
-                    if pitch_results.keypoints is not None and len(pitch_results.keypoints) > 0:
-                        keypoints_xy = pitch_results.keypoints.xy.cpu().numpy()[0]
-                        keypoints_conf = pitch_results.keypoints.conf.cpu().numpy()[0]
+                    if run_detectors or last_pitch_keypoints is None:
+                        pitch_results = pitch_model(frame, verbose=False, conf=0.3)[0]
+                        if pitch_results.keypoints is not None and len(pitch_results.keypoints) > 0:
+                            last_pitch_keypoints = (
+                                pitch_results.keypoints.xy.cpu().numpy()[0],
+                                pitch_results.keypoints.conf.cpu().numpy()[0]
+                            )
+                    # En frames intermedios se reutilizan los keypoints del último frame detectado
+                    if last_pitch_keypoints is not None:
+                        keypoints_xy, keypoints_conf = last_pitch_keypoints
 
                         valid_kp_mask = keypoints_conf > 0.5
                         valid_keypoints = keypoints_xy[valid_kp_mask]
@@ -445,3 +470,28 @@ def process_video_segment(
     finally:
         cap.release()
         out.release()
+
+    if isinstance(out, AsyncVideoWriter):
+        encode = out.get_report()
+        print(
+            f"⏱️ Codificación: {encode['frames_written']} frames | cola máx "
+            f"{encode['max_queue_depth']}/{encode['queue_size']} | análisis bloqueado: "
+            f"{encode['producer_blocked_time_s']:.2f}s"
+        )
+
+    if team_cache is not None:
+        team_report = team_cache.get_report()
+        print(
+            f"⏱️ Equipos por track: {team_report['classified']} clasificaciones por color, "
+            f"{team_report['reused']} etiquetas reutilizadas ({team_report['reuse_rate'] * 100:.0f}%)"
+        )
+
+    if detect_every > 1:
+        print(f"⏱️ Detección cada {detect_every} frames: {frames_detected} detectados, {processed - frames_detected} predichos")
+        drift = drift_monitor.get_report()
+        if drift:
+            print(
+                f"   Deriva vs stride 1 ({drift['audited_frames']} frames auditados): IoU medio "
+                f"{drift['mean_iou']:.2f} | error pies {drift['mean_foot_error_px']:.1f}px | "
+                f"detecciones cubiertas {drift['match_rate'] * 100:.0f}%"
+            )
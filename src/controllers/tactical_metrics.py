@@ -304,6 +304,18 @@ class TacticalMetricsTracker:
             for metric_name, values in self.metrics_history.items()
         }
 
+    def import_from_dict(self, history: Dict):
+        """
+        Agrega al historial datos exportados con export_to_dict (p.ej. de otro
+        tracker que procesó un tramo posterior del video).
+
+        Args:
+            history: Dict con listas de métricas por frame
+        """
+        for metric_name, values in history.items():
+            if metric_name in self.metrics_history:
+                self.metrics_history[metric_name].extend(values)
+
     def export_to_arrays(self) -> Dict[str, np.ndarray]:
         """
         Exporta historial como arrays de NumPy (para gráficos).
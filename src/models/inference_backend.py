@@ -0,0 +1,268 @@
+"""
+Backends de inferencia para los modelos YOLO (jugadores, pelota y keypoints del campo).
+
+- 'pytorch': ultralytics.YOLO tal cual.
+- 'onnx': el modelo se exporta una sola vez a ONNX (cacheado por hash de los
+  pesos y tamaño de imagen) y se ejecuta con onnxruntime sobre los providers
+  que detecta HardwareDetector. Con precision='int8' se usa la variante
+  cuantizada (ver src/models/quantization.py).
+
+OnnxYOLO expone la parte de la interfaz de YOLO que usa el pipeline
+(`predict`, `__call__`, `names`, `task`) y devuelve objetos Results de
+ultralytics, así que `sv.Detections.from_ultralytics` y la lectura de
+keypoints de process_video no cambian.
+"""
+
+import ast
+import hashlib
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+from ultralytics.data.augment import LetterBox
+from ultralytics.engine.results import Results
+from ultralytics.utils import ops
+
+try:
+    from ultralytics.utils.nms import non_max_suppression
+except ImportError:  # ultralytics < 8.3.x
+    from ultralytics.utils.ops import non_max_suppression
+
+from src.utils.hardware_detector import get_onnx_providers
+
+INFERENCE_BACKENDS = ("pytorch", "onnx")
+PRECISIONS = ("fp32", "int8")
+ONNX_CACHE_DIR = Path("models") / "onnx_cache"
+
+
+def weights_hash(weights_path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """Hash (sha1, 16 caracteres) del contenido de un archivo de pesos."""
+    digest = hashlib.sha1()
+    with open(weights_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+
+
+def cached_weights_hash(weights_path: Union[str, Path]) -> str:
+    """weights_hash memorizado por ruta, tamaño y fecha de modificación del archivo."""
+    path = Path(weights_path)
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _hash_memo:
+        _hash_memo[memo_key] = weights_hash(path)
+    return _hash_memo[memo_key]
+
+
+def export_onnx(
+    weights_path: Union[str, Path],
+    img_size: int = 640,
+    cache_dir: Union[str, Path] = ONNX_CACHE_DIR
+) -> Path:
+    """
+    Exporta un modelo .pt a ONNX (con ejes dinámicos de batch y tamaño) o
+    reutiliza la exportación cacheada para esos mismos pesos.
+
+    Returns:
+        Ruta al archivo .onnx cacheado
+    """
+    weights_path = Path(weights_path)
+    cache_dir = Path(cache_dir)
+    onnx_path = cache_dir / f"{weights_path.stem}_{weights_hash(weights_path)}_{img_size}.onnx"
+    if onnx_path.exists():
+        return onnx_path
+
+    print(f"📦 Exportando {weights_path.name} a ONNX (imgsz={img_size})...")
+    exported = YOLO(str(weights_path)).export(format="onnx", imgsz=img_size, dynamic=True, verbose=False)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(exported), onnx_path)
+    print(f"✅ Modelo ONNX cacheado en: {onnx_path}")
+    return onnx_path
+
+
+def preprocess_frames(frames: List[np.ndarray], new_shape, stride: int = 32, minimal_padding: bool = True) -> np.ndarray:
+    """
+    Letterbox + BGR→RGB + NCHW float32 en [0, 1], igual que los predictores de ultralytics.
+
+    Args:
+        frames: Frames BGR
+        new_shape: Tamaño de entrada (int o (alto, ancho))
+        stride: Stride del modelo (múltiplo del padding mínimo)
+        minimal_padding: Si True y todos los frames miden lo mismo, rellena sólo
+            hasta el múltiplo de `stride` (requiere un modelo con ejes dinámicos)
+    """
+    same_shapes = len({frame.shape for frame in frames}) == 1
+    letterbox = LetterBox(new_shape, auto=same_shapes and minimal_padding, stride=stride)
+    batch = np.stack([letterbox(image=frame) for frame in frames])
+    return np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+
+class OnnxYOLO:
+    """
+    Modelo YOLO exportado a ONNX ejecutado con onnxruntime.
+
+    Replica el pre y post-procesamiento de los predictores de ultralytics
+    (letterbox, NMS y reescalado de cajas y keypoints a la imagen original)
+    para modelos de detección y de pose (keypoints del campo).
+
+    Es serializable con pickle (sólo guarda la ruta y los providers); la
+    sesión se vuelve a crear en el proceso destino.
+    """
+
+    def __init__(
+        self,
+        onnx_path: Union[str, Path],
+        providers: Optional[List[str]] = None,
+        intra_op_threads: Optional[int] = None
+    ):
+        """
+        Args:
+            onnx_path: Ruta al modelo exportado por ultralytics
+            providers: Providers de onnxruntime (por defecto, los de HardwareDetector)
+            intra_op_threads: Hilos por operador (por defecto, los mismos que torch)
+        """
+        self.onnx_path = str(onnx_path)
+        self.providers = list(providers) if providers else get_onnx_providers()
+        self.intra_op_threads = intra_op_threads
+        self._create_session()
+
+    def _create_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.intra_op_threads or torch.get_num_threads()
+
+        # Sólo los providers que esta instalación de onnxruntime soporta
+        available = set(ort.get_available_providers())
+        providers = [p for p in self.providers if p in available] or ['CPUExecutionProvider']
+        self.session = ort.InferenceSession(self.onnx_path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+        # Metadatos que ultralytics guarda al exportar (todos como texto)
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names: Dict[int, str] = ast.literal_eval(metadata.get('names', '{}'))
+        self.task = metadata.get('task', 'detect')
+        self.stride = int(ast.literal_eval(metadata.get('stride', '32')))
+        self.imgsz = ast.literal_eval(metadata.get('imgsz', '[640, 640]'))
+        self.kpt_shape = ast.literal_eval(metadata['kpt_shape']) if 'kpt_shape' in metadata else None
+        self.end2end = metadata.get('end2end', 'False') == 'True'
+        self.dynamic = isinstance(self.session.get_inputs()[0].shape[2], str)
+
+    def __getstate__(self):
+        return {
+            'onnx_path': self.onnx_path,
+            'providers': self.providers,
+            'intra_op_threads': self.intra_op_threads,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._create_session()
+
+    def __call__(self, source, **kwargs) -> List[Results]:
+        return self.predict(source, **kwargs)
+
+    def predict(
+        self,
+        source,
+        conf: float = 0.25,
+        iou: float = 0.7,
+        imgsz: Optional[int] = None,
+        max_det: int = 300,
+        verbose: bool = False,
+        **kwargs
+    ) -> List[Results]:
+        """
+        Inferencia sobre un frame BGR o una lista de frames (un solo batch).
+
+        Returns:
+            Lista de Results de ultralytics, uno por frame
+        """
+        frames = source if isinstance(source, list) else [source]
+        if not frames:
+            return []
+
+        # Con ejes dinámicos se respeta imgsz y se usa padding mínimo (como con .pt)
+        new_shape = (imgsz or self.imgsz) if self.dynamic else self.imgsz
+        batch = preprocess_frames(frames, new_shape, stride=self.stride, minimal_padding=self.dynamic)
+
+        preds = self.session.run(None, {self.input_name: batch})[0]
+
+        nms_kwargs = {'end2end': True} if self.end2end else {}
+        detections = non_max_suppression(
+            torch.from_numpy(preds),
+            conf,
+            iou,
+            max_det=max_det,
+            nc=0 if self.task == 'detect' else len(self.names),
+            **nms_kwargs
+        )
+
+        input_shape = batch.shape[2:]
+        results = []
+        for frame, pred in zip(frames, detections):
+            pred[:, :4] = ops.scale_boxes(input_shape, pred[:, :4], frame.shape)
+            keypoints = None
+            if self.kpt_shape is not None:
+                keypoints = pred[:, 6:].view(pred.shape[0], *self.kpt_shape)
+                keypoints = ops.scale_coords(input_shape, keypoints, frame.shape)
+            results.append(Results(frame, path="", names=self.names, boxes=pred[:, :6], keypoints=keypoints))
+        return results
+
+
+def load_inference_model(
+    weights_path: Union[str, Path],
+    backend: str = "pytorch",
+    img_size: int = 640,
+    cache_dir: Union[str, Path] = ONNX_CACHE_DIR,
+    precision: str = "fp32"
+):
+    """
+    Carga un modelo YOLO con el backend de inferencia indicado.
+
+    Con backend 'onnx', si onnxruntime no está instalado o la exportación
+    falla, se avisa y se usa PyTorch.
+
+    Args:
+        weights_path: Pesos .pt (o nombre de modelo de ultralytics, p.ej. 'yolov8m.pt')
+        backend: 'pytorch' u 'onnx'
+        img_size: Tamaño de imagen para la exportación ONNX
+        cache_dir: Directorio donde se cachean los modelos exportados
+        precision: 'fp32' o 'int8' (cuantizado con frames de inputs/; implica
+            backend 'onnx' y, si la cuantización falla, se usa FP32)
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Backend de inferencia desconocido: {backend} (opciones: {', '.join(INFERENCE_BACKENDS)})")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Precisión desconocida: {precision} (opciones: {', '.join(PRECISIONS)})")
+    if precision == "int8":
+        backend = "onnx"
+
+    if backend == "onnx":
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            print("⚠️ onnxruntime no está instalado, usando PyTorch")
+            return YOLO(str(weights_path))
+        try:
+            if not Path(weights_path).exists():
+                # Nombre de modelo de ultralytics: se descarga con YOLO y se usa su ruta
+                weights_path = YOLO(str(weights_path)).ckpt_path
+            if precision == "int8":
+                try:
+                    from src.models.quantization import quantize_model_int8
+                    return OnnxYOLO(quantize_model_int8(weights_path, img_size=img_size, cache_dir=cache_dir))
+                except Exception as e:
+                    print(f"⚠️ No se pudo cuantizar {weights_path} a INT8 ({e}), usando FP32")
+            return OnnxYOLO(export_onnx(weights_path, img_size=img_size, cache_dir=cache_dir))
+        except Exception as e:
+            print(f"⚠️ No se pudo usar ONNX para {weights_path} ({e}), usando PyTorch")
+
+    return YOLO(str(weights_path))
@@ -1,8 +1,8 @@
-import streamlit as st
-from ultralytics import YOLO
 from pathlib import Path
 import os
 
+from src.models.model_pool import get_model_pool
+
 
 # Modelos YOLOv8 pre-entrenados disponibles
 # Para futbol, usaremos modelos YOLOv8 generales entrenados en COCO
@@ -28,8 +28,7 @@ ROBOFLOW_MODELS_INFO = {
 }
 
 
-@st.cache_resource
-def load_roboflow_model(model_type: str = "yolov8m"):
+def load_roboflow_model(model_type: str = "yolov8m", precision: str = "fp32"):
     """
     Carga modelos YOLO para detección de jugadores y objetos deportivos.
 
@@ -38,9 +37,10 @@ def load_roboflow_model(model_type: str = "yolov8m"):
 
     Args:
         model_type: Tipo de modelo YOLO ('yolov8n', 'yolov8s', 'yolov8m', 'yolov8l', 'yolov8x')
+        precision: 'fp32' (PyTorch) o 'int8' (ONNX cuantizado para CPU)
 
     Returns:
-        Modelo YOLO cargado
+        Modelo YOLO cargado (OnnxYOLO si precision='int8')
 
     Note:
         - Clase 0: person (jugadores, árbitros)
@@ -54,10 +54,24 @@ def load_roboflow_model(model_type: str = "yolov8m"):
     print(f"Cargando modelo {model_name}...")
 
     # YOLO descargará automáticamente el modelo si no existe
-    return YOLO(model_name)
+    backend = "onnx" if precision == "int8" else "pytorch"
+    return get_model_pool().get(model_name, backend=backend, precision=precision)
 
 
-@st.cache_resource
 def load_model(name: str):
     """Carga y cachea el modelo YOLO indicado por nombre (legacy support)."""
-    return YOLO(name)
\ No newline at end of file
+    return get_model_pool().get(name)
+
+
+def load_model_with_backend(weights_path: str, backend: str = "pytorch", img_size: int = 640, precision: str = "fp32"):
+    """
+    Carga y cachea un modelo YOLO con el backend de inferencia indicado.
+
+    Con backend 'onnx' el modelo se exporta una vez (cache en models/onnx_cache)
+    y se ejecuta con onnxruntime sobre los providers detectados. Con
+    precision='int8' se usa la variante cuantizada, calibrada con inputs/.
+
+    Los modelos se comparten entre sesiones en el pool del proceso (LRU
+    acotado por memoria; ver src/models/model_pool.py).
+    """
+    return get_model_pool().get(weights_path, backend=backend, precision=precision, img_size=img_size)
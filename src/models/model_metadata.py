@@ -0,0 +1,95 @@
+"""
+Caché persistente de metadatos de modelos (por hash de los pesos).
+
+Al iniciar cada análisis se necesitan datos que dependen sólo de los pesos:
+cantidad de keypoints y tipo del modelo de campo (que se obtienen con una
+inferencia de prueba) y los IDs de clase de personas y pelota. Se calculan
+una vez por archivo de pesos y se guardan en `models/model_metadata.json`;
+los trabajos siguientes (y los workers de process_video_parallel) arrancan
+sin inferencia de prueba.
+
+Los modelos sin archivo de pesos asociado se inspeccionan cada vez.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from src.models.inference_backend import cached_weights_hash
+
+MODEL_METADATA_CACHE = Path("models") / "model_metadata.json"
+METADATA_VERSION = 1
+
+_lock = threading.Lock()
+
+
+def model_weights_path(model) -> Optional[Path]:
+    """Archivo de pesos de un modelo YOLO (ckpt_path) u OnnxYOLO (onnx_path), si existe."""
+    path = getattr(model, 'ckpt_path', None) or getattr(model, 'onnx_path', None)
+    if not path or not os.path.isfile(str(path)):
+        return None
+    return Path(path)
+
+
+def _model_key(model) -> Optional[str]:
+    """Hash de los pesos del modelo (None si no tiene archivo de pesos)."""
+    path = model_weights_path(model)
+    return cached_weights_hash(path) if path is not None else None
+
+
+def _read_cache(cache_path: Path) -> Dict:
+    if not cache_path.exists():
+        return {}
+    try:
+        with open(cache_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != METADATA_VERSION:
+        return {}
+    return data.get('models', {})
+
+
+def cached_model_metadata(
+    model,
+    field: str,
+    compute: Callable[[], Any],
+    cache_path: Path = MODEL_METADATA_CACHE
+) -> Any:
+    """
+    Devuelve el metadato `field` del modelo, calculándolo con `compute()` sólo
+    si no está en la caché para esos pesos.
+
+    Args:
+        model: Modelo YOLO u OnnxYOLO
+        field: Nombre del metadato (p.ej. 'pitch', 'player_classes')
+        compute: Función que calcula el valor (debe ser serializable a JSON)
+        cache_path: Archivo JSON de la caché
+    """
+    key = _model_key(model)
+    if key is None:
+        return compute()
+
+    cache_path = Path(cache_path)
+    with _lock:
+        entry = _read_cache(cache_path).get(key, {})
+    if field in entry:
+        return entry[field]
+
+    value = compute()
+    with _lock:
+        # Releer antes de escribir: otros procesos pueden haber agregado modelos
+        models = _read_cache(cache_path)
+        models.setdefault(key, {})[field] = value
+        models[key]['weights'] = model_weights_path(model).name
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': METADATA_VERSION, 'models': models}, f, indent=2)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la caché de metadatos de modelos ({e})")
+    return value
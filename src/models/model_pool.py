@@ -0,0 +1,226 @@
+"""
+Pool de modelos compartido por todas las sesiones de la app.
+
+Streamlit vuelve a ejecutar app.py en cada interacción; sin caché, cada clic
+recargaba los modelos (~50 MB cada uno). ModelPool guarda los modelos
+cargados en el proceso, indexados por ruta, hash de los pesos, backend,
+precisión y tamaño de imagen, con desalojo LRU cuando se supera un
+presupuesto de memoria, y registra tiempos de carga, aciertos y desalojos.
+
+Es seguro usarlo desde varias sesiones a la vez: dos pedidos simultáneos del
+mismo modelo lo cargan una sola vez, y como el predictor de ultralytics
+guarda estado por instancia y no es thread-safe, el pool entrega el modelo
+envuelto en un PooledModel que serializa las inferencias sobre la misma
+instancia (una sesión espera mientras otra infiere con ese modelo).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.models.inference_backend import cached_weights_hash, load_inference_model
+
+# Presupuesto de memoria por defecto (MB); se puede ajustar con MODEL_POOL_BUDGET_MB
+DEFAULT_BUDGET_MB = float(os.environ.get("MODEL_POOL_BUDGET_MB", 2048))
+
+
+def estimate_model_bytes(model, weights_path: Optional[str] = None) -> int:
+    """
+    Memoria aproximada del modelo: tamaño de los tensores de PyTorch, o del
+    archivo .onnx / de pesos si no se puede inspeccionar.
+    """
+    torch_model = getattr(model, 'model', None)
+    if hasattr(torch_model, 'parameters'):
+        tensors = list(torch_model.parameters()) + list(torch_model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    for path in (getattr(model, 'onnx_path', None), weights_path):
+        if path and os.path.isfile(str(path)):
+            return os.path.getsize(str(path))
+    return 0
+
+
+def _unpooled(model):
+    """Reconstrucción de un PooledModel serializado: el modelo sin envolver."""
+    return model
+
+
+class PooledModel:
+    """
+    Modelo compartido del pool: delega todo en el modelo cargado y ejecuta
+    `predict` / `__call__` con el lock de la entrada (una inferencia a la vez).
+
+    Al serializarse con pickle (p. ej. para los workers de process_video_parallel)
+    se envía el modelo subyacente: en otro proceso no hay nada que compartir.
+    """
+
+    def __init__(self, model, lock: threading.RLock):
+        object.__setattr__(self, '_model', model)
+        object.__setattr__(self, '_inference_lock', lock)
+
+    def predict(self, *args, **kwargs):
+        with self._inference_lock:
+            return self._model.predict(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        with self._inference_lock:
+            return self._model(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._model, name, value)
+
+    def __reduce__(self):
+        return _unpooled, (self._model,)
+
+    def __repr__(self) -> str:
+        return f"PooledModel({self._model!r})"
+
+
+class _PoolEntry:
+    def __init__(self, model, size_bytes: int, load_time_s: float):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.load_time_s = load_time_s
+        self.hits = 0
+        # RLock: YOLO.__call__ llama a predict sobre la misma instancia
+        self.pooled = PooledModel(model, threading.RLock())
+
+
+class ModelPool:
+    """Caché LRU de modelos cargados, acotada por memoria."""
+
+    def __init__(self, budget_mb: float = DEFAULT_BUDGET_MB):
+        """
+        Args:
+            budget_mb: Memoria máxima estimada de los modelos retenidos (MB). El
+                modelo más reciente se retiene siempre, aunque lo supere.
+        """
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._entries: "OrderedDict[Tuple, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[Tuple, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time_s = 0.0
+
+    def _key(self, weights_path: str, backend: str, precision: str, img_size: int) -> Tuple:
+        path = Path(weights_path)
+        if path.is_file():
+            # Mismo archivo sobrescrito con otros pesos (p.ej. modelo subido de nuevo) = otra entrada
+            return (str(path.resolve()), cached_weights_hash(path), backend, precision, img_size)
+        # Nombre de modelo de ultralytics que todavía no se descargó
+        return (str(weights_path), None, backend, precision, img_size)
+
+    def get(self, weights_path: str, backend: str = "pytorch", precision: str = "fp32", img_size: int = 640):
+        """
+        Devuelve el modelo del pool o lo carga (con load_inference_model).
+
+        El modelo se entrega como PooledModel: las sesiones que comparten la
+        instancia hacen sus inferencias de a una.
+
+        Args:
+            weights_path: Pesos .pt o nombre de modelo de ultralytics
+            backend: 'pytorch' u 'onnx'
+            precision: 'fp32' o 'int8'
+            img_size: Tamaño de imagen de la exportación ONNX
+        """
+        key = self._key(str(weights_path), backend, precision, img_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                self.hits += 1
+                return entry.pooled
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Se carga fuera del lock global: otras sesiones pueden usar el pool mientras tanto
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    # Otra sesión lo cargó mientras esperábamos
+                    self._entries.move_to_end(key)
+                    entry.hits += 1
+                    self.hits += 1
+                    return entry.pooled
+
+            start = time.perf_counter()
+            try:
+                model = load_inference_model(weights_path, backend=backend, img_size=img_size, precision=precision)
+            except Exception:
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+            load_time = time.perf_counter() - start
+            entry = _PoolEntry(model, estimate_model_bytes(model, str(weights_path)), load_time)
+            print(f"📦 Modelo cargado en el pool: {Path(str(weights_path)).name} ({backend}/{precision}) "
+                  f"en {load_time:.1f}s, ~{entry.size_bytes / 1024 ** 2:.0f} MB")
+
+            with self._lock:
+                self.misses += 1
+                self.load_time_s += load_time
+                # Los modelos de ultralytics se descargan al cargarlos: desde ahora tienen hash
+                self._entries[self._key(str(weights_path), backend, precision, img_size)] = entry
+                self._loading.pop(key, None)
+                self._evict()
+        return entry.pooled
+
+    def _evict(self):
+        """Desaloja los modelos menos usados recientemente hasta entrar en el presupuesto."""
+        while len(self._entries) > 1 and self.memory_bytes() > self.budget_bytes:
+            key, entry = self._entries.popitem(last=False)
+            self.evictions += 1
+            print(f"♻️ Modelo desalojado del pool: {Path(key[0]).name} (~{entry.size_bytes / 1024 ** 2:.0f} MB)")
+
+    def memory_bytes(self) -> int:
+        """Memoria estimada de los modelos retenidos."""
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def clear(self):
+        """Vacía el pool."""
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+
+    def get_report(self) -> Dict:
+        """Métricas del pool: modelos retenidos, memoria, aciertos, cargas y desalojos."""
+        with self._lock:
+            return {
+                'models': [
+                    {
+                        'weights': Path(key[0]).name,
+                        'backend': key[2],
+                        'precision': key[3],
+                        'size_mb': entry.size_bytes / 1024 ** 2,
+                        'load_time_s': entry.load_time_s,
+                        'hits': entry.hits,
+                    }
+                    for key, entry in self._entries.items()
+                ],
+                'memory_mb': self.memory_bytes() / 1024 ** 2,
+                'budget_mb': self.budget_bytes / 1024 ** 2,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'load_time_s': self.load_time_s,
+            }
+
+
+_pool: Optional[ModelPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """Pool único del proceso (compartido por todas las sesiones)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool()
+        return _pool
@@ -0,0 +1,191 @@
+"""
+Cuantización INT8 de los modelos YOLO para inferencia en CPU.
+
+El modelo se exporta a ONNX (FP32, ver inference_backend.export_onnx) y se
+cuantiza de forma estática con onnxruntime: pesos INT8 por canal y
+activaciones UINT8 calibradas con frames de los videos locales (inputs/),
+de modo que los rangos reflejen el césped, las camisetas y la iluminación
+reales de los partidos. El decodificado de la cabeza (DFL, concatenaciones
+y sigmoides que generan cajas y keypoints en píxeles) queda en FP32: es
+barato y es donde la cuantización más degrada la precisión.
+
+Los modelos cuantizados se cachean junto a los ONNX como
+`<stem>_<hash>_<img>_int8.onnx` y se cargan con OnnxYOLO.
+"""
+
+import re
+from pathlib import Path
+from typing import List, Optional, Union
+
+import cv2
+import numpy as np
+
+from src.models.inference_backend import ONNX_CACHE_DIR, export_onnx, preprocess_frames
+
+INPUTS_DIR = Path("inputs")
+VIDEO_EXTENSIONS = ("*.mp4", "*.mov", "*.avi", "*.mkv")
+CALIBRATION_FRAMES = 64
+
+
+def find_calibration_videos(inputs_dir: Union[str, Path] = INPUTS_DIR) -> List[Path]:
+    """Videos locales disponibles para calibrar (por defecto, los de inputs/)."""
+    inputs_dir = Path(inputs_dir)
+    videos = []
+    for pattern in VIDEO_EXTENSIONS:
+        videos.extend(sorted(inputs_dir.glob(pattern)))
+    return videos
+
+
+def calibration_frame_indices(total_frames: int, per_video: int) -> np.ndarray:
+    """Índices de los frames de calibración de un video de `total_frames` frames."""
+    return np.linspace(0, total_frames - 1, per_video, dtype=int)
+
+
+def read_video_frames(video_path: Union[str, Path], frame_indices) -> List[np.ndarray]:
+    """Lee los frames indicados de un video (se omiten los que no se pueden leer)."""
+    cap = cv2.VideoCapture(str(video_path))
+    frames = []
+    for frame_idx in frame_indices:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_idx))
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def video_frame_count(video_path: Union[str, Path]) -> int:
+    """Cantidad de frames de un video según su contenedor (0 si no se puede abrir)."""
+    cap = cv2.VideoCapture(str(video_path))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(0, total)
+
+
+def sample_calibration_frames(
+    video_paths: Optional[List[Union[str, Path]]] = None,
+    num_frames: int = CALIBRATION_FRAMES
+) -> List[np.ndarray]:
+    """
+    Toma `num_frames` frames repartidos uniformemente entre los videos dados.
+
+    Args:
+        video_paths: Videos de calibración (por defecto, los de inputs/)
+        num_frames: Cantidad total de frames
+
+    Returns:
+        Lista de frames BGR
+    """
+    video_paths = [Path(p) for p in video_paths] if video_paths else find_calibration_videos()
+    if not video_paths:
+        raise FileNotFoundError(f"No hay videos para calibrar en {INPUTS_DIR}/")
+
+    per_video = max(1, num_frames // len(video_paths))
+    frames = []
+    for video_path in video_paths:
+        total = video_frame_count(video_path)
+        if total > 0:
+            frames.extend(read_video_frames(video_path, calibration_frame_indices(total, per_video)))
+
+    if not frames:
+        raise RuntimeError("No se pudo leer ningún frame de los videos de calibración")
+    return frames[:num_frames]
+
+
+def _head_decode_nodes(model) -> List[str]:
+    """
+    Nodos de decodificado de la cabeza (último bloque `/model.N/` del grafo
+    exportado por ultralytics), excepto sus convoluciones.
+    """
+    blocks = [re.match(r"^/model\.(\d+)/", node.name) for node in model.graph.node]
+    indices = [int(m.group(1)) for m in blocks if m]
+    if not indices:
+        return []
+    head_prefix = f"/model.{max(indices)}/"
+    return [node.name for node in model.graph.node
+            if node.name.startswith(head_prefix) and node.op_type != "Conv"]
+
+
+def quantize_model_int8(
+    weights_path: Union[str, Path],
+    calibration_videos: Optional[List[Union[str, Path]]] = None,
+    num_frames: int = CALIBRATION_FRAMES,
+    img_size: int = 640,
+    cache_dir: Union[str, Path] = ONNX_CACHE_DIR
+) -> Path:
+    """
+    Genera (o reutiliza) la variante INT8 de un modelo .pt.
+
+    Args:
+        weights_path: Pesos .pt del modelo
+        calibration_videos: Videos para calibrar (por defecto, los de inputs/)
+        num_frames: Frames de calibración
+        img_size: Tamaño de imagen de la exportación y de la calibración
+        cache_dir: Directorio de caché de los modelos ONNX
+
+    Returns:
+        Ruta al modelo .onnx cuantizado
+    """
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    fp32_path = export_onnx(weights_path, img_size=img_size, cache_dir=cache_dir)
+    int8_path = fp32_path.with_name(f"{fp32_path.stem}_int8.onnx")
+    if int8_path.exists():
+        return int8_path
+
+    frames = sample_calibration_frames(calibration_videos, num_frames=num_frames)
+    print(f"📦 Cuantizando {Path(weights_path).name} a INT8 ({len(frames)} frames de calibración)...")
+
+    model = onnx.load(str(fp32_path))
+    input_name = model.graph.input[0].name
+    exclude = _head_decode_nodes(model)
+
+    class _FrameReader(CalibrationDataReader):
+        """Entrega los frames de a uno, con el mismo preprocesado que OnnxYOLO."""
+
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            return {input_name: preprocess_frames([frame], img_size, minimal_padding=False)}
+
+    preprocessed_path = fp32_path.with_name(f"{fp32_path.stem}_preq.onnx")
+    try:
+        # Plegado de constantes e inferencia de formas antes de calibrar
+        quant_pre_process(str(fp32_path), str(preprocessed_path), skip_symbolic_shape=True)
+        source = preprocessed_path
+    except Exception as e:
+        print(f"⚠️ Preprocesado para cuantización falló ({e}); se cuantiza el modelo exportado")
+        source = fp32_path
+
+    try:
+        quantize_static(
+            str(source),
+            str(int8_path),
+            _FrameReader(),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            nodes_to_exclude=exclude,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+    finally:
+        if preprocessed_path.exists():
+            preprocessed_path.unlink()
+
+    # ultralytics guarda names/task/stride/kpt_shape como metadatos; se conservan
+    quantized = onnx.load(str(int8_path))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, str(int8_path))
+
+    print(f"✅ Modelo INT8 cacheado en: {int8_path}")
+    return int8_path
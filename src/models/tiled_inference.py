@@ -0,0 +1,105 @@
+"""
+Inferencia por mosaicos (tiles) para objetos pequeños como la pelota.
+
+A imgsz=640 un frame de 1280x720 se reduce a la mitad y la pelota queda en
+unos pocos píxeles. Aquí el frame se divide en mosaicos solapados de
+`tile_size` píxeles que se infieren a resolución nativa, todos (de todos los
+frames del lote) en una sola llamada al modelo; las detecciones se llevan a
+coordenadas del frame y se unen con NMS para eliminar los duplicados en los
+bordes entre mosaicos.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import supervision as sv
+
+
+class TiledInference:
+    """
+    Envuelve un modelo YOLO (o OnnxYOLO) para inferir por mosaicos.
+
+    La geometría de los mosaicos depende sólo de la resolución del frame, así
+    que se calcula una vez por resolución y se reutiliza en cada frame.
+    """
+
+    def __init__(self, model, tile_size: int = 640, overlap: float = 0.2, nms_iou: float = 0.5):
+        """
+        Args:
+            model: Modelo con `predict(frames, imgsz=..., ...)` que devuelve Results
+            tile_size: Lado de cada mosaico en píxeles (múltiplo de 32)
+            overlap: Fracción de solapamiento entre mosaicos vecinos (0 a <1)
+            nms_iou: IoU de NMS para unir detecciones repetidas entre mosaicos
+        """
+        if not 0 <= overlap < 1:
+            raise ValueError(f"overlap debe estar en [0, 1): {overlap}")
+        self.model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.nms_iou = nms_iou
+        self._tile_cache: Dict[Tuple[int, int], np.ndarray] = {}
+
+    @staticmethod
+    def _axis_starts(length: int, tile: int, overlap: float) -> List[int]:
+        """Inicios de los mosaicos sobre un eje, repartidos para cubrirlo entero."""
+        if length <= tile:
+            return [0]
+        step = tile * (1 - overlap)
+        count = int(np.ceil((length - tile) / step)) + 1
+        return [int(round(s)) for s in np.linspace(0, length - tile, count)]
+
+    def tiles(self, width: int, height: int) -> np.ndarray:
+        """Mosaicos (N, 4) en xyxy para un frame de `width` x `height` (cacheados)."""
+        key = (width, height)
+        if key not in self._tile_cache:
+            tile_w = min(self.tile_size, width)
+            tile_h = min(self.tile_size, height)
+            self._tile_cache[key] = np.array([
+                [x, y, x + tile_w, y + tile_h]
+                for y in self._axis_starts(height, tile_h, self.overlap)
+                for x in self._axis_starts(width, tile_w, self.overlap)
+            ], dtype=int)
+        return self._tile_cache[key]
+
+    def predict(self, frames: List[np.ndarray], **predict_kwargs) -> List[sv.Detections]:
+        """
+        Infiere todos los mosaicos de todos los frames en una sola llamada.
+
+        Args:
+            frames: Frames BGR
+            **predict_kwargs: Argumentos de `model.predict` (conf, iou, verbose...)
+
+        Returns:
+            Detecciones por frame, en coordenadas del frame completo
+        """
+        crops = []
+        offsets = []
+        owners = []
+        for frame_idx, frame in enumerate(frames):
+            for x1, y1, x2, y2 in self.tiles(frame.shape[1], frame.shape[0]):
+                crops.append(np.ascontiguousarray(frame[y1:y2, x1:x2]))
+                offsets.append((x1, y1))
+                owners.append(frame_idx)
+        if not crops:
+            return []
+
+        results = self.model.predict(crops, imgsz=self.tile_size, **predict_kwargs)
+
+        per_frame: List[List[sv.Detections]] = [[] for _ in frames]
+        for result, (x1, y1), frame_idx in zip(results, offsets, owners):
+            detections = sv.Detections.from_ultralytics(result)
+            if len(detections) == 0:
+                continue
+            detections.xyxy = detections.xyxy + np.array([x1, y1, x1, y1], dtype=detections.xyxy.dtype)
+            per_frame[frame_idx].append(detections)
+
+        merged = []
+        for detections in per_frame:
+            if not detections:
+                merged.append(sv.Detections.empty())
+                continue
+            frame_detections = sv.Detections.merge(detections)
+            if len(detections) > 1:
+                frame_detections = frame_detections.with_nms(threshold=self.nms_iou, class_agnostic=True)
+            merged.append(frame_detections)
+        return merged
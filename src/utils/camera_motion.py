@@ -0,0 +1,100 @@
+"""
+Estimación barata del movimiento global de cámara para reutilizar la homografía.
+
+En transmisiones la cámara principal suele quedarse quieta durante segundos;
+mientras no se mueva, los keypoints del campo (y la homografía que se calcula
+con ellos) no cambian. CameraMotionGate mide el desplazamiento global entre
+frames con correlación de fase sobre una versión reducida en escala de grises
+y decide cuándo vale la pena volver a correr el modelo de keypoints.
+"""
+
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+
+class CameraMotionGate:
+    """
+    Decide en qué frames inferir los keypoints del campo.
+
+    Se infiere cuando el desplazamiento acumulado desde la última inferencia
+    supera `motion_threshold` (fracción del ancho del frame), cuando pasaron
+    `max_interval` frames, o cuando la correlación de fase no es confiable
+    (corte de cámara, zoom brusco). En el resto se reutiliza la homografía.
+    """
+
+    def __init__(
+        self,
+        motion_threshold: float = 0.01,
+        max_interval: int = 30,
+        analysis_width: int = 320,
+        min_response: float = 0.1
+    ):
+        """
+        Args:
+            motion_threshold: Desplazamiento acumulado (fracción del ancho) que fuerza inferencia
+            max_interval: Frames máximos entre dos inferencias
+            analysis_width: Ancho al que se reduce el frame para estimar el movimiento
+            min_response: Respuesta mínima de la correlación de fase para confiar en ella
+        """
+        self.motion_threshold = motion_threshold
+        self.max_interval = max(1, int(max_interval))
+        self.analysis_width = analysis_width
+        self.min_response = min_response
+        self._previous: Optional[np.ndarray] = None
+        self._window: Optional[np.ndarray] = None
+        self._accumulated = 0.0
+        self._last_inference: Optional[int] = None
+        self.inferred = 0
+        self.skipped = 0
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        scale = self.analysis_width / frame.shape[1]
+        small = cv2.resize(frame, (self.analysis_width, max(1, int(frame.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32)
+        if self._window is None or self._window.shape != gray.shape:
+            self._window = cv2.createHanningWindow(gray.shape[::-1], cv2.CV_32F)
+        return gray
+
+    def should_infer(self, frame: np.ndarray, frame_index: int) -> bool:
+        """
+        Actualiza el movimiento acumulado con `frame` y decide si inferir.
+
+        Debe llamarse en orden para todos los frames candidatos a inferencia.
+        """
+        current = self._prepare(frame)
+        previous, self._previous = self._previous, current
+
+        infer = previous is None or self._last_inference is None
+        if not infer:
+            (dx, dy), response = cv2.phaseCorrelate(previous, current, self._window)
+            if response < self.min_response:
+                infer = True
+            else:
+                # Desplazamiento en fracción del ancho del frame original
+                self._accumulated += float(np.hypot(dx, dy)) / self.analysis_width
+                infer = (
+                    self._accumulated >= self.motion_threshold
+                    or frame_index - self._last_inference >= self.max_interval
+                )
+
+        if infer:
+            self._accumulated = 0.0
+            self._last_inference = frame_index
+            self.inferred += 1
+        else:
+            self.skipped += 1
+        return infer
+
+    def get_report(self) -> Dict:
+        """Inferencias de keypoints realizadas vs. omitidas."""
+        total = self.inferred + self.skipped
+        return {
+            'motion_threshold': self.motion_threshold,
+            'max_interval': self.max_interval,
+            'pitch_inferences': self.inferred,
+            'pitch_skipped': self.skipped,
+            'skip_rate': self.skipped / total if total else 0.0,
+        }
@@ -0,0 +1,113 @@
+"""
+Checkpoints de ejecuciones largas de process_video.
+
+Un checkpoint guarda, para el último frame confirmado, el estado serializado
+del análisis (trackers, modelo de colores de equipos, historiales, módulos tácticos),
+el de la etapa de detección (ventana de búsqueda de la pelota, compuerta de
+keypoints del campo, resolución adaptativa) y la lista de partes de video ya
+cerradas. Al reanudar se restaura ese estado, se descartan las partes posteriores
+y se continúa desde el frame siguiente; al terminar, las partes se unen en el
+video final.
+"""
+
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CHECKPOINT_VERSION = 4
+
+
+class RunCheckpoint:
+    """
+    Archivo de checkpoint (`<stem>_checkpoint.pkl`) y directorio de partes de
+    video (`<stem>_parts/`) asociados a un `target_path`.
+    """
+
+    def __init__(self, target_path: str):
+        target = Path(target_path)
+        self.path = target.parent / f"{target.stem}_checkpoint.pkl"
+        self.parts_dir = target.parent / f"{target.stem}_parts"
+
+    def part_path(self, part_index: int) -> str:
+        """Ruta de la parte de video número `part_index`."""
+        return str(self.parts_dir / f"part_{part_index:04d}.mp4")
+
+    def save(
+        self,
+        frame_index: int,
+        state: bytes,
+        parts: List[str],
+        settings: Dict,
+        detect_state: Optional[bytes] = None
+    ):
+        """
+        Escribe el checkpoint de forma atómica (archivo temporal + rename), de
+        modo que una interrupción durante la escritura deja el anterior intacto.
+
+        Args:
+            frame_index: Último frame incluido en el estado y en las partes
+            state: Estado serializado del análisis (MatchAnalyzer.get_state)
+            parts: Partes de video cerradas, en orden
+            settings: Parámetros que deben coincidir al reanudar
+            detect_state: Estado serializado de la etapa de detección en el mismo frame
+        """
+        data = {
+            'version': CHECKPOINT_VERSION,
+            'frame_index': frame_index,
+            'state': state,
+            'detect_state': detect_state,
+            'parts': list(parts),
+            'settings': settings,
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def load(self, settings: Dict) -> Optional[Dict]:
+        """
+        Lee el checkpoint si existe y es compatible con `settings`.
+
+        Returns:
+            Dict con frame_index, state, detect_state y parts, o None si no hay checkpoint válido
+        """
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ Checkpoint ilegible ({e}); se procesa desde el inicio")
+            return None
+
+        if data.get('version') != CHECKPOINT_VERSION:
+            print("⚠️ Checkpoint de otra versión; se procesa desde el inicio")
+            return None
+        if data.get('settings') != settings:
+            print("⚠️ El checkpoint se generó con otros parámetros; se procesa desde el inicio")
+            return None
+        missing = [p for p in data['parts'] if not os.path.exists(p)]
+        if missing:
+            print(f"⚠️ Faltan {len(missing)} partes de video del checkpoint; se procesa desde el inicio")
+            return None
+
+        # Partes escritas después del checkpoint (incompletas o no confirmadas)
+        if self.parts_dir.exists():
+            keep = {os.path.abspath(p) for p in data['parts']}
+            for part in self.parts_dir.glob("part_*.mp4"):
+                if os.path.abspath(part) not in keep:
+                    part.unlink()
+        return data
+
+    def clear(self, parts: bool = True):
+        """Elimina el checkpoint (y las partes de video) tras una ejecución completa."""
+        if self.path.exists():
+            self.path.unlink()
+        if parts and self.parts_dir.exists():
+            for part in self.parts_dir.glob("part_*.mp4"):
+                part.unlink()
+            try:
+                self.parts_dir.rmdir()
+            except OSError:
+                pass
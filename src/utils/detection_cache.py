@@ -0,0 +1,224 @@
+"""
+Caché en disco de las detecciones de un video.
+
+Ajustar el clustering de equipos, el radar o los parámetros tácticos no
+cambia lo que ven los modelos, pero process_video volvía a correr los tres
+YOLO sobre todo el video. DetectionCache guarda la salida de la etapa de
+detección de cada frame (cajas de jugadores y pelota con confianza y clase,
+keypoints del campo con su confianza y qué frames se detectaron) en un `.npz`
+columnar, indexado por la huella del video (tamaño, fecha de modificación y
+bloques muestreados, sin leerlo entero), el hash de cada modelo y los
+parámetros que afectan a las detecciones (conf, img_size, modo, búsqueda de
+pelota, tamaño de lote...).
+Las ejecuciones siguientes reproducen las detecciones desde el archivo y sólo
+corren las etapas posteriores.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import supervision as sv
+
+from src.models.inference_backend import cached_weights_hash
+from src.models.model_metadata import model_weights_path
+
+DETECTION_CACHE_DIR = Path("outputs") / "detection_cache"
+DETECTION_CACHE_VERSION = 1
+
+# Huella del video: bloques de VIDEO_SAMPLE_BYTES en VIDEO_SAMPLES posiciones equiespaciadas
+VIDEO_SAMPLES = 16
+VIDEO_SAMPLE_BYTES = 1 << 20
+
+# Bits de `flags` por frame
+_DETECTED = 1
+_AUDIT = 2
+_PITCH_REUSED = 4
+_HAS_DETECTIONS = 8
+_HAS_PITCH = 16
+
+
+def video_fingerprint(video_path: str) -> str:
+    """
+    Huella de un video sin leerlo entero: tamaño, fecha de modificación y
+    VIDEO_SAMPLES bloques repartidos a lo largo del archivo (incluidos el
+    primero y el último). Una mitad de varios GB se identifica en milisegundos.
+    """
+    path = Path(video_path)
+    stat = path.stat()
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    last_offset = max(0, stat.st_size - VIDEO_SAMPLE_BYTES)
+    with open(path, 'rb') as f:
+        for i in range(VIDEO_SAMPLES):
+            f.seek(last_offset * i // (VIDEO_SAMPLES - 1))
+            digest.update(f.read(VIDEO_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def _detections_columns(detections_list: List[Optional[sv.Detections]], prefix: str) -> Dict[str, np.ndarray]:
+    """Concatena detecciones por frame en columnas + offsets (frames sin detecciones = vacío)."""
+    counts = [len(d) if d is not None else 0 for d in detections_list]
+    present = [d for d in detections_list if d is not None and len(d) > 0]
+    columns = {f'{prefix}_offsets': np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)}
+    if present:
+        columns[f'{prefix}_xyxy'] = np.concatenate([d.xyxy for d in present]).astype(np.float32)
+        columns[f'{prefix}_confidence'] = np.concatenate([
+            d.confidence if d.confidence is not None else np.ones(len(d)) for d in present
+        ]).astype(np.float32)
+        columns[f'{prefix}_class_id'] = np.concatenate([
+            d.class_id if d.class_id is not None else np.zeros(len(d)) for d in present
+        ]).astype(np.int32)
+    else:
+        columns[f'{prefix}_xyxy'] = np.empty((0, 4), dtype=np.float32)
+        columns[f'{prefix}_confidence'] = np.empty(0, dtype=np.float32)
+        columns[f'{prefix}_class_id'] = np.empty(0, dtype=np.int32)
+    return columns
+
+
+class DetectionCache:
+    """Detecciones por frame de un video, grabadas en una ejecución y reproducidas en las siguientes."""
+
+    def __init__(self, path: Path, settings: Dict):
+        """
+        Args:
+            path: Archivo `.npz` de la caché
+            settings: Parámetros que identifican la caché (se guardan en el archivo)
+        """
+        self.path = Path(path)
+        self.settings = settings
+        self._recorded: Dict[int, tuple] = {}
+        self._rows: Optional[Dict[int, int]] = None
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._pitch_rows: Optional[np.ndarray] = None
+        self.frames_replayed = 0
+
+    @classmethod
+    def for_run(
+        cls,
+        video_path: str,
+        models: Dict[str, object],
+        settings: Dict,
+        cache_dir: Path = DETECTION_CACHE_DIR
+    ) -> Optional["DetectionCache"]:
+        """
+        Caché correspondiente a un video, unos modelos y unos parámetros.
+
+        Args:
+            video_path: Video de entrada
+            models: Nombre -> modelo (None = no se usa); cada modelo debe tener archivo de pesos
+            settings: Parámetros de la etapa de detección que afectan a su salida
+            cache_dir: Directorio de las cachés
+
+        Returns:
+            La caché, o None si algún modelo no tiene archivo de pesos con el que identificarlo
+        """
+        key_data = {'video': video_fingerprint(video_path), 'settings': settings, 'models': {}}
+        for name, model in models.items():
+            if model is None:
+                key_data['models'][name] = None
+                continue
+            weights = model_weights_path(model)
+            if weights is None:
+                print(f"⚠️ Caché de detecciones desactivada: el modelo '{name}' no tiene archivo de pesos")
+                return None
+            key_data['models'][name] = cached_weights_hash(weights)
+        key = hashlib.sha1(json.dumps(key_data, sort_keys=True).encode()).hexdigest()[:16]
+        return cls(Path(cache_dir) / f"{Path(video_path).stem}_{key}.npz", key_data)
+
+    # ------------------------------------------------------------------ #
+    # Grabación
+    # ------------------------------------------------------------------ #
+    def record(self, contexts: List) -> List:
+        """Guarda en memoria las detecciones de los frames (FrameContext) de un lote."""
+        for ctx in contexts:
+            flags = (
+                _DETECTED * ctx.detected
+                | _AUDIT * ctx.audit
+                | _PITCH_REUSED * ctx.pitch_reused
+                | _HAS_DETECTIONS * (ctx.player_detections is not None)
+                | _HAS_PITCH * (ctx.pitch_keypoints is not None)
+            )
+            self._recorded[ctx.index] = (flags, ctx.player_detections, ctx.ball_detections, ctx.pitch_keypoints)
+        return contexts
+
+    def save(self):
+        """Escribe las detecciones grabadas en el `.npz` (de forma atómica)."""
+        indices = sorted(self._recorded)
+        entries = [self._recorded[i] for i in indices]
+        columns = {
+            'frame_index': np.array(indices, dtype=np.int64),
+            'flags': np.array([e[0] for e in entries], dtype=np.uint8),
+            'settings': np.array(json.dumps(self.settings, sort_keys=True)),
+            'version': np.array(DETECTION_CACHE_VERSION),
+        }
+        columns.update(_detections_columns([e[1] for e in entries], 'player'))
+        columns.update(_detections_columns([e[2] for e in entries], 'ball'))
+        keypoints = [e[3] for e in entries if e[3] is not None]
+        if keypoints:
+            columns['pitch_xy'] = np.stack([xy for xy, _ in keypoints]).astype(np.float32)
+            columns['pitch_conf'] = np.stack([conf for _, conf in keypoints]).astype(np.float32)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **columns)
+        os.replace(tmp_path, self.path)
+        size_mb = self.path.stat().st_size / 1024 ** 2
+        print(f"📦 Detecciones de {len(indices)} frames cacheadas en: {self.path} ({size_mb:.1f} MB)")
+
+    # ------------------------------------------------------------------ #
+    # Reproducción
+    # ------------------------------------------------------------------ #
+    def load(self) -> bool:
+        """Carga la caché si existe y es compatible. Retorna True si se puede reproducir."""
+        if not self.path.exists():
+            return False
+        try:
+            with np.load(self.path) as data:
+                columns = {name: data[name] for name in data.files}
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Caché de detecciones ilegible, se recalcula ({e})")
+            return False
+        if int(columns['version']) != DETECTION_CACHE_VERSION:
+            return False
+        self._columns = columns
+        self._rows = {int(index): row for row, index in enumerate(columns['frame_index'])}
+        # Fila de keypoints de cada frame (sólo válida en los que tienen keypoints)
+        self._pitch_rows = np.cumsum((columns['flags'] & _HAS_PITCH) > 0) - 1
+        return True
+
+    def __len__(self) -> int:
+        return len(self._rows) if self._rows is not None else len(self._recorded)
+
+    def _detections(self, prefix: str, row: int) -> sv.Detections:
+        start, end = self._columns[f'{prefix}_offsets'][row:row + 2]
+        if start == end:
+            return sv.Detections.empty()
+        return sv.Detections(
+            xyxy=self._columns[f'{prefix}_xyxy'][start:end],
+            confidence=self._columns[f'{prefix}_confidence'][start:end],
+            class_id=self._columns[f'{prefix}_class_id'][start:end],
+        )
+
+    def replay(self, contexts: List) -> List:
+        """Etapa de detección reproducida: completa los FrameContext desde la caché."""
+        flags_column = self._columns['flags']
+        for ctx in contexts:
+            row = self._rows.get(ctx.index)
+            if row is None:
+                raise RuntimeError(f"El frame {ctx.index} no está en la caché de detecciones {self.path}")
+            flags = int(flags_column[row])
+            ctx.detected = bool(flags & _DETECTED)
+            ctx.audit = bool(flags & _AUDIT)
+            ctx.pitch_reused = bool(flags & _PITCH_REUSED)
+            if flags & _HAS_DETECTIONS:
+                ctx.player_detections = self._detections('player', row)
+                ctx.ball_detections = self._detections('ball', row)
+            if flags & _HAS_PITCH:
+                pitch_row = self._pitch_rows[row]
+                ctx.pitch_keypoints = (self._columns['pitch_xy'][pitch_row], self._columns['pitch_conf'][pitch_row])
+            self.frames_replayed += 1
+        return contexts
@@ -0,0 +1,268 @@
+"""
+Predicción de movimiento para el modo de detección por saltos (`detect_every`).
+
+- TrackMotionPredictor: extrapola las cajas de cada track con un modelo de
+  velocidad constante, para los frames en que no se corren los detectores.
+- StrideDriftMonitor: compara, en frames de auditoría, las cajas predichas
+  con detecciones reales y resume el error (deriva respecto de stride 1).
+- BallSearchWindow: ventana de búsqueda de la pelota alrededor de su posición
+  predicha, para correr el modelo de pelota sólo sobre ese recorte.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import supervision as sv
+
+
+class TrackMotionPredictor:
+    """
+    Predictor de cajas por velocidad constante, indexado por tracker_id.
+
+    Se alimenta con la salida del tracker (ByteTrack) en los frames detectados
+    y genera detecciones sintéticas (mismos tracker_id, class_id y confianza)
+    en los frames intermedios. La velocidad se suaviza con un promedio
+    exponencial para que un salto puntual del detector no se propague.
+    """
+
+    def __init__(self, velocity_alpha: float = 0.5, max_gap: int = 30):
+        """
+        Args:
+            velocity_alpha: Peso de la última velocidad observada (EMA)
+            max_gap: Frames máximos sin detección antes de dejar de predecir un track
+        """
+        self.velocity_alpha = velocity_alpha
+        self.max_gap = max_gap
+        # tracker_id -> {'xyxy', 'velocity', 'frame', 'class_id', 'confidence'}
+        self._tracks: Dict[int, Dict] = {}
+        self._last_ids = []
+
+    def update(self, detections: sv.Detections, frame_index: int):
+        """Registra las detecciones rastreadas de un frame detectado."""
+        self._last_ids = []
+        if detections is None or len(detections) == 0 or detections.tracker_id is None:
+            return
+
+        for i, tracker_id in enumerate(detections.tracker_id):
+            tracker_id = int(tracker_id)
+            xyxy = detections.xyxy[i].astype(np.float64)
+            track = self._tracks.get(tracker_id)
+
+            velocity = np.zeros(4)
+            if track is not None and frame_index > track['frame']:
+                observed = (xyxy - track['xyxy']) / (frame_index - track['frame'])
+                velocity = self.velocity_alpha * observed + (1 - self.velocity_alpha) * track['velocity']
+
+            self._tracks[tracker_id] = {
+                'xyxy': xyxy,
+                'velocity': velocity,
+                'frame': frame_index,
+                'class_id': None if detections.class_id is None else detections.class_id[i],
+                'confidence': None if detections.confidence is None else detections.confidence[i],
+            }
+            self._last_ids.append(tracker_id)
+
+        # Olvidar tracks que llevan demasiado sin verse
+        stale = [tid for tid, t in self._tracks.items() if frame_index - t['frame'] > self.max_gap]
+        for tid in stale:
+            del self._tracks[tid]
+
+    def predict(self, frame_index: int, frame_width: int, frame_height: int) -> sv.Detections:
+        """
+        Retorna las cajas extrapoladas al frame indicado para los tracks
+        presentes en la última actualización.
+        """
+        tracks = [(tid, self._tracks[tid]) for tid in self._last_ids if tid in self._tracks]
+        if not tracks:
+            return sv.Detections.empty()
+
+        xyxy = np.array([
+            t['xyxy'] + t['velocity'] * (frame_index - t['frame']) for _, t in tracks
+        ])
+        xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, frame_width - 1)
+        xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, frame_height - 1)
+
+        class_ids = [t['class_id'] for _, t in tracks]
+        confidences = [t['confidence'] for _, t in tracks]
+        return sv.Detections(
+            xyxy=xyxy.astype(np.float32),
+            class_id=None if any(c is None for c in class_ids) else np.array(class_ids),
+            confidence=None if any(c is None for c in confidences) else np.array(confidences, dtype=np.float32),
+            tracker_id=np.array([tid for tid, _ in tracks], dtype=int),
+        )
+
+
+def box_iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Matriz IoU (N, M) entre dos conjuntos de cajas xyxy."""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+class StrideDriftMonitor:
+    """
+    Acumula el error de las cajas predichas frente a detecciones reales.
+
+    Las parejas se emparejan de forma voraz por IoU. Se reporta IoU medio,
+    error medio de la posición de los pies (punto inferior central, en
+    píxeles, que es lo que se proyecta al radar) y la fracción de detecciones
+    reales cubiertas por una predicción (IoU >= `match_iou`).
+    """
+
+    def __init__(self, match_iou: float = 0.3):
+        self.match_iou = match_iou
+        self.audited_frames = 0
+        self.detections_total = 0
+        self.detections_matched = 0
+        self.iou_sum = 0.0
+        self.foot_error_sum = 0.0
+
+    def update(self, predicted: sv.Detections, detected: sv.Detections):
+        """Compara las cajas predichas y detectadas de un frame de auditoría."""
+        self.audited_frames += 1
+        self.detections_total += len(detected)
+        if len(predicted) == 0 or len(detected) == 0:
+            return
+
+        iou = box_iou_matrix(predicted.xyxy, detected.xyxy)
+        used_pred, used_det = set(), set()
+        for flat_idx in np.argsort(-iou, axis=None):
+            p, d = np.unravel_index(flat_idx, iou.shape)
+            if iou[p, d] < self.match_iou:
+                break
+            if p in used_pred or d in used_det:
+                continue
+            used_pred.add(p)
+            used_det.add(d)
+
+            pred_foot = np.array([(predicted.xyxy[p, 0] + predicted.xyxy[p, 2]) / 2, predicted.xyxy[p, 3]])
+            det_foot = np.array([(detected.xyxy[d, 0] + detected.xyxy[d, 2]) / 2, detected.xyxy[d, 3]])
+            self.iou_sum += iou[p, d]
+            self.foot_error_sum += float(np.linalg.norm(pred_foot - det_foot))
+            self.detections_matched += 1
+
+    def get_report(self) -> Optional[Dict]:
+        """Resumen de la deriva (None si no hubo frames auditados)."""
+        if self.audited_frames == 0:
+            return None
+        matched = self.detections_matched
+        return {
+            'audited_frames': self.audited_frames,
+            'detections': self.detections_total,
+            'match_rate': matched / self.detections_total if self.detections_total else 1.0,
+            'mean_iou': self.iou_sum / matched if matched else 0.0,
+            'mean_foot_error_px': self.foot_error_sum / matched if matched else 0.0,
+        }
+
+
+class BallSearchWindow:
+    """
+    Región de interés donde buscar la pelota en el próximo frame.
+
+    Mantiene el centro de la última pelota detectada y su velocidad (misma
+    EMA de velocidad constante que TrackMotionPredictor) y devuelve un
+    recorte de `roi_size` x `roi_size` píxeles centrado en la posición
+    extrapolada. El recorte se infiere a resolución nativa (sin reescalar),
+    así que la pelota conserva todos sus píxeles. Tras `max_misses`
+    búsquedas consecutivas sin pelota se vuelve al frame completo hasta
+    reencontrarla.
+    """
+
+    def __init__(
+        self,
+        frame_width: int,
+        frame_height: int,
+        roi_size: int = 640,
+        max_misses: int = 3,
+        velocity_alpha: float = 0.5
+    ):
+        """
+        Args:
+            frame_width: Ancho del frame
+            frame_height: Alto del frame
+            roi_size: Lado del recorte en píxeles (múltiplo de 32)
+            max_misses: Búsquedas consecutivas sin pelota antes de buscar en el frame completo
+            velocity_alpha: Peso de la última velocidad observada (EMA)
+        """
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.roi_size = roi_size
+        self.max_misses = max(1, int(max_misses))
+        self.velocity_alpha = velocity_alpha
+        self.center: Optional[np.ndarray] = None
+        self.velocity = np.zeros(2)
+        self.last_frame: Optional[int] = None
+        self.misses = 0
+        self.roi_searches = 0
+        self.roi_hits = 0
+        self.full_searches = 0
+        self.full_hits = 0
+
+    def window(self, frame_index: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Recorte (x1, y1, x2, y2) donde buscar la pelota en `frame_index`, o
+        None si hay que buscar en el frame completo.
+        """
+        roi_w = min(self.roi_size, self.frame_width)
+        roi_h = min(self.roi_size, self.frame_height)
+        if self.center is None or self.misses >= self.max_misses:
+            return None
+        if roi_w == self.frame_width and roi_h == self.frame_height:
+            return None
+
+        predicted = self.center + self.velocity * (frame_index - self.last_frame)
+        x1 = int(np.clip(predicted[0] - roi_w / 2, 0, self.frame_width - roi_w))
+        y1 = int(np.clip(predicted[1] - roi_h / 2, 0, self.frame_height - roi_h))
+        return x1, y1, x1 + roi_w, y1 + roi_h
+
+    def update(self, frame_index: int, ball_detections: sv.Detections, searched_roi: bool):
+        """
+        Registra el resultado de la búsqueda de un frame.
+
+        Args:
+            frame_index: Frame buscado
+            ball_detections: Pelota detectada (ya filtrada; coordenadas del frame completo)
+            searched_roi: Si la búsqueda fue sobre un recorte
+        """
+        found = ball_detections is not None and len(ball_detections) > 0
+        if searched_roi:
+            self.roi_searches += 1
+            self.roi_hits += int(found)
+        else:
+            self.full_searches += 1
+            self.full_hits += int(found)
+
+        if not found:
+            self.misses += 1
+            return
+
+        best = int(np.argmax(ball_detections.confidence)) if ball_detections.confidence is not None else 0
+        x1, y1, x2, y2 = ball_detections.xyxy[best]
+        center = np.array([(x1 + x2) / 2, (y1 + y2) / 2], dtype=np.float64)
+        if self.center is not None and self.misses == 0 and frame_index > self.last_frame:
+            observed = (center - self.center) / (frame_index - self.last_frame)
+            self.velocity = self.velocity_alpha * observed + (1 - self.velocity_alpha) * self.velocity
+        else:
+            # Reencontrada tras fallos (o primera vez): la velocidad previa ya no vale
+            self.velocity = np.zeros(2)
+        self.center = center
+        self.last_frame = frame_index
+        self.misses = 0
+
+    def get_report(self) -> Dict:
+        """Búsquedas en recorte vs. frame completo y su tasa de acierto."""
+        return {
+            'roi_size': self.roi_size,
+            'roi_searches': self.roi_searches,
+            'roi_hits': self.roi_hits,
+            'full_searches': self.full_searches,
+            'full_hits': self.full_hits,
+        }
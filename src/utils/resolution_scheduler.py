@@ -0,0 +1,169 @@
+"""
+Planificador adaptativo de la resolución de inferencia.
+
+Mide cuánto tarda cada modelo (jugadores, pelota, keypoints del campo) por
+frame de video durante la ejecución y ajusta su `imgsz` dentro de unos
+límites para sostener un objetivo de frames por segundo: si la etapa de
+detección no llega, baja la resolución del modelo que más tiempo consume;
+si sobra margen, la devuelve hacia la resolución base. Si la pelota lleva
+muchos frames sin detectarse y hay margen, sube la resolución de la pelota.
+
+Las resoluciones elegidas se registran por tramo para el JSON de estadísticas.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+
+class AdaptiveResolutionScheduler:
+    """Ajusta el imgsz de cada modelo para sostener `target_fps` en la detección."""
+
+    def __init__(
+        self,
+        target_fps: float,
+        base_sizes: Dict[str, int],
+        size_bounds: Tuple[int, int] = (320, 960),
+        step: int = 64,
+        window_frames: int = 30,
+        ball_miss_frames: int = 15,
+        smoothing: float = 0.5
+    ):
+        """
+        Args:
+            target_fps: Frames de video por segundo que debe sostener la detección
+            base_sizes: Resolución inicial de cada modelo ajustable ('player', 'ball', 'pitch');
+                los modelos medidos que no figuran aquí cuentan en el costo pero no se ajustan
+            size_bounds: Resolución mínima y máxima (múltiplos de 32)
+            step: Cambio de resolución por ajuste (múltiplo de 32)
+            window_frames: Frames de video entre dos decisiones (un tramo)
+            ball_miss_frames: Frames detectados seguidos sin pelota para subir su resolución
+            smoothing: Peso del último tramo en la media exponencial de latencias
+        """
+        self.target_fps = target_fps
+        self.base_sizes = dict(base_sizes)
+        self.sizes = dict(base_sizes)
+        self.min_size, self.max_size = size_bounds
+        self.step = step
+        self.window_frames = max(1, int(window_frames))
+        self.ball_miss_frames = max(1, int(ball_miss_frames))
+        self.smoothing = smoothing
+
+        self._window_time: Dict[str, float] = {}
+        self._window_frames = 0
+        self._window_start: Optional[int] = None
+        self._window_last: Optional[int] = None
+        self._cost_per_frame: Dict[str, float] = {}
+        self._ball_misses = 0
+        self.segments: List[Dict] = []
+
+    def size(self, model_key: str) -> int:
+        """Resolución actual de un modelo."""
+        return self.sizes[model_key]
+
+    def observe(self, first_frame: int, last_frame: int, video_frames: int, timings: Dict[str, float]):
+        """
+        Registra el costo de un lote de la etapa de detección.
+
+        Args:
+            first_frame: Primer frame del lote
+            last_frame: Último frame del lote
+            video_frames: Frames de video que cubre el lote (incluye los predichos)
+            timings: Segundos de inferencia por modelo en el lote
+        """
+        if self._window_start is None:
+            self._window_start = first_frame
+        for key, seconds in timings.items():
+            self._window_time[key] = self._window_time.get(key, 0.0) + seconds
+        self._window_frames += video_frames
+        self._window_last = last_frame
+
+        if self._window_frames >= self.window_frames:
+            self._close_window(last_frame)
+
+    def observe_ball(self, found: bool):
+        """Registra si se detectó la pelota en un frame detectado."""
+        self._ball_misses = 0 if found else self._ball_misses + 1
+
+    def flush(self):
+        """Registra el tramo en curso (al terminar el video) sin hacer otro ajuste."""
+        if self._window_frames > 0:
+            self._close_window(self._window_last, adjust=False)
+
+    def _close_window(self, last_frame: int, adjust: bool = True):
+        frames = self._window_frames
+        for key, seconds in self._window_time.items():
+            cost = seconds / frames
+            previous = self._cost_per_frame.get(key)
+            self._cost_per_frame[key] = cost if previous is None else (
+                self.smoothing * cost + (1 - self.smoothing) * previous
+            )
+        total_time = sum(self._window_time.values())
+        fps = frames / total_time if total_time > 0 else 0.0
+        self._record_segment(self._window_start, last_frame, fps)
+
+        if adjust:
+            self._adjust()
+        self._window_time = {}
+        self._window_frames = 0
+        self._window_start = None
+
+    def _estimated_fps(self) -> float:
+        cost = sum(self._cost_per_frame.values())
+        return 1.0 / cost if cost > 0 else float('inf')
+
+    def _adjust(self):
+        """Decide el próximo ajuste de resolución con las latencias suavizadas."""
+        fps = self._estimated_fps()
+        active = [key for key in self.sizes if self._cost_per_frame.get(key, 0) > 0]
+
+        if fps < self.target_fps * 0.95:
+            # Sin margen: bajar el modelo que más tiempo consume (si aún puede bajar)
+            for key in sorted(active, key=lambda k: self._cost_per_frame[k], reverse=True):
+                if self.sizes[key] - self.step >= self.min_size:
+                    self._scale_cost(key, self.sizes[key] - self.step)
+                    return
+            return
+
+        if fps > self.target_fps * 1.15:
+            # Pelota perdida y con margen: más resolución para la pelota
+            if 'ball' in active and self._ball_misses >= self.ball_miss_frames:
+                if self.sizes['ball'] + self.step <= self.max_size:
+                    self._scale_cost('ball', self.sizes['ball'] + self.step)
+                    self._ball_misses = 0
+                    return
+            # Devolver hacia la base el modelo más reducido
+            below_base = [key for key in active if self.sizes[key] < self.base_sizes[key]]
+            if below_base:
+                key = min(below_base, key=lambda k: self.sizes[k] / self.base_sizes[k])
+                self._scale_cost(key, min(self.base_sizes[key], self.sizes[key] + self.step))
+
+    def _scale_cost(self, key: str, new_size: int):
+        """Cambia la resolución y estima el nuevo costo (proporcional al área)."""
+        ratio = (new_size / self.sizes[key]) ** 2
+        self._cost_per_frame[key] *= ratio
+        self.sizes[key] = new_size
+
+    def _record_segment(self, start_frame: int, end_frame: int, fps: float):
+        """Agrega el tramo; los tramos consecutivos con las mismas resoluciones se unen."""
+        last = self.segments[-1] if self.segments else None
+        if last is not None and last['img_sizes'] == self.sizes:
+            span = last['end_frame'] - last['start_frame'] + 1
+            new_span = end_frame - start_frame + 1
+            last['detect_fps'] = (last['detect_fps'] * span + fps * new_span) / (span + new_span)
+            last['end_frame'] = end_frame
+            return
+        self.segments.append({
+            'start_frame': start_frame,
+            'end_frame': end_frame,
+            'img_sizes': dict(self.sizes),
+            'detect_fps': fps,
+        })
+
+    def get_report(self) -> Dict:
+        """Objetivo, límites y resoluciones por tramo (para el JSON de estadísticas)."""
+        return {
+            'target_fps': self.target_fps,
+            'size_bounds': [self.min_size, self.max_size],
+            'base_sizes': dict(self.base_sizes),
+            'final_sizes': dict(self.sizes),
+            'segments': [dict(segment, img_sizes=dict(segment['img_sizes'])) for segment in self.segments],
+        }
@@ -0,0 +1,732 @@
+"""
+Entrada/salida de video para el pipeline de procesamiento.
+
+- PrefetchFrameSource: decodifica frames en un hilo de fondo hacia una cola
+  acotada, para que la decodificación se solape con la inferencia de los
+  modelos.
+- AsyncVideoWriter: codifica frames en un hilo propio alimentado por una cola
+  acotada, para que la escritura no bloquee el bucle de análisis.
+- LiveFrameSource: captura de un stream en vivo (o de un archivo reproducido
+  a su fps nativo) en un hilo propio; si el consumidor se atrasa se descartan
+  los frames más viejos en lugar de acumular retraso.
+- FFmpegFrameReader / FFmpegVideoWriter: backend alternativo que lanza ffmpeg
+  y transfiere frames `rawvideo` bgr24 por pipes (lectura con `readinto`
+  directamente sobre el array del frame, escritura H.264 por stdin).
+- open_video_reader / open_video_writer: eligen el backend ('opencv' o 'ffmpeg').
+- seek_frame: posiciona un lector exactamente en un frame (reanudar, tramos).
+- concat_videos: une varios videos con el mismo formato en uno solo.
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class PrefetchFrameSource:
+    """
+    Fuente de frames con decodificación anticipada en un hilo de fondo.
+
+    El hilo decodificador deja hasta `depth` frames en una cola acotada por
+    delante del consumidor. Cuando la cola está llena el decodificador espera
+    (backpressure); cuando está vacía es el consumidor quien espera, y ese
+    tiempo se contabiliza como "starvation".
+
+    Expone la misma interfaz que cv2.VideoCapture para la lectura
+    (`read()`, `get()`, `isOpened()`, `release()`), de modo que el bucle de
+    procesamiento no cambia. Cada frame se decodifica en un array propio que
+    el consumidor puede conservar (el pipeline lo retiene hasta codificarlo y
+    el render dibuja sobre él), así que no hace falta copiarlo.
+    """
+
+    def __init__(self, capture, depth: int = 4):
+        """
+        Args:
+            capture: Objeto tipo cv2.VideoCapture ya abierto
+            depth: Número de frames decodificados por adelantado
+        """
+        self.capture = capture
+        self.depth = max(2, int(depth))
+
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._frame_shape = (height, width, 3)
+
+        self._frames = queue.Queue(maxsize=self.depth)
+        self._stop_event = threading.Event()
+        self._error = None
+        self._finished = False
+
+        # Estadísticas
+        self.frames_decoded = 0
+        self.frames_read = 0
+        self.decode_time = 0.0
+        self.decoder_wait_time = 0.0
+        self.starved_time = 0.0
+        self.starved_reads = 0
+
+        self._thread = threading.Thread(target=self._decode_loop, name="frame-decoder", daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        """Encola respetando la señal de parada. Retorna False si se detuvo."""
+        wait_start = time.perf_counter()
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    self._frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.decoder_wait_time += time.perf_counter() - wait_start
+
+    def _decode_loop(self):
+        """Bucle del hilo decodificador: decodifica hasta fin de video o parada."""
+        try:
+            while not self._stop_event.is_set():
+                decode_start = time.perf_counter()
+                # Se decodifica directamente sobre un array nuevo (sin copia posterior)
+                ret, frame = self.capture.read(np.empty(self._frame_shape, dtype=np.uint8))
+                self.decode_time += time.perf_counter() - decode_start
+                if not ret:
+                    break
+
+                self.frames_decoded += 1
+                if not self._put(frame):
+                    return
+        except Exception as e:
+            self._error = e
+        # Centinela de fin de stream
+        self._put(None)
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Retorna el siguiente frame decodificado (misma firma que cv2.VideoCapture.read)."""
+        if self._finished:
+            return False, None
+
+        wait_start = time.perf_counter()
+        if self._frames.empty():
+            self.starved_reads += 1
+        frame = self._frames.get()
+        self.starved_time += time.perf_counter() - wait_start
+
+        if frame is None:
+            self._finished = True
+            if self._error is not None:
+                raise RuntimeError(f"Error decodificando video: {self._error}") from self._error
+            return False, None
+
+        self.frames_read += 1
+        return True, frame
+
+    def get(self, prop_id: int) -> float:
+        """Delegado a cv2.VideoCapture.get."""
+        return self.capture.get(prop_id)
+
+    def isOpened(self) -> bool:
+        return self.capture.isOpened()
+
+    def release(self):
+        """Detiene el hilo decodificador y libera la captura subyacente."""
+        self._stop_event.set()
+        self._thread.join(timeout=5.0)
+        self.capture.release()
+
+    def get_report(self) -> Dict:
+        """Retorna estadísticas de decodificación y de espera del consumidor."""
+        return {
+            'prefetch_depth': self.depth,
+            'frames_decoded': self.frames_decoded,
+            'frames_read': self.frames_read,
+            'decode_time_s': self.decode_time,
+            'decoder_wait_time_s': self.decoder_wait_time,
+            'consumer_starved_time_s': self.starved_time,
+            'consumer_starved_reads': self.starved_reads,
+        }
+
+
+class _WriterSwitch:
+    """Marca en la cola de AsyncVideoWriter para cambiar de writer en orden."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.done = threading.Event()
+
+
+class AsyncVideoWriter:
+    """
+    Escritor de video asíncrono sobre cv2.VideoWriter (o cualquier objeto con
+    `write()`/`release()`).
+
+    Los frames se encolan en una cola acotada y un hilo codificador los escribe
+    en orden FIFO, por lo que el orden de salida es el mismo que el de entrada.
+    Si la cola está llena, `write()` bloquea (backpressure) y ese tiempo se
+    contabiliza para detectar cuándo la codificación es el cuello de botella.
+
+    El llamador no debe modificar un frame después de pasarlo a `write()`.
+    """
+
+    def __init__(self, writer, queue_size: int = 8):
+        """
+        Args:
+            writer: Objeto tipo cv2.VideoWriter ya abierto
+            queue_size: Máximo de frames pendientes de codificar
+        """
+        self.writer = writer
+        self.queue_size = max(1, int(queue_size))
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._error = None
+        self._closed = False
+
+        # Estadísticas
+        self.frames_written = 0
+        self.encode_time = 0.0
+        self.blocked_time = 0.0
+        self.blocked_writes = 0
+        self.max_queue_depth = 0
+        self._queue_depth_sum = 0
+        self._queue_depth_samples = 0
+
+        self._thread = threading.Thread(target=self._encode_loop, name="frame-encoder", daemon=True)
+        self._thread.start()
+
+    def _encode_loop(self):
+        """Bucle del hilo codificador: escribe frames hasta recibir el centinela."""
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if isinstance(frame, _WriterSwitch):
+                # Los frames previos ya se escribieron: cerrar y continuar en el nuevo writer
+                try:
+                    self.writer.release()
+                except Exception as e:
+                    self._error = e
+                self.writer = frame.writer
+                frame.done.set()
+                continue
+            if self._error is not None:
+                # Tras un error se descartan los frames restantes
+                continue
+            try:
+                encode_start = time.perf_counter()
+                self.writer.write(frame)
+                self.encode_time += time.perf_counter() - encode_start
+                self.frames_written += 1
+            except Exception as e:
+                self._error = e
+
+    def write(self, frame: np.ndarray):
+        """Encola un frame para codificar (misma firma que cv2.VideoWriter.write)."""
+        if self._error is not None:
+            raise RuntimeError(f"Error codificando video: {self._error}") from self._error
+
+        depth = self._queue.qsize()
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._queue_depth_sum += depth
+        self._queue_depth_samples += 1
+
+        if depth >= self.queue_size:
+            self.blocked_writes += 1
+        put_start = time.perf_counter()
+        self._queue.put(frame)
+        self.blocked_time += time.perf_counter() - put_start
+
+    def isOpened(self) -> bool:
+        return self.writer.isOpened()
+
+    def switch_writer(self, writer):
+        """
+        Cierra el writer actual tras escribir los frames pendientes y continúa
+        en `writer`. Bloquea hasta que el archivo anterior está completo.
+        """
+        switch = _WriterSwitch(writer)
+        self._queue.put(switch)
+        switch.done.wait()
+        if self._error is not None:
+            raise RuntimeError(f"Error codificando video: {self._error}") from self._error
+
+    def release(self):
+        """
+        Vacía la cola, espera al hilo codificador y cierra el writer subyacente.
+        Si la codificación falló (p.ej. disco lleno en los últimos frames) lanza
+        el error, como `write()`: el video quedó incompleto.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self.writer.release()
+        if self._error is not None:
+            raise RuntimeError(f"Error codificando video: {self._error}") from self._error
+
+    def get_report(self) -> Dict:
+        """Retorna estadísticas de la cola de codificación."""
+        mean_depth = self._queue_depth_sum / self._queue_depth_samples if self._queue_depth_samples else 0.0
+        return {
+            'queue_size': self.queue_size,
+            'frames_written': self.frames_written,
+            'encode_time_s': self.encode_time,
+            'producer_blocked_time_s': self.blocked_time,
+            'producer_blocked_writes': self.blocked_writes,
+            'max_queue_depth': self.max_queue_depth,
+            'mean_queue_depth': mean_depth,
+        }
+
+
+class LiveFrameSource:
+    """
+    Fuente de frames en vivo: un hilo captura continuamente y deja los frames
+    en un buffer de `buffer_size` con su instante de captura.
+
+    A diferencia de PrefetchFrameSource no hay backpressure: un stream en vivo
+    no espera al consumidor, así que con el buffer lleno se descarta el frame
+    más viejo (se contabiliza como desborde). Un archivo local con
+    `replay_realtime=True` se entrega a su fps nativo y sirve como sustituto
+    de un stream de red.
+    """
+
+    def __init__(self, capture, fps: float, replay_realtime: bool = False, buffer_size: int = 2):
+        """
+        Args:
+            capture: Objeto tipo cv2.VideoCapture ya abierto (archivo, URL rtsp/http, cámara)
+            fps: Frames por segundo de la fuente
+            replay_realtime: Si True, la captura se limita a `fps` (archivos locales)
+            buffer_size: Frames capturados retenidos a la espera del consumidor
+        """
+        self.capture = capture
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.replay_realtime = replay_realtime
+        self.buffer_size = max(1, int(buffer_size))
+
+        self._buffer = deque()
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._finished = False
+        self._error = None
+
+        # Estadísticas
+        self.frames_captured = 0
+        self.frames_overflowed = 0
+        self.frames_read = 0
+        self.capture_start = None
+        self.capture_end = None
+
+        self._thread = threading.Thread(target=self._capture_loop, name="live-capture", daemon=True)
+        self._thread.start()
+
+    def _capture_loop(self):
+        """Bucle del hilo de captura: lee frames hasta fin de stream o stop()."""
+        try:
+            self.capture_start = time.perf_counter()
+            while not self._stop_event.is_set():
+                if self.replay_realtime:
+                    # Frame N disponible recién en start + N / fps, como en una transmisión
+                    delay = self.capture_start + self.frames_captured / self.fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                ret, frame = self.capture.read()
+                if not ret:
+                    break
+                capture_time = time.perf_counter()
+                self.frames_captured += 1
+                with self._condition:
+                    if len(self._buffer) >= self.buffer_size:
+                        self._buffer.popleft()
+                        self.frames_overflowed += 1
+                    self._buffer.append((self.frames_captured, frame, capture_time))
+                    self._condition.notify()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.capture_end = time.perf_counter()
+            with self._condition:
+                self._finished = True
+                self._condition.notify_all()
+
+    def read(self) -> Optional[Tuple[int, np.ndarray, float]]:
+        """
+        Espera el frame más antiguo del buffer.
+
+        Returns:
+            (número de frame desde 1, frame BGR, instante de captura en perf_counter)
+            o None al terminar el stream
+        """
+        with self._condition:
+            while not self._buffer and not self._finished:
+                self._condition.wait(timeout=0.1)
+            if self._buffer:
+                self.frames_read += 1
+                return self._buffer.popleft()
+        if self._error is not None:
+            raise RuntimeError(f"Error capturando el stream: {self._error}") from self._error
+        return None
+
+    def get(self, prop_id: int) -> float:
+        return self.capture.get(prop_id)
+
+    def isOpened(self) -> bool:
+        return self.capture.isOpened()
+
+    def release(self):
+        """Detiene la captura y libera la fuente subyacente."""
+        self._stop_event.set()
+        self._thread.join()
+        self.capture.release()
+
+    def get_report(self) -> Dict:
+        """Frames capturados, descartados por desborde y fps real de captura."""
+        end = self.capture_end or time.perf_counter()
+        duration = end - self.capture_start if self.capture_start is not None else 0.0
+        return {
+            'buffer_size': self.buffer_size,
+            'replay_realtime': self.replay_realtime,
+            'frames_captured': self.frames_captured,
+            'frames_overflowed': self.frames_overflowed,
+            'frames_read': self.frames_read,
+            'capture_fps': self.frames_captured / duration if duration > 0 else 0.0,
+        }
+
+
+# Backends de E/S de video
+VIDEO_BACKENDS = ("opencv", "ffmpeg")
+
+
+def ffmpeg_available(ffmpeg_bin: str = "ffmpeg") -> bool:
+    """True si el ejecutable de ffmpeg está en el PATH."""
+    return shutil.which(ffmpeg_bin) is not None
+
+
+class FFmpegFrameReader:
+    """
+    Lector de frames que decodifica con ffmpeg y recibe `rawvideo` bgr24 por
+    un pipe.
+
+    Cada frame se lee con `readinto` directamente sobre el array numpy del
+    frame, sin copias intermedias. Expone la interfaz de lectura de
+    cv2.VideoCapture (`read()`, `get()`, `set()` para CAP_PROP_POS_FRAMES,
+    `isOpened()`, `release()`), por lo que puede usarse también como captura
+    de PrefetchFrameSource.
+    """
+
+    def __init__(self, path: str, ffmpeg_bin: str = "ffmpeg"):
+        """
+        Args:
+            path: Ruta al video de entrada
+            ffmpeg_bin: Ejecutable de ffmpeg
+        """
+        self.path = str(path)
+        self.ffmpeg_bin = ffmpeg_bin
+
+        # Metadatos (fps, tamaño, nº de frames) vía OpenCV, sin decodificar
+        probe = cv2.VideoCapture(self.path)
+        self._opened = probe.isOpened()
+        self.fps = probe.get(cv2.CAP_PROP_FPS) or 30.0
+        self.width = int(probe.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = int(probe.get(cv2.CAP_PROP_FRAME_COUNT))
+        probe.release()
+
+        self.frame_bytes = self.width * self.height * 3
+        self._frame_shape = (self.height, self.width, 3)
+        self._process = None
+        self._position = 0
+
+        if self._opened:
+            self._start(0)
+
+    def _start(self, start_frame: int):
+        """(Re)lanza ffmpeg decodificando desde `start_frame`."""
+        self._stop()
+        cmd = [self.ffmpeg_bin, "-v", "error", "-nostdin"]
+        if start_frame > 0:
+            # -ss antes de -i: búsqueda rápida y exacta (ffmpeg decodifica desde el keyframe previo)
+            cmd += ["-ss", f"{start_frame / self.fps:.6f}"]
+        cmd += ["-i", self.path, "-map", "0:v:0", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        self._process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=self.frame_bytes
+        )
+        self._position = start_frame
+
+    def _stop(self):
+        if self._process is not None:
+            self._process.stdout.close()
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Lee el siguiente frame (misma firma que cv2.VideoCapture.read).
+
+        Si se pasa `image` (array contiguo HxWx3 uint8) se escribe sobre él;
+        si no, se asigna un array nuevo (como cv2.VideoCapture.read).
+        """
+        if self._process is None:
+            return False, None
+
+        target = image
+        if target is None or target.shape != self._frame_shape or not target.flags.c_contiguous:
+            target = np.empty(self._frame_shape, dtype=np.uint8)
+
+        view = memoryview(target.reshape(-1))
+        received = 0
+        while received < self.frame_bytes:
+            n = self._process.stdout.readinto(view[received:])
+            if not n:
+                # Fin del stream (o frame truncado)
+                return False, None
+            received += n
+
+        self._position += 1
+        return True, target
+
+    def get(self, prop_id: int) -> float:
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position)
+        return 0.0
+
+    def set(self, prop_id: int, value: float) -> bool:
+        """Sólo soporta CAP_PROP_POS_FRAMES (relanza ffmpeg en esa posición)."""
+        if prop_id != cv2.CAP_PROP_POS_FRAMES or not self._opened:
+            return False
+        self._start(max(0, int(value)))
+        return True
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def release(self):
+        """Termina el proceso de ffmpeg."""
+        self._stop()
+
+
+class FFmpegVideoWriter:
+    """
+    Escritor de video que envía frames `rawvideo` bgr24 por stdin a ffmpeg y
+    codifica en H.264 (libx264, yuv420p, MP4 con faststart).
+
+    El frame se pasa al pipe como memoryview, sin copias intermedias. Los
+    mensajes de ffmpeg van a un archivo temporal (un pipe sin leer podría
+    llenarse y bloquear la codificación) y se leen sólo si falla.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fps: float,
+        frame_size: Tuple[int, int],
+        crf: int = 23,
+        preset: str = "veryfast",
+        ffmpeg_bin: str = "ffmpeg"
+    ):
+        """
+        Args:
+            path: Ruta del video de salida
+            fps: Frames por segundo
+            frame_size: (ancho, alto) de los frames
+            crf: Calidad constante de x264 (menor = más calidad, más tamaño)
+            preset: Preset de velocidad de x264
+            ffmpeg_bin: Ejecutable de ffmpeg
+        """
+        self.path = str(path)
+        self.width, self.height = int(frame_size[0]), int(frame_size[1])
+        self.frame_bytes = self.width * self.height * 3
+
+        cmd = [
+            ffmpeg_bin, "-y", "-v", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{self.width}x{self.height}", "-r", f"{fps}",
+            "-i", "-",
+            "-an", "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+        ]
+        if self.width % 2 or self.height % 2:
+            # yuv420p requiere dimensiones pares
+            cmd += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        cmd.append(self.path)
+
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr)
+        self._closed = False
+
+    def write(self, frame: np.ndarray):
+        """Envía un frame a ffmpeg (misma firma que cv2.VideoWriter.write)."""
+        if frame.shape != (self.height, self.width, 3):
+            raise ValueError(
+                f"Frame de tamaño {frame.shape[1]}x{frame.shape[0]}, se esperaba {self.width}x{self.height}"
+            )
+        if not frame.flags.c_contiguous:
+            frame = np.ascontiguousarray(frame)
+        try:
+            self._process.stdin.write(memoryview(frame.reshape(-1)))
+        except BrokenPipeError:
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+            raise RuntimeError(f"ffmpeg terminó inesperadamente: {self._read_errors()}")
+
+    def _read_errors(self) -> str:
+        try:
+            self._stderr.seek(0)
+            return self._stderr.read().decode(errors="replace").strip()
+        except Exception:
+            return ""
+
+    def isOpened(self) -> bool:
+        return self._process.poll() is None
+
+    def release(self):
+        """Cierra stdin y espera a que ffmpeg termine de escribir el archivo."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        errors = self._read_errors()
+        self._stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg falló al codificar {self.path}: {errors}")
+
+
+def seek_frame(capture, frame_index: int, preroll: int = 60) -> bool:
+    """
+    Posiciona `capture` para que el próximo `read()` devuelva exactamente el
+    frame `frame_index` (contando desde 0).
+
+    FFmpegFrameReader ya busca con precisión (`-ss` antes de `-i`). En
+    cv2.VideoCapture, `CAP_PROP_POS_FRAMES` puede caer en un keyframe o unos
+    frames antes o después según el contenedor, así que se salta `preroll`
+    frames antes del objetivo y se decodifica hacia adelante (`grab()`, sin
+    convertir a BGR) verificando la marca de tiempo de cada frame; si el salto
+    cayó después del objetivo o el video no tiene marcas de tiempo, se
+    decodifica desde el inicio.
+
+    Returns:
+        False si el video termina antes de `frame_index`
+    """
+    frame_index = max(0, int(frame_index))
+    if isinstance(capture, FFmpegFrameReader) or frame_index == 0:
+        return capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index) or frame_index == 0
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    start = max(0, frame_index - preroll)
+    if start > 0:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        position = None
+        while capture.grab():
+            msec = capture.get(cv2.CAP_PROP_POS_MSEC)
+            position = int(round(msec * fps / 1000.0))
+            if msec <= 0 or position >= frame_index - 1:
+                break
+        if position == frame_index - 1 and msec > 0:
+            return True
+
+    # Búsqueda secuencial desde el inicio (exacta en cualquier contenedor)
+    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame_index):
+        if not capture.grab():
+            return False
+    return True
+
+
+def _resolve_backend(backend: str) -> str:
+    """Valida el backend y cae a OpenCV si ffmpeg no está instalado."""
+    if backend not in VIDEO_BACKENDS:
+        raise ValueError(f"Backend de video desconocido: {backend} (opciones: {', '.join(VIDEO_BACKENDS)})")
+    if backend == "ffmpeg" and not ffmpeg_available():
+        print("⚠️ ffmpeg no encontrado en el PATH, usando OpenCV para la E/S de video")
+        return "opencv"
+    return backend
+
+
+def open_video_reader(path: str, backend: str = "opencv"):
+    """Abre un video para lectura con el backend indicado ('opencv' o 'ffmpeg')."""
+    if _resolve_backend(backend) == "ffmpeg":
+        return FFmpegFrameReader(path)
+    return cv2.VideoCapture(str(path))
+
+
+def open_video_writer(path: str, fps: float, frame_size: Tuple[int, int], backend: str = "opencv"):
+    """
+    Abre un video para escritura con el backend indicado.
+
+    'opencv' usa cv2.VideoWriter con fourcc mp4v; 'ffmpeg' codifica H.264.
+    """
+    if _resolve_backend(backend) == "ffmpeg":
+        return FFmpegVideoWriter(path, fps, frame_size)
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    return cv2.VideoWriter(str(path), fourcc, fps, frame_size)
+
+
+def concat_videos(paths: List[str], target_path: str, backend: str = "opencv"):
+    """
+    Une videos consecutivos (mismo tamaño, fps y códec) en `target_path`.
+
+    Con ffmpeg se usa el demuxer concat sin recodificar; con OpenCV los
+    frames se leen y se vuelven a escribir.
+    """
+    paths = [str(p) for p in paths]
+    if not paths:
+        raise ValueError("No hay videos para unir")
+
+    if _resolve_backend(backend) == "ffmpeg":
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as list_file:
+            for path in paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                list_file.write(f"file '{escaped}'\n")
+        try:
+            result = subprocess.run(
+                ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0",
+                 "-i", list_file.name, "-c", "copy", "-movflags", "+faststart", str(target_path)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+        finally:
+            os.unlink(list_file.name)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg no pudo unir los videos: {result.stderr.decode(errors='replace').strip()}")
+        return
+
+    first = cv2.VideoCapture(paths[0])
+    fps = first.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(first.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(first.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    first.release()
+
+    out = open_video_writer(target_path, fps, (width, height), backend="opencv")
+    try:
+        for path in paths:
+            cap = cv2.VideoCapture(path)
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    out.write(frame)
+            finally:
+                cap.release()
+    finally:
+        out.release()
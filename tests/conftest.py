@@ -0,0 +1,144 @@
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+# Los módulos se importan como `src.*` desde la raíz del repositorio
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# --- Partido sintético para las pruebas de extremo a extremo ---
+# Jugadores = rectángulos de dos colores (camiseta/pantalón) sobre césped,
+# pelota = círculo blanco; la cámara se desplaza por tramos.
+
+WIDTH, HEIGHT = 1280, 720
+SCALE_X, SCALE_Y, TOP = 24.0, 8.0, 150.0
+FIELD = (40, 140, 40)
+COLORS = {
+    'team1': ((30, 30, 210), (240, 240, 240)),
+    'team2': ((210, 80, 20), (30, 30, 30)),
+    'referee': ((0, 230, 230), (20, 20, 20)),
+}
+_rng = np.random.RandomState(7)
+PLAYERS = (
+    [('team1', 20 + 6 * (k % 4) + _rng.rand() * 5, 8 + 6.5 * k) for k in range(10)]
+    + [('team2', 45 + 5 * (k % 4) + _rng.rand() * 5, 5 + 6.5 * k) for k in range(10)]
+    + [('referee', 42, 30)]
+)
+
+
+def _camera_x(i: int) -> float:
+    # Paneos alternados con tramos de cámara quieta
+    if (i // 50) % 2 == 0:
+        return 40.0 + 8 * np.sin(i / 25.0 * 0.8)
+    return 40.0 + 8 * np.sin((i // 50) * 50 / 25.0 * 0.8)
+
+
+def _to_image(wx: float, wy: float, cx: float):
+    return (wx - cx) * SCALE_X + WIDTH / 2, TOP + wy * SCALE_Y
+
+
+def render_match_frame(i: int) -> np.ndarray:
+    frame = np.full((HEIGHT, WIDTH, 3), FIELD, np.uint8)
+    cx = _camera_x(i)
+    for wx in (0, 52.5, 105):
+        x, _ = _to_image(wx, 0, cx)
+        cv2.line(frame, (int(x), int(TOP)), (int(x), int(TOP + 68 * SCALE_Y)), (255, 255, 255), 2)
+    for j, (kind, wx, wy) in enumerate(PLAYERS):
+        x, y = _to_image(wx + 3 * np.sin(i / 20.0 + j), wy + 2 * np.cos(i / 25.0 + j), cx)
+        shirt, pants = COLORS[kind]
+        cv2.rectangle(frame, (int(x - 12), int(y - 70)), (int(x + 12), int(y - 35)), shirt, -1)
+        cv2.rectangle(frame, (int(x - 12), int(y - 35)), (int(x + 12), int(y)), pants, -1)
+    bx, by = _to_image(40 + 10 * np.sin(i / 15.0), 34 + 15 * np.cos(i / 22.0), cx)
+    cv2.circle(frame, (int(bx), int(by)), 7, (250, 250, 250), -1)
+    return frame
+
+
+class FakeDetector:
+    """Detector con la interfaz de un YOLO de ultralytics: detecta las manchas del partido sintético."""
+
+    def __init__(self, names, kind: str):
+        self.names = names
+        self.kind = kind
+        self.frames = 0
+
+    def predict(self, source, **kwargs):
+        batch = source if isinstance(source, list) else [source]
+        self.frames += len(batch)
+        results = []
+        for frame in batch:
+            not_field = (np.abs(frame.astype(np.int16) - FIELD) >= 25).any(axis=2)
+            _, _, stats, _ = cv2.connectedComponentsWithStats(not_field.astype(np.uint8), 8)
+            rows = []
+            for x, y, w, h, _ in stats[1:]:
+                if h > 40 and 10 <= w < 60:
+                    if self.kind == 'player':
+                        rows.append([x, y, x + w, y + h, 0.9, 0])
+                elif 6 <= w <= 24 and 6 <= h <= 24:
+                    rows.append([x, y, x + w, y + h, 0.6, 1 if self.kind == 'player' else 0])
+            boxes = torch.tensor(rows, dtype=torch.float32).reshape(-1, 6)
+            results.append(Results(orig_img=frame, path='', names=self.names, boxes=boxes))
+        return results
+
+    __call__ = predict
+
+
+class FakePitch:
+    """Modelo de keypoints del campo: proyecta los puntos conocidos según la posición de la cámara."""
+
+    names = {0: 'pitch'}
+
+    def __init__(self):
+        from src.utils.radar import SoccerPitchConfiguration
+        self.keypoints_map = SoccerPitchConfiguration(model_type='soccana').keypoints_map
+
+    def __call__(self, source, **kwargs):
+        batch = source if isinstance(source, list) else [source]
+        results = []
+        for frame in batch:
+            cx = self._camera_x(frame)
+            keypoints = np.zeros((1, 29, 3), np.float32)
+            for idx, (wx, wy) in self.keypoints_map.items():
+                x, y = _to_image(wx, wy, cx)
+                if 0 <= x < frame.shape[1] and 0 <= y < frame.shape[0]:
+                    keypoints[0, idx] = (x, y, 0.9)
+            boxes = torch.tensor([[0, 0, frame.shape[1], frame.shape[0], 0.9, 0]], dtype=torch.float32)
+            results.append(Results(orig_img=frame, path='', names=self.names, boxes=boxes,
+                                   keypoints=torch.from_numpy(keypoints)))
+        return results
+
+    predict = __call__
+
+    @staticmethod
+    def _camera_x(frame: np.ndarray) -> float:
+        # La cámara se deduce de la línea blanca visible (0, 52.5 o 105 m)
+        white = np.where((frame[int(TOP) + 5] > 200).all(axis=1))[0]
+        if frame.shape[1] != WIDTH or len(white) == 0:
+            return 40.0
+        candidates = [wx - (white.mean() - WIDTH / 2) / SCALE_X for wx in (0, 52.5, 105)]
+        candidates = [c for c in candidates if 25 <= c <= 60]
+        return min(candidates, key=lambda c: abs(c - 40)) if candidates else 40.0
+
+
+@pytest.fixture(scope='session')
+def match_video(tmp_path_factory) -> str:
+    """Video mp4 de 60 frames del partido sintético."""
+    path = str(tmp_path_factory.mktemp('match') / 'match.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 25, (WIDTH, HEIGHT))
+    for i in range(60):
+        writer.write(render_match_frame(i))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def match_models():
+    """(player_model, ball_model, pitch_model) falsos para el partido sintético."""
+    return (
+        FakeDetector({0: 'person', 1: 'sports ball'}, 'player'),
+        FakeDetector({0: 'ball'}, 'ball'),
+        FakePitch(),
+    )
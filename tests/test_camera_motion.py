@@ -0,0 +1,44 @@
+"""Inferencia de keypoints condicionada al movimiento de cámara (src/utils/camera_motion.py)."""
+
+import cv2
+import numpy as np
+
+from src.utils.camera_motion import CameraMotionGate
+
+WIDTH, HEIGHT = 640, 360
+
+
+def _scene(seed: int) -> np.ndarray:
+    """Textura amplia (más grande que el frame) para simular paneos recortando."""
+    noise = np.random.default_rng(seed).uniform(0, 255, (HEIGHT + 100, WIDTH + 400, 3)).astype(np.uint8)
+    return cv2.GaussianBlur(noise, (0, 0), 3)
+
+
+def _view(scene: np.ndarray, offset_x: int) -> np.ndarray:
+    return np.ascontiguousarray(scene[50:50 + HEIGHT, offset_x:offset_x + WIDTH])
+
+
+def test_static_camera_reinfers_only_every_max_interval():
+    scene = _scene(0)
+    gate = CameraMotionGate(motion_threshold=0.01, max_interval=10)
+    decisions = [gate.should_infer(_view(scene, 100), i) for i in range(1, 26)]
+
+    assert [i for i, infer in enumerate(decisions, start=1) if infer] == [1, 11, 21]
+    assert gate.get_report()['pitch_inferences'] == 3
+    assert gate.get_report()['pitch_skipped'] == 22
+
+
+def test_pan_accumulates_until_threshold():
+    scene = _scene(1)
+    # 2 px por frame = 0.3% del ancho: umbral de 1% alcanzado cada 4 frames
+    gate = CameraMotionGate(motion_threshold=0.01, max_interval=100)
+    decisions = [gate.should_infer(_view(scene, 100 + 2 * i), i) for i in range(1, 14)]
+
+    assert [i for i, infer in enumerate(decisions, start=1) if infer] == [1, 5, 9, 13]
+
+
+def test_camera_cut_forces_inference():
+    gate = CameraMotionGate(motion_threshold=0.5, max_interval=100)
+    assert gate.should_infer(_view(_scene(2), 100), 1)
+    assert not gate.should_infer(_view(_scene(2), 100), 2)
+    assert gate.should_infer(_view(_scene(3), 100), 3)
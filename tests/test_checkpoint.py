@@ -0,0 +1,149 @@
+"""Checkpoints: guardar/cargar y continuar el análisis con el estado restaurado."""
+
+import json
+
+import cv2
+import numpy as np
+import pytest
+import supervision as sv
+
+from src.controllers.process_video import FrameContext, MatchAnalyzer, process_video
+from src.utils.checkpoint import RunCheckpoint
+from tests.conftest import FakeDetector
+
+WIDTH, HEIGHT = 640, 360
+SHIRTS = [(0, 0, 220)] * 4 + [(220, 60, 0)] * 4  # BGR: 4 rojos y 4 azules
+
+
+class _Names:
+    """Modelo mínimo: identify_model_classes sólo necesita `names`."""
+    names = {0: 'person'}
+
+
+def _analyzer() -> MatchAnalyzer:
+    return MatchAnalyzer(
+        player_model=_Names(), ball_model=None, pitch_model=None, conf=0.3,
+        detection_mode='players_only', img_size=640, full_field_approx=False,
+        width=WIDTH, height=HEIGHT
+    )
+
+
+def _context(index: int) -> FrameContext:
+    """Frame con 8 jugadores que se desplazan en horizontal."""
+    frame = np.full((HEIGHT, WIDTH, 3), (40, 140, 40), dtype=np.uint8)
+    boxes = []
+    for i, shirt in enumerate(SHIRTS):
+        x = 30 + 70 * i + 2 * index
+        y = 80 + 20 * (i % 3)
+        cv2.rectangle(frame, (x, y), (x + 30, y + 40), shirt, -1)
+        cv2.rectangle(frame, (x, y + 40), (x + 30, y + 70), (20, 20, 20), -1)
+        boxes.append([x, y, x + 30, y + 70])
+    ctx = FrameContext(index, frame)
+    ctx.player_detections = sv.Detections(
+        xyxy=np.array(boxes, dtype=np.float32),
+        confidence=np.full(len(boxes), 0.9, dtype=np.float32),
+        class_id=np.zeros(len(boxes), dtype=int),
+    )
+    ctx.ball_detections = sv.Detections.empty()
+    return ctx
+
+
+def _classify(analyzer: MatchAnalyzer, indices) -> list:
+    contexts = [_context(i) for i in indices]
+    analyzer.classify_frames(contexts)
+    return contexts
+
+
+def test_save_load_round_trip(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path / "out.mp4"))
+    part = checkpoint.part_path(0)
+    checkpoint.parts_dir.mkdir()
+    open(part, 'wb').close()
+    stale = checkpoint.part_path(1)
+    open(stale, 'wb').close()
+    settings = {'conf': 0.3, 'batch_size': 4}
+
+    checkpoint.save(40, b'state', [part], settings, detect_state=b'detect')
+    data = checkpoint.load(settings)
+
+    assert data['frame_index'] == 40
+    assert data['state'] == b'state'
+    assert data['detect_state'] == b'detect'
+    assert data['parts'] == [part]
+    # Las partes posteriores al checkpoint se descartan
+    assert not (tmp_path / "out_parts" / "part_0001.mp4").exists()
+    assert checkpoint.load({'conf': 0.5, 'batch_size': 4}) is None
+
+    checkpoint.clear()
+    assert not checkpoint.path.exists()
+    assert not checkpoint.parts_dir.exists()
+
+
+def test_resumed_analyzer_matches_uninterrupted_run(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path / "out.mp4"))
+
+    reference = _analyzer()
+    reference_contexts = _classify(reference, range(1, 61))
+
+    interrupted = _analyzer()
+    _classify(interrupted, range(1, 31))
+    checkpoint.save(30, interrupted.get_state(), [], {})
+
+    resumed = _analyzer()
+    resumed.load_state(checkpoint.load({})['state'])
+    resumed_contexts = _classify(resumed, range(31, 61))
+
+    # Sin el estado restaurado, los colores se reaprenden desde el frame 31 y los
+    # equipos pueden quedar invertidos
+    assert reference_contexts[-1].team1_mask.sum() == 4
+    for expected, actual in zip(reference_contexts[30:], resumed_contexts):
+        np.testing.assert_array_equal(expected.tracked_persons.tracker_id, actual.tracked_persons.tracker_id)
+        np.testing.assert_array_equal(expected.team1_mask, actual.team1_mask)
+        np.testing.assert_array_equal(expected.team2_mask, actual.team2_mask)
+    assert resumed.frame_count == reference.frame_count
+    assert resumed.frames_detected == reference.frames_detected
+
+
+class _CrashingDetector(FakeDetector):
+    """Detector que falla al llegar a un frame (simula un corte del proceso)."""
+
+    def __init__(self, names, kind: str, crash_at: int):
+        super().__init__(names, kind)
+        self.crash_at = crash_at
+
+    def predict(self, source, **kwargs):
+        if self.frames + len(source if isinstance(source, list) else [source]) >= self.crash_at:
+            raise RuntimeError("proceso interrumpido")
+        return super().predict(source, **kwargs)
+
+    __call__ = predict
+
+
+def test_interrupted_run_resumes_to_same_stats(tmp_path, match_video, match_models):
+    player_model, ball_model, pitch_model = match_models
+    options = dict(batch_size=4, checkpoint_every=20, ball_search='roi')
+
+    reference = tmp_path / "reference" / "out.mp4"
+    reference.parent.mkdir()
+    process_video(match_video, str(reference), player_model, ball_model, pitch_model, **options)
+
+    target = tmp_path / "resumed" / "out.mp4"
+    target.parent.mkdir()
+    crashing = _CrashingDetector(player_model.names, 'player', crash_at=50)
+    with pytest.raises(RuntimeError, match="interrumpido"):
+        process_video(match_video, str(target), crashing, ball_model, pitch_model, **options)
+    assert RunCheckpoint(str(target)).path.exists()
+
+    resumed_model = FakeDetector(player_model.names, 'player')
+    process_video(match_video, str(target), resumed_model, ball_model, pitch_model, resume=True, **options)
+    # Sólo se procesan los frames posteriores al último checkpoint (40)
+    assert resumed_model.frames == 20
+
+    with open(reference.parent / "out_stats.json") as f:
+        expected = json.load(f)
+    with open(target.parent / "out_stats.json") as f:
+        assert json.load(f) == expected
+    capture = cv2.VideoCapture(str(target))
+    assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == 60
+    capture.release()
+    assert not RunCheckpoint(str(target)).path.exists()
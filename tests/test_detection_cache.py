@@ -0,0 +1,89 @@
+"""Grabación y reproducción de la caché de detecciones."""
+
+import numpy as np
+import supervision as sv
+
+from src.controllers.process_video import FrameContext
+from src.utils.detection_cache import DetectionCache, video_fingerprint
+
+
+def _context(index: int, rng: np.random.Generator) -> FrameContext:
+    ctx = FrameContext(index, None)
+    ctx.detected = index % 3 != 0
+    ctx.audit = index % 6 == 0
+    if ctx.detected or ctx.audit:
+        n = int(rng.integers(0, 5))
+        ctx.player_detections = sv.Detections(
+            xyxy=rng.uniform(0, 500, (n, 4)).astype(np.float32),
+            confidence=rng.uniform(0, 1, n).astype(np.float32),
+            class_id=rng.integers(0, 3, n).astype(np.int32),
+        )
+        ctx.ball_detections = sv.Detections.empty() if index % 2 else sv.Detections(
+            xyxy=np.array([[10, 10, 20, 20]], dtype=np.float32),
+            confidence=np.array([0.9], dtype=np.float32),
+            class_id=np.array([0], dtype=np.int32),
+        )
+    if ctx.detected and index % 4 != 1:
+        ctx.pitch_reused = index % 5 == 0
+        ctx.pitch_keypoints = (
+            rng.uniform(0, 500, (29, 2)).astype(np.float32),
+            rng.uniform(0, 1, 29).astype(np.float32),
+        )
+    return ctx
+
+
+def test_record_save_load_replay_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    recorded = [_context(i, rng) for i in range(1, 41)]
+    settings = {'conf': 0.3, 'batch_size': 4}
+
+    cache = DetectionCache(tmp_path / "cache.npz", settings)
+    for start in range(0, len(recorded), 4):
+        cache.record(recorded[start:start + 4])
+    cache.save()
+
+    replay = DetectionCache(tmp_path / "cache.npz", settings)
+    assert replay.load()
+    assert len(replay) == len(recorded)
+    replayed = replay.replay([FrameContext(ctx.index, None) for ctx in recorded])
+
+    for original, restored in zip(recorded, replayed):
+        assert restored.detected == original.detected
+        assert restored.audit == original.audit
+        assert restored.pitch_reused == original.pitch_reused
+        for name in ('player_detections', 'ball_detections'):
+            a, b = getattr(original, name), getattr(restored, name)
+            if a is None:
+                assert b is None
+                continue
+            assert len(a) == len(b)
+            if len(a):
+                np.testing.assert_array_equal(a.xyxy, b.xyxy)
+                np.testing.assert_array_equal(a.confidence, b.confidence)
+                np.testing.assert_array_equal(a.class_id, b.class_id)
+        if original.pitch_keypoints is None:
+            assert restored.pitch_keypoints is None
+        else:
+            np.testing.assert_array_equal(original.pitch_keypoints[0], restored.pitch_keypoints[0])
+            np.testing.assert_array_equal(original.pitch_keypoints[1], restored.pitch_keypoints[1])
+    assert replay.frames_replayed == len(recorded)
+
+
+def test_cache_key_depends_on_settings_and_video(tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(bytes(range(256)) * 4096)
+    models = {'player': None}
+
+    base = DetectionCache.for_run(str(video), models, {'batch_size': 1}, cache_dir=tmp_path)
+    assert DetectionCache.for_run(str(video), models, {'batch_size': 1}, cache_dir=tmp_path).path == base.path
+    assert DetectionCache.for_run(str(video), models, {'batch_size': 4}, cache_dir=tmp_path).path != base.path
+
+    fingerprint = video_fingerprint(str(video))
+    data = bytearray(video.read_bytes())
+    data[-1] ^= 0xFF
+    video.write_bytes(bytes(data))
+    assert video_fingerprint(str(video)) != fingerprint
+
+
+def test_missing_cache_is_not_replayed(tmp_path):
+    assert not DetectionCache(tmp_path / "missing.npz", {}).load()
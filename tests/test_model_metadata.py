@@ -0,0 +1,78 @@
+"""Caché persistente de metadatos de modelos (src/models/model_metadata.py)."""
+
+import json
+
+from src.models.model_metadata import cached_model_metadata
+
+
+class _Weights:
+    """Modelo mínimo: la caché sólo necesita la ruta de sus pesos."""
+
+    def __init__(self, path):
+        self.ckpt_path = str(path)
+
+
+def _counting(value):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return value
+    return compute, calls
+
+
+def test_metadata_is_computed_once_per_weights(tmp_path):
+    weights = tmp_path / "pitch.pt"
+    weights.write_bytes(b"pesos")
+    cache_path = tmp_path / "metadata.json"
+    compute, calls = _counting({'num_keypoints': 29, 'model_type': 'soccana'})
+
+    first = cached_model_metadata(_Weights(weights), 'pitch', compute, cache_path=cache_path)
+    second = cached_model_metadata(_Weights(weights), 'pitch', compute, cache_path=cache_path)
+
+    assert first == second == {'num_keypoints': 29, 'model_type': 'soccana'}
+    assert len(calls) == 1
+    with open(cache_path) as f:
+        data = json.load(f)
+    assert [entry['weights'] for entry in data['models'].values()] == ['pitch.pt']
+
+    # Otro campo del mismo modelo se calcula y se agrega a la misma entrada
+    other, other_calls = _counting([0, 1])
+    assert cached_model_metadata(_Weights(weights), 'player_classes', other, cache_path=cache_path) == [0, 1]
+    assert len(other_calls) == 1
+    with open(cache_path) as f:
+        assert len(json.load(f)['models']) == 1
+
+
+def test_changed_weights_are_recomputed(tmp_path):
+    weights = tmp_path / "pitch.pt"
+    weights.write_bytes(b"pesos")
+    cache_path = tmp_path / "metadata.json"
+    cached_model_metadata(_Weights(weights), 'pitch', lambda: 'viejo', cache_path=cache_path)
+
+    weights.write_bytes(b"pesos reentrenados")
+    assert cached_model_metadata(_Weights(weights), 'pitch', lambda: 'nuevo', cache_path=cache_path) == 'nuevo'
+
+
+def test_models_without_weights_are_not_cached(tmp_path):
+    cache_path = tmp_path / "metadata.json"
+    compute, calls = _counting('sin caché')
+
+    class _InMemory:
+        names = {0: 'person'}
+
+    for _ in range(2):
+        assert cached_model_metadata(_InMemory(), 'pitch', compute, cache_path=cache_path) == 'sin caché'
+    assert len(calls) == 2
+    assert not cache_path.exists()
+
+
+def test_corrupt_or_old_cache_is_ignored(tmp_path):
+    weights = tmp_path / "ball.pt"
+    weights.write_bytes(b"pesos")
+    cache_path = tmp_path / "metadata.json"
+    cache_path.write_text("{no es json")
+    assert cached_model_metadata(_Weights(weights), 'ball_classes', lambda: [0], cache_path=cache_path) == [0]
+
+    cache_path.write_text(json.dumps({'version': 0, 'models': {}}))
+    assert cached_model_metadata(_Weights(weights), 'ball_classes', lambda: [1], cache_path=cache_path) == [1]
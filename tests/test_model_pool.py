@@ -0,0 +1,127 @@
+"""Pool de modelos compartido por las sesiones de la app (src/models/model_pool.py)."""
+
+import pickle
+import threading
+import time
+
+import pytest
+
+import src.models.model_pool as model_pool
+from src.models.model_pool import ModelPool, PooledModel
+
+MB = 1024 * 1024
+
+
+class _FakeModel:
+    """Modelo que registra cuántas inferencias corren a la vez."""
+
+    def __init__(self, weights_path):
+        self.weights_path = str(weights_path)
+        self.running = 0
+        self.max_running = 0
+
+    def predict(self, frame, **kwargs):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        time.sleep(0.005)
+        self.running -= 1
+        return [frame]
+
+    def __call__(self, frame, **kwargs):
+        return self.predict(frame, **kwargs)
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Reemplaza la carga real por _FakeModel y registra cada carga."""
+    calls = []
+
+    def load(weights_path, backend="pytorch", img_size=640, precision="fp32"):
+        calls.append((str(weights_path), backend, precision))
+        time.sleep(0.02)  # Carga lenta: deja solapar pedidos concurrentes
+        return _FakeModel(weights_path)
+
+    monkeypatch.setattr(model_pool, 'load_inference_model', load)
+    return calls
+
+
+def _weights(tmp_path, name: str, size_mb: float = 1.0) -> str:
+    path = tmp_path / name
+    path.write_bytes(b"\0" * int(size_mb * MB))
+    return str(path)
+
+
+def test_hits_reuse_the_loaded_model(tmp_path, loads):
+    pool = ModelPool(budget_mb=10)
+    weights = _weights(tmp_path, "a.pt")
+
+    first = pool.get(weights)
+    second = pool.get(weights)
+    onnx = pool.get(weights, backend="onnx")
+
+    assert isinstance(first, PooledModel)
+    assert first._model is second._model
+    assert onnx._model is not first._model
+    assert len(loads) == 2
+    report = pool.get_report()
+    assert (report['hits'], report['misses'], report['evictions']) == (1, 2, 0)
+
+
+def test_least_recently_used_model_is_evicted(tmp_path, loads):
+    pool = ModelPool(budget_mb=2.5)
+    a, b, c = (_weights(tmp_path, f"{name}.pt") for name in "abc")
+
+    pool.get(a)
+    pool.get(b)
+    pool.get(a)  # b queda como el menos usado
+    pool.get(c)
+
+    assert [m['weights'] for m in pool.get_report()['models']] == ['a.pt', 'c.pt']
+    assert pool.evictions == 1
+    assert pool.memory_bytes() == 2 * MB
+
+    pool.get(b)  # Desalojado: se vuelve a cargar
+    assert [path for path, _, _ in loads] == [a, b, c, b]
+
+
+def test_model_over_budget_is_still_kept(tmp_path, loads):
+    pool = ModelPool(budget_mb=0.5)
+    pool.get(_weights(tmp_path, "a.pt"))
+    pool.get(_weights(tmp_path, "big.pt", size_mb=2))
+    assert [m['weights'] for m in pool.get_report()['models']] == ['big.pt']
+
+
+def test_concurrent_requests_load_once(tmp_path, loads):
+    pool = ModelPool(budget_mb=10)
+    weights = _weights(tmp_path, "a.pt")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get(weights))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert len({id(result._model) for result in results}) == 1
+    assert pool.hits == 7 and pool.misses == 1
+
+
+def test_pooled_model_serializes_inference(tmp_path, loads):
+    pool = ModelPool(budget_mb=10)
+    weights = _weights(tmp_path, "a.pt")
+    sessions = [pool.get(weights) for _ in range(4)]
+
+    def infer(model):
+        for i in range(5):
+            assert model(i) == [i]
+            assert model.predict(i) == [i]
+
+    threads = [threading.Thread(target=infer, args=(model,)) for model in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sessions[0].max_running == 1
+    # Al serializarse se envía el modelo sin envolver
+    assert isinstance(pickle.loads(pickle.dumps(sessions[0])), _FakeModel)
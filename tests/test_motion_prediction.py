@@ -0,0 +1,121 @@
+"""Predicción de movimiento del modo por saltos (src/utils/motion_prediction.py)."""
+
+import numpy as np
+import supervision as sv
+
+from src.utils.motion_prediction import BallSearchWindow, StrideDriftMonitor, TrackMotionPredictor, box_iou_matrix
+
+
+def _tracked(boxes, tracker_ids) -> sv.Detections:
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return sv.Detections(
+        xyxy=boxes,
+        confidence=np.full(len(boxes), 0.8, dtype=np.float32),
+        class_id=np.zeros(len(boxes), dtype=int),
+        tracker_id=np.asarray(tracker_ids, dtype=int),
+    )
+
+
+def test_predictor_extrapolates_constant_velocity():
+    predictor = TrackMotionPredictor(velocity_alpha=1.0)
+    predictor.update(_tracked([[100, 100, 120, 140], [300, 50, 320, 90]], [1, 2]), frame_index=1)
+    predictor.update(_tracked([[110, 100, 130, 140], [300, 56, 320, 96]], [1, 2]), frame_index=3)
+
+    predicted = predictor.predict(5, frame_width=640, frame_height=360)
+
+    np.testing.assert_allclose(predicted.xyxy, [[120, 100, 140, 140], [300, 62, 320, 102]])
+    assert predicted.tracker_id.tolist() == [1, 2]
+    assert predicted.class_id.tolist() == [0, 0]
+
+
+def test_predictor_clips_to_frame_and_forgets_stale_tracks():
+    predictor = TrackMotionPredictor(velocity_alpha=1.0, max_gap=5)
+    predictor.update(_tracked([[600, 10, 630, 50]], [1]), frame_index=1)
+    predictor.update(_tracked([[620, 10, 650, 50]], [1]), frame_index=2)
+    predicted = predictor.predict(10, frame_width=640, frame_height=360)
+    assert predicted.xyxy[0, 2] == 639
+
+    # El track 1 no aparece en la última actualización: no se predice
+    predictor.update(_tracked([[10, 10, 30, 50]], [2]), frame_index=10)
+    assert predictor.predict(11, 640, 360).tracker_id.tolist() == [2]
+    assert 1 not in predictor._tracks
+
+    predictor.update(sv.Detections.empty(), frame_index=12)
+    assert len(predictor.predict(13, 640, 360)) == 0
+
+
+def test_box_iou_matrix():
+    a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=np.float32)
+    np.testing.assert_allclose(box_iou_matrix(a, b), [[1.0, 1 / 3], [0.0, 0.0]])
+    assert box_iou_matrix(a, b[:0]).shape == (2, 0)
+
+
+def test_drift_monitor_matches_greedily_by_iou():
+    monitor = StrideDriftMonitor(match_iou=0.3)
+    predicted = _tracked([[0, 0, 10, 10], [100, 100, 110, 120]], [1, 2])
+    detected = _tracked([[2, 0, 12, 10], [300, 300, 310, 320], [100, 100, 110, 120]], [0, 0, 0])
+    monitor.update(predicted, detected)
+    monitor.update(sv.Detections.empty(), _tracked([[0, 0, 10, 10]], [0]))
+
+    report = monitor.get_report()
+    assert report['audited_frames'] == 2
+    assert report['detections'] == 4
+    assert report['match_rate'] == 0.5
+    np.testing.assert_allclose(report['mean_iou'], (1.0 + 8 / 12) / 2)
+    np.testing.assert_allclose(report['mean_foot_error_px'], 1.0)
+
+
+def test_drift_monitor_without_audits():
+    assert StrideDriftMonitor().get_report() is None
+
+
+def _ball(center) -> sv.Detections:
+    x, y = center
+    return sv.Detections(
+        xyxy=np.array([[x - 5, y - 5, x + 5, y + 5]], dtype=np.float32),
+        confidence=np.array([0.7], dtype=np.float32),
+        class_id=np.zeros(1, dtype=int),
+    )
+
+
+def test_ball_window_follows_predicted_position():
+    search = BallSearchWindow(1920, 1080, roi_size=640, velocity_alpha=1.0)
+    assert search.window(1) is None  # Sin pelota previa: frame completo
+
+    search.update(1, _ball((800, 500)), searched_roi=False)
+    assert search.window(2) == (480, 180, 1120, 820)
+
+    search.update(2, _ball((820, 500)), searched_roi=True)
+    # Velocidad 20 px/frame: dos frames después el centro está en x=860
+    assert search.window(4) == (540, 180, 1180, 820)
+
+
+def test_ball_window_is_clipped_to_the_frame():
+    search = BallSearchWindow(1920, 1080, roi_size=640)
+    search.update(1, _ball((10, 1070)), searched_roi=False)
+    assert search.window(2) == (0, 440, 640, 1080)
+
+
+def test_ball_window_falls_back_to_full_frame_after_misses():
+    search = BallSearchWindow(1920, 1080, roi_size=640, max_misses=2, velocity_alpha=1.0)
+    search.update(1, _ball((800, 500)), searched_roi=False)
+    search.update(2, _ball((820, 500)), searched_roi=True)
+
+    search.update(3, sv.Detections.empty(), searched_roi=True)
+    assert search.window(4) is not None
+    search.update(4, sv.Detections.empty(), searched_roi=True)
+    assert search.window(5) is None
+
+    # Reencontrada en el frame completo: la velocidad anterior se descarta
+    search.update(5, _ball((1500, 300)), searched_roi=False)
+    assert search.window(6) == (1180, 0, 1820, 640)
+    assert search.get_report() == {
+        'roi_size': 640, 'roi_searches': 3, 'roi_hits': 1, 'full_searches': 2, 'full_hits': 2,
+    }
+
+
+def test_ball_window_disabled_when_roi_covers_the_frame():
+    search = BallSearchWindow(640, 360, roi_size=640)
+    search.update(1, _ball((300, 200)), searched_roi=False)
+    assert search.window(2) is None
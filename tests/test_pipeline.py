@@ -0,0 +1,78 @@
+"""StagedPipeline: mismo orden en serie y en paralelo, y aborto ante errores."""
+
+import threading
+
+import pytest
+
+from src.controllers.pipeline import PipelineStage, StagedPipeline
+
+
+def _run(parallel: bool, items, batch_sizes=(3, 1, 2)):
+    seen = {name: [] for name in ('a', 'b', 'c')}
+    batches = []
+
+    def stage(name):
+        def fn(batch):
+            seen[name].extend(batch)
+            if name == 'a':
+                batches.append(list(batch))
+            return [item * 10 for item in batch] if name == 'b' else batch
+        return fn
+
+    output = []
+    stages = [PipelineStage(name, stage(name), batch_size=size)
+              for name, size in zip(('a', 'b', 'c'), batch_sizes)]
+    stages.append(PipelineStage('sink', lambda batch: output.extend(batch)))
+    pipeline = StagedPipeline(stages, queue_size=2, parallel=parallel)
+    pipeline.run(items)
+    return seen, batches, output, pipeline.get_report()
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_order_and_batches_match_serial(parallel):
+    items = list(range(1, 23))
+    seen, batches, output, report = _run(parallel, items)
+
+    assert seen['a'] == items
+    assert seen['c'] == [item * 10 for item in items]
+    assert output == [item * 10 for item in items]
+    # Los lotes se llenan siempre hasta batch_size (salvo el último)
+    assert batches == [items[i:i + 3] for i in range(0, len(items), 3)]
+    assert report['stages']['a']['batches'] == 8
+    assert report['stages']['decode']['items'] == len(items)
+
+
+def test_serial_and_parallel_give_same_result():
+    items = list(range(100))
+    assert _run(False, items)[1:3] == _run(True, items)[1:3]
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_stage_error_aborts_pipeline(parallel):
+    processed = []
+
+    def fail(batch):
+        if 5 in batch:
+            raise ValueError("falla en la etapa")
+        return batch
+
+    def source():
+        # Fuente infinita: el aborto debe cortar también la lectura
+        i = 0
+        while True:
+            i += 1
+            yield i
+
+    stages = [
+        PipelineStage('fail', fail, batch_size=2),
+        PipelineStage('sink', lambda batch: processed.extend(batch)),
+    ]
+    pipeline = StagedPipeline(stages, queue_size=2, parallel=parallel)
+    with pytest.raises(ValueError):
+        pipeline.run(source())
+
+    # Lo que llegó al final es un prefijo en orden de lo anterior al lote fallido
+    assert processed == [1, 2, 3, 4][:len(processed)]
+    if not parallel:
+        assert processed == [1, 2, 3, 4]
+    assert not [t for t in threading.enumerate() if t.name.startswith('pipeline-')]
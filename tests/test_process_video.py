@@ -0,0 +1,33 @@
+"""process_video de extremo a extremo sobre el partido sintético (tests/conftest.py)."""
+
+import json
+from pathlib import Path
+
+import cv2
+
+from src.controllers.process_video import process_video
+
+
+def _stats(target: Path) -> dict:
+    with open(target.parent / f"{target.stem}_stats.json") as f:
+        return json.load(f)
+
+
+def test_render_false_gives_same_stats_without_video(tmp_path, match_video, match_models):
+    player_model, ball_model, pitch_model = match_models
+    rendered = tmp_path / "rendered" / "out.mp4"
+    rendered.parent.mkdir()
+    process_video(match_video, str(rendered), player_model, ball_model, pitch_model, batch_size=4)
+
+    stats_only = tmp_path / "stats_only" / "out.mp4"
+    stats_only.parent.mkdir()
+    process_video(match_video, str(stats_only), player_model, ball_model, pitch_model, batch_size=4, render=False)
+
+    assert not stats_only.exists()
+    capture = cv2.VideoCapture(str(rendered))
+    assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == 60
+    capture.release()
+
+    assert _stats(stats_only) == _stats(rendered)
+    assert _stats(rendered)['total_frames'] == 60
+    assert _stats(rendered)['formations']['team1']['timeline']
@@ -0,0 +1,127 @@
+"""Modo paralelo: unión de IDs entre tramos (reconcile_tracks) y registros empaquetados."""
+
+from typing import Dict, List
+
+import numpy as np
+import supervision as sv
+
+from src.controllers.process_video import FrameContext
+from src.controllers.process_video_parallel import pack_records, reconcile_tracks, unpack_records
+
+# Cajas de 4 personas (x1, y1, x2, y2) en el frame 0; se desplazan 3 px por frame
+BOXES = np.array([
+    [100, 100, 130, 170],
+    [200, 120, 230, 190],
+    [300, 100, 330, 170],
+    [400, 140, 430, 210],
+], dtype=np.float32)
+
+
+def _record(index: int, tracker_ids: List[int], teams: List[str], boxes: np.ndarray = BOXES) -> FrameContext:
+    ctx = FrameContext(index, None)
+    boxes = boxes + np.array([3, 0, 3, 0], dtype=np.float32) * index
+    ctx.tracked_persons = sv.Detections(
+        xyxy=boxes,
+        confidence=np.full(len(boxes), 0.9, dtype=np.float32),
+        class_id=np.zeros(len(boxes), dtype=int),
+        tracker_id=np.array(tracker_ids, dtype=int),
+    )
+    ctx.team1_mask = np.array([team == 'team1' for team in teams])
+    ctx.team2_mask = np.array([team == 'team2' for team in teams])
+    ctx.referee_mask = np.array([team == 'referee' for team in teams])
+    ctx.goalkeeper_mask = np.zeros(len(teams), dtype=bool)
+    return ctx
+
+
+def _previous(indices) -> Dict[int, FrameContext]:
+    return {
+        i: _record(i, [11, 12, 13, 14], ['team1', 'team1', 'team2', 'referee'])
+        for i in indices
+    }
+
+
+def test_maps_local_ids_to_previous_chunk():
+    previous = _previous(range(90, 101))
+    # Otro orden de cajas e IDs locales nuevos; mismas etiquetas de equipo
+    order = [2, 0, 3, 1]
+    current = [
+        _record(i, [1, 2, 3, 4], [['team1', 'team1', 'team2', 'referee'][k] for k in order], BOXES[order])
+        for i in range(90, 101)
+    ]
+
+    mapping, swapped = reconcile_tracks(previous, current)
+
+    assert mapping == {1: 13, 2: 11, 3: 14, 4: 12}
+    assert not swapped
+
+
+def test_detects_inverted_team_labels():
+    previous = _previous(range(90, 101))
+    current = [_record(i, [1, 2, 3, 4], ['team2', 'team2', 'team1', 'referee']) for i in range(90, 101)]
+
+    mapping, swapped = reconcile_tracks(previous, current)
+
+    assert mapping == {1: 11, 2: 12, 3: 13, 4: 14}
+    assert swapped
+
+
+def test_ignores_low_overlap_and_frames_outside_the_overlap():
+    previous = _previous(range(90, 101))
+    # El track local 4 está lejos de todos los del tramo anterior
+    far = BOXES.copy()
+    far[3] += np.array([150, 100, 150, 100], dtype=np.float32)
+    current = [
+        _record(i, [1, 2, 3, 4], ['team1', 'team1', 'team2', 'team2'], far)
+        for i in range(95, 111)  # sólo 95..100 se solapan
+    ]
+
+    mapping, swapped = reconcile_tracks(previous, current)
+
+    assert mapping == {1: 11, 2: 12, 3: 13}
+    assert not swapped
+
+
+def test_no_overlap_gives_empty_mapping():
+    mapping, swapped = reconcile_tracks(_previous(range(0, 10)), [_record(20, [1], ['team1'], BOXES[:1])])
+    assert mapping == {}
+    assert not swapped
+
+
+def test_pack_records_round_trip():
+    records = [_record(i, [11, 12, 13, 14], ['team1', 'team2', 'referee', None]) for i in range(1, 4)]
+    records[0].tracked_ball = sv.Detections(
+        xyxy=np.array([[50, 60, 58, 68]], dtype=np.float32), class_id=np.array([0]),
+        confidence=np.array([0.4], dtype=np.float32)
+    )
+    records[0].radar_points = {'team1': np.array([[10.0, 20.0]]), 'ball': np.array([[52.5, 34.0]])}
+    records[1].tracked_persons = None
+    records[2].radar_points = {}
+
+    packed = pack_records(records)
+    assert all(isinstance(value, np.ndarray) for value in packed.values())
+    restored = unpack_records(packed)
+
+    assert [ctx.index for ctx in restored] == [1, 2, 3]
+    for original, ctx in zip(records, restored):
+        assert ctx.frame is None
+        if original.tracked_persons is None:
+            assert ctx.tracked_persons is None
+            assert ctx.team1_mask == ctx.team2_mask == ctx.referee_mask == ctx.goalkeeper_mask == []
+            continue
+        np.testing.assert_allclose(ctx.tracked_persons.xyxy, original.tracked_persons.xyxy)
+        assert ctx.tracked_persons.tracker_id.tolist() == original.tracked_persons.tracker_id.tolist()
+        assert ctx.tracked_persons.class_id.tolist() == original.tracked_persons.class_id.tolist()
+        assert ctx.team1_mask == [True, False, False, False]
+        assert ctx.team2_mask == [False, True, False, False]
+        assert ctx.referee_mask == [False, False, True, False]
+        assert not any(ctx.goalkeeper_mask)
+
+    ball = restored[0].tracked_ball
+    np.testing.assert_allclose(ball.xyxy, [[50, 60, 58, 68]])
+    assert ball.class_id.tolist() == [0] and ball.tracker_id is None
+    assert restored[1].tracked_ball is None and restored[2].tracked_ball is None
+
+    assert set(restored[0].radar_points) == {'team1', 'ball'}
+    np.testing.assert_allclose(restored[0].radar_points['ball'], [[52.5, 34.0]])
+    assert restored[1].radar_points is None
+    assert restored[2].radar_points == {}
@@ -0,0 +1,71 @@
+"""Ajuste adaptativo de la resolución de inferencia (src/utils/resolution_scheduler.py)."""
+
+from src.utils.resolution_scheduler import AdaptiveResolutionScheduler
+
+
+def _run(scheduler, cost_at_640, windows, start_frame=1):
+    """Simula `windows` tramos de 10 frames; el costo por frame escala con el área."""
+    frame = start_frame
+    for _ in range(windows):
+        timings = {key: cost * 10 * (scheduler.size(key) / 640) ** 2 for key, cost in cost_at_640.items()}
+        scheduler.observe(frame, frame + 9, 10, timings)
+        frame += 10
+    return frame
+
+
+def test_lowers_resolution_until_target_fps_is_met():
+    scheduler = AdaptiveResolutionScheduler(25, {'player': 640}, window_frames=10, smoothing=1.0)
+    _run(scheduler, {'player': 0.05}, windows=6)  # 20 frames/s a 640
+
+    # 576 px: 0.0405 s/frame = 24.7 frames/s (dentro de la tolerancia del 5%)
+    assert scheduler.size('player') == 576
+    segments = scheduler.get_report()['segments']
+    assert [s['img_sizes']['player'] for s in segments] == [640, 576]
+    assert (segments[0]['start_frame'], segments[0]['end_frame']) == (1, 10)
+    assert segments[1]['end_frame'] == 60
+
+
+def test_lowers_the_most_expensive_model_first_and_respects_bounds():
+    scheduler = AdaptiveResolutionScheduler(
+        100, {'player': 640, 'ball': 640}, size_bounds=(512, 960), window_frames=10, smoothing=1.0
+    )
+    _run(scheduler, {'player': 0.03, 'ball': 0.01}, windows=1)
+    assert scheduler.sizes == {'player': 576, 'ball': 640}
+
+    _run(scheduler, {'player': 0.03, 'ball': 0.01}, windows=10)
+    assert scheduler.sizes == {'player': 512, 'ball': 512}
+
+
+def test_returns_to_base_resolution_with_headroom():
+    scheduler = AdaptiveResolutionScheduler(25, {'player': 640}, window_frames=10, smoothing=1.0)
+    frame = _run(scheduler, {'player': 0.08}, windows=3)
+    assert scheduler.size('player') < 640
+
+    # La carga baja (p.ej. otra sesión terminó): se vuelve a la base, nunca por encima
+    _run(scheduler, {'player': 0.01}, windows=6, start_frame=frame)
+    assert scheduler.size('player') == 640
+
+
+def test_raises_ball_resolution_after_misses():
+    scheduler = AdaptiveResolutionScheduler(
+        25, {'player': 640, 'ball': 640}, window_frames=10, ball_miss_frames=5, smoothing=1.0
+    )
+    for _ in range(5):
+        scheduler.observe_ball(False)
+    _run(scheduler, {'player': 0.005, 'ball': 0.005}, windows=1)
+    assert scheduler.sizes == {'player': 640, 'ball': 704}
+
+    # Con la pelota encontrada no se sigue subiendo
+    scheduler.observe_ball(True)
+    _run(scheduler, {'player': 0.005, 'ball': 0.005}, windows=1, start_frame=11)
+    assert scheduler.size('ball') == 704
+
+
+def test_flush_records_partial_window_without_adjusting():
+    scheduler = AdaptiveResolutionScheduler(25, {'player': 640}, window_frames=30)
+    scheduler.observe(1, 4, 4, {'player': 1.0})
+    scheduler.flush()
+
+    report = scheduler.get_report()
+    assert report['final_sizes'] == {'player': 640}
+    assert report['segments'] == [{'start_frame': 1, 'end_frame': 4, 'img_sizes': {'player': 640}, 'detect_fps': 4.0}]
@@ -0,0 +1,53 @@
+"""Modelo incremental de colores de los equipos (OnlineTeamColorModel)."""
+
+import numpy as np
+
+from src.controllers.team_classification import OnlineTeamColorModel
+
+RED = np.array([0.0, 200.0, 180.0])  # HSV
+BLUE = np.array([110.0, 200.0, 180.0])
+
+
+def _players(rng, colors, n=6, noise=4.0):
+    shirts = np.concatenate([color + rng.normal(0, noise, (n, 3)) for color in colors])
+    pants = np.tile([0.0, 0.0, 40.0], (len(shirts), 1))
+    return shirts, pants
+
+
+def test_initializes_and_keeps_team_order_while_colors_drift():
+    rng = np.random.default_rng(0)
+    model = OnlineTeamColorModel(memory=50)
+    assert not model.update(*_players(rng, [RED], n=2))  # Pocos jugadores: sin inicializar
+    assert model.update(*_players(rng, [RED, BLUE]))
+    red_team = int(model.assign(RED[None])[0])
+    assert int(model.assign(BLUE[None])[0]) == 1 - red_team
+
+    # La iluminación cambia de a poco (el brillo baja 60): los centroides la siguen
+    for step in range(1, 61):
+        shift = np.array([0.0, 0.0, -step])
+        assert model.update(*_players(rng, [RED + shift, BLUE + shift]))
+    team1, team2 = model.team_colors()
+    red_final = (team1, team2)[red_team]['shirt']
+    assert np.linalg.norm(red_final - (RED - [0, 0, 60])) < 10
+    assert int(model.assign((RED - [0, 0, 60])[None])[0]) == red_team
+    assert model.get_report()['updates'] == 61
+
+
+def test_seeded_colors_fix_team_order():
+    rng = np.random.default_rng(1)
+    model = OnlineTeamColorModel()
+    model.seed([BLUE, RED])
+    assert model.update(*_players(rng, [RED, BLUE]))
+    assert model.assign(np.array([BLUE, RED])).tolist() == [0, 1]
+
+
+def test_rejects_updates_that_collapse_the_teams():
+    rng = np.random.default_rng(2)
+    model = OnlineTeamColorModel(memory=5, min_separation=60.0)
+    model.update(*_players(rng, [RED, RED + [50, 0, 0]]))
+    before = model.shirt.copy()
+
+    # Un lote con todos los jugadores del mismo color acercaría los dos centroides
+    assert not model.update(*_players(rng, [RED + [25, 0, 0]], n=12))
+    np.testing.assert_array_equal(model.shirt, before)
+    assert model.get_report()['rejected_updates'] == 1
@@ -0,0 +1,73 @@
+"""TrackVoteStore frente a la mayoría de un historial con Counter."""
+
+from collections import Counter, deque
+
+import numpy as np
+
+from src.controllers.team_classification import TrackVoteStore
+
+NUM_CLASSES = 4
+HISTORY_LEN = 5
+
+
+def test_majority_matches_counter_history():
+    rng = np.random.default_rng(0)
+    store = TrackVoteStore(NUM_CLASSES, HISTORY_LEN, forget_after=20, capacity=2)
+    histories = {}
+    last_vote = {}
+
+    for frame in range(1, 400):
+        # Tracks que aparecen y desaparecen (fuerza el crecimiento y la reutilización de filas)
+        ids = rng.choice(np.arange(1, 30), size=int(rng.integers(0, 10)), replace=False)
+        # Votos sesgados por track para que haya mayorías claras y empates ocasionales
+        codes = np.array([(tid + int(rng.random() < 0.4)) % NUM_CLASSES for tid in ids], dtype=np.int64)
+        store.add(ids.tolist(), codes, frame)
+        for tid, code in zip(ids.tolist(), codes.tolist()):
+            histories.setdefault(tid, deque(maxlen=HISTORY_LEN)).append(code)
+            last_vote[tid] = frame
+
+        if frame % 10 == 0:
+            store.prune(frame)
+            for tid in [tid for tid, seen in last_vote.items() if frame - seen > 20]:
+                del histories[tid], last_vote[tid]
+
+        query = list(range(0, 32))
+        majority = store.majority(query)
+        for tid, value in zip(query, majority.tolist()):
+            history = histories.get(tid)
+            if not history:
+                assert value == -1
+                continue
+            # Misma mayoría que el historial con Counter, también en los empates
+            assert value == Counter(history).most_common(1)[0][0]
+            num_votes, share = store.vote_stats(tid)
+            assert num_votes == len(history)
+            assert share == history.count(value) / len(history)
+
+    assert len(store) == len(histories)
+
+
+def test_majority_of_unknown_tracks():
+    store = TrackVoteStore(NUM_CLASSES)
+    assert store.majority([]).shape == (0,)
+    assert store.majority([7, 8]).tolist() == [-1, -1]
+
+
+def test_ties_go_to_the_oldest_vote_like_counter():
+    store = TrackVoteStore(NUM_CLASSES, history_len=4)
+    store.add([1], np.array([2]), 1)
+    store.add([1], np.array([0]), 2)
+    assert store.majority([1]).tolist() == [2]  # 2 y 0 empatados: 2 se votó antes
+
+    store.add([1], np.array([0]), 3)
+    assert store.majority([1]).tolist() == [0]
+    store.add([1], np.array([2]), 4)
+    assert store.majority([1]).tolist() == [2]  # [2, 0, 0, 2]
+
+    # Con el buffer lleno el orden cuenta desde el voto más viejo que sigue en él
+    store.add([1], np.array([3]), 5)
+    assert store.majority([1]).tolist() == [0]  # [0, 0, 2, 3]
+    store.add([1], np.array([3]), 6)
+    assert store.majority([1]).tolist() == [3]  # [0, 2, 3, 3]
+    store.add([1], np.array([2]), 7)
+    assert store.majority([1]).tolist() == [2]  # [2, 3, 3, 2]: 2 es el voto más viejo
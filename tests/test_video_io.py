@@ -0,0 +1,247 @@
+"""Fuentes y escritores de video del pipeline (src/utils/video_io.py)."""
+
+import cv2
+import numpy as np
+import pytest
+
+from src.utils.video_io import (
+    AsyncVideoWriter,
+    FFmpegFrameReader,
+    FFmpegVideoWriter,
+    PrefetchFrameSource,
+    ffmpeg_available,
+    seek_frame,
+)
+
+HEIGHT, WIDTH = 24, 32
+
+
+class _FakeCapture:
+    """Captura tipo cv2.VideoCapture: el frame i vale i en todos sus píxeles."""
+
+    def __init__(self, num_frames: int, fail_at: int = None):
+        self.num_frames = num_frames
+        self.fail_at = fail_at
+        self.position = 0
+        self.released = False
+
+    def read(self, image=None):
+        if self.position == self.fail_at:
+            raise IOError("frame corrupto")
+        if self.position >= self.num_frames:
+            return False, None
+        if image is None:
+            image = np.empty((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        image[:] = self.position
+        self.position += 1
+        return True, image
+
+    def get(self, prop_id):
+        return {cv2.CAP_PROP_FRAME_WIDTH: WIDTH, cv2.CAP_PROP_FRAME_HEIGHT: HEIGHT}.get(prop_id, 0.0)
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        self.released = True
+
+
+def test_prefetch_frames_stay_valid_after_later_reads():
+    source = PrefetchFrameSource(_FakeCapture(20), depth=3)
+    frames = []
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    source.release()
+
+    # Cada frame es un array propio: leer los siguientes no lo sobrescribe
+    assert [int(frame[0, 0, 0]) for frame in frames] == list(range(20))
+    assert all(int(frame.min()) == int(frame.max()) == i for i, frame in enumerate(frames))
+    assert len({id(frame) for frame in frames}) == 20
+    report = source.get_report()
+    assert report['frames_decoded'] == report['frames_read'] == 20
+    assert source.capture.released
+
+
+def test_prefetch_reports_decoder_errors():
+    source = PrefetchFrameSource(_FakeCapture(20, fail_at=5), depth=2)
+    for _ in range(5):
+        assert source.read()[0]
+    with pytest.raises(RuntimeError):
+        source.read()
+    source.release()
+
+
+def test_prefetch_release_stops_a_blocked_decoder():
+    source = PrefetchFrameSource(_FakeCapture(1000), depth=2)
+    assert source.read()[0]
+    source.release()
+    assert not source._thread.is_alive()
+
+
+class _FailingWriter:
+    """Writer tipo cv2.VideoWriter que falla a partir del frame `fail_at`."""
+
+    def __init__(self, fail_at: int):
+        self.fail_at = fail_at
+        self.frames = []
+        self.released = False
+
+    def write(self, frame):
+        if len(self.frames) >= self.fail_at:
+            raise OSError("No space left on device")
+        self.frames.append(int(frame[0, 0, 0]))
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        self.released = True
+
+
+def test_async_writer_keeps_order():
+    writer = _FailingWriter(fail_at=1000)
+    out = AsyncVideoWriter(writer, queue_size=2)
+    for i in range(50):
+        out.write(np.full((HEIGHT, WIDTH, 3), i, dtype=np.uint8))
+    out.release()
+    assert writer.frames == list(range(50))
+    assert writer.released
+
+
+def test_async_writer_release_raises_encoder_error():
+    writer = _FailingWriter(fail_at=3)
+    out = AsyncVideoWriter(writer, queue_size=8)
+    # Los últimos frames fallan en el hilo codificador después de encolarse
+    for i in range(5):
+        out.write(np.full((HEIGHT, WIDTH, 3), i, dtype=np.uint8))
+    with pytest.raises(RuntimeError, match="No space left"):
+        out.release()
+    assert writer.frames == [0, 1, 2]
+    assert writer.released
+
+
+needs_ffmpeg = pytest.mark.skipif(not ffmpeg_available(), reason="ffmpeg no está instalado")
+
+
+def _level_frame(i: int) -> np.ndarray:
+    """Frame plano cuyo nivel de gris identifica su índice (sobrevive a H.264)."""
+    return np.full((HEIGHT * 4, WIDTH * 4, 3), 10 + 8 * i, dtype=np.uint8)
+
+
+def _level(frame: np.ndarray) -> int:
+    return int(round((float(frame.mean()) - 10) / 8))
+
+
+@needs_ffmpeg
+def test_ffmpeg_writer_and_reader_round_trip(tmp_path):
+    path = str(tmp_path / "levels.mp4")
+    writer = FFmpegVideoWriter(path, 25, (WIDTH * 4, HEIGHT * 4))
+    for i in range(30):
+        writer.write(_level_frame(i))
+    writer.release()
+
+    reader = FFmpegFrameReader(path)
+    assert reader.get(cv2.CAP_PROP_FRAME_COUNT) == 30
+    buffer = np.empty((HEIGHT * 4, WIDTH * 4, 3), dtype=np.uint8)
+    ret, frame = reader.read(buffer)
+    assert ret and frame is buffer and _level(frame) == 0
+
+    levels = [0]
+    while True:
+        ret, frame = reader.read()
+        if not ret:
+            break
+        levels.append(_level(frame))
+    reader.release()
+    assert levels == list(range(30))
+
+
+@needs_ffmpeg
+def test_ffmpeg_reader_seeks_to_exact_frame(tmp_path):
+    path = str(tmp_path / "levels.mp4")
+    writer = FFmpegVideoWriter(path, 25, (WIDTH * 4, HEIGHT * 4))
+    for i in range(30):
+        writer.write(_level_frame(i))
+    writer.release()
+
+    reader = FFmpegFrameReader(path)
+    for start in (17, 3, 29):
+        assert reader.set(cv2.CAP_PROP_POS_FRAMES, start)
+        ret, frame = reader.read()
+        assert ret and _level(frame) == start
+        assert reader.get(cv2.CAP_PROP_POS_FRAMES) == start + 1
+    reader.release()
+
+
+@needs_ffmpeg
+def test_ffmpeg_writer_reports_ffmpeg_errors(tmp_path):
+    writer = FFmpegVideoWriter(str(tmp_path / "missing" / "out.mp4"), 25, (WIDTH, HEIGHT))
+    with pytest.raises(RuntimeError, match="missing"):
+        for _ in range(200):
+            writer.write(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8))
+        writer.release()
+
+
+@needs_ffmpeg
+def test_ffmpeg_writer_rejects_wrong_frame_size(tmp_path):
+    writer = FFmpegVideoWriter(str(tmp_path / "out.mp4"), 25, (WIDTH, HEIGHT))
+    with pytest.raises(ValueError):
+        writer.write(np.zeros((HEIGHT + 2, WIDTH, 3), dtype=np.uint8))
+    writer.release()
+
+
+class _KeyframeCapture(_FakeCapture):
+    """Captura cuyo salto con POS_FRAMES cae en el keyframe anterior (cada 10 frames)."""
+
+    def __init__(self, num_frames: int, timestamps: bool = True):
+        super().__init__(num_frames)
+        self.timestamps = timestamps
+
+    def set(self, prop_id, value):
+        self.position = int(value) - int(value) % 10
+        return True
+
+    def grab(self):
+        if self.position >= self.num_frames:
+            return False
+        self.position += 1
+        return True
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FPS:
+            return 25.0
+        if prop_id == cv2.CAP_PROP_POS_MSEC:
+            # Marca de tiempo del último frame decodificado
+            return (self.position - 1) * 40.0 if self.timestamps else 0.0
+        return super().get(prop_id)
+
+
+@pytest.mark.parametrize('timestamps', [True, False])
+@pytest.mark.parametrize('target', [0, 5, 37, 80])
+def test_seek_frame_lands_on_exact_frame(target, timestamps):
+    capture = _KeyframeCapture(100, timestamps=timestamps)
+    assert seek_frame(capture, target, preroll=20)
+    ret, frame = capture.read()
+    assert ret and int(frame[0, 0, 0]) == target
+
+
+def test_seek_frame_past_the_end():
+    assert not seek_frame(_KeyframeCapture(30), 50, preroll=5)
+
+
+def test_seek_frame_on_encoded_video(tmp_path):
+    path = str(tmp_path / "levels.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 25, (WIDTH * 4, HEIGHT * 4))
+    for i in range(30):
+        writer.write(_level_frame(i))
+    writer.release()
+
+    for target in (29, 12, 4):
+        capture = cv2.VideoCapture(path)
+        assert seek_frame(capture, target, preroll=8)
+        ret, frame = capture.read()
+        capture.release()
+        assert ret and _level(frame) == target